@@ -0,0 +1,182 @@
+"""
+Deterministic stand-in for yt_dlp.YoutubeDL used by the benchmarks.
+
+It serves synthetic playlists and "downloads" videos by writing sparse files
+of a fixed size, calling the same progress, postprocessor and post hooks as
+yt-dlp. Latency, bandwidth and failures are configurable, so runs measure
+the archiver rather than the network.
+"""
+
+import os
+import re
+import time
+import zlib
+import yt_dlp
+
+VIDEO_URL_RE = re.compile(r"[?&]v=([^&]+)")
+PLAYLIST_URL_RE = re.compile(r"[?&]list=([^&]+)")
+
+
+class FakeBackend:
+    """Synthetic playlists plus the latency/bandwidth model for downloads
+
+    Args:
+        playlists: dict of playlist_id -> {"title": ..., "entries": [(video_id, title), ...]}
+        extract_latency: Seconds before extract_info returns
+        page_size: Entries per lazily fetched page
+        page_latency: Seconds to fetch each page after the first
+        download_latency: Seconds before a download starts transferring
+        bandwidth: Bytes per second per download, or None for no limit
+        merge_latency: Seconds spent in the simulated ffmpeg merge
+        video_size: Bytes per downloaded video
+        failure_rate: Fraction of videos whose download fails (chosen by ID)
+    """
+
+    def __init__(self, playlists, extract_latency=0.0, page_size=100, page_latency=0.0,
+                 download_latency=0.0, bandwidth=None, merge_latency=0.0,
+                 video_size=1024 * 1024, failure_rate=0.0):
+        self.playlists = playlists
+        self.extract_latency = extract_latency
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.download_latency = download_latency
+        self.bandwidth = bandwidth
+        self.merge_latency = merge_latency
+        self.video_size = video_size
+        self.failure_rate = failure_rate
+        self.titles = {video_id: title
+                       for playlist in playlists.values()
+                       for video_id, title in playlist["entries"]}
+
+    def fails(self, video_id):
+        """Whether a video's download fails; stable for a given ID"""
+        return (zlib.crc32(video_id.encode()) % 10000) < self.failure_rate * 10000
+
+    def ydl_class(self):
+        """Return a YoutubeDL replacement bound to this backend"""
+        backend = self
+
+        class BoundFakeYoutubeDL(FakeYoutubeDL):
+            def __init__(self, params=None):
+                super().__init__(backend, params)
+
+        return BoundFakeYoutubeDL
+
+
+class FakeYoutubeDL:
+    """The subset of the YoutubeDL interface the archiver uses"""
+
+    def __init__(self, backend, params=None):
+        self.backend = backend
+        self.params = params or {}
+        self._progress_hooks = []
+        self._post_hooks = []
+        self._postprocessor_hooks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def add_progress_hook(self, hook):
+        self._progress_hooks.append(hook)
+
+    def add_post_hook(self, hook):
+        self._post_hooks.append(hook)
+
+    def add_postprocessor_hook(self, hook):
+        self._postprocessor_hooks.append(hook)
+
+    def extract_info(self, url, download=True, process=True, **kwargs):
+        match = PLAYLIST_URL_RE.search(url)
+        if not match or match.group(1) not in self.backend.playlists:
+            raise yt_dlp.utils.DownloadError(f"ERROR: playlist not found: {url}")
+
+        time.sleep(self.backend.extract_latency)
+        playlist_id = match.group(1)
+        playlist = self.backend.playlists[playlist_id]
+        entries = self._entries(playlist["entries"])
+        return {
+            "_type": "playlist",
+            "id": playlist_id,
+            "title": playlist["title"],
+            "uploader": playlist.get("uploader", "Benchmark"),
+            "entries": entries if not process else list(entries)
+        }
+
+    def _entries(self, entries):
+        page_size = self.backend.page_size
+        for i, (video_id, title) in enumerate(entries):
+            if i and i % page_size == 0:
+                time.sleep(self.backend.page_latency)
+            yield {"_type": "url", "id": video_id, "title": title,
+                   "url": f"https://www.youtube.com/watch?v={video_id}"}
+
+    def download(self, urls):
+        for url in urls:
+            self._download_one(VIDEO_URL_RE.search(url).group(1))
+        return 0
+
+    def _download_one(self, video_id):
+        backend = self.backend
+        title = backend.titles.get(video_id, video_id)
+        info = {"id": video_id, "title": title, "uploader": "Benchmark", "ext": "mp4"}
+        time.sleep(backend.download_latency)
+
+        if backend.fails(video_id):
+            for hook in list(self._progress_hooks):
+                hook({"status": "error", "info_dict": info})
+            raise yt_dlp.utils.DownloadError(f"ERROR: [fake] {video_id}: simulated failure")
+
+        outtmpl = self.params.get("outtmpl", "%(title)s-%(id)s.%(ext)s")
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl.get("default")
+        final_path = outtmpl % info
+
+        # A video and an audio stream, merged afterwards, as with bestvideo+bestaudio
+        streams = ((f".f137.mp4", int(backend.video_size * 0.8)),
+                   (f".f140.m4a", backend.video_size - int(backend.video_size * 0.8)))
+        for suffix, size in streams:
+            filename = os.path.splitext(final_path)[0] + suffix
+            self._transfer(filename, size, info)
+
+        for hook in list(self._postprocessor_hooks):
+            hook({"status": "started", "postprocessor": "Merger", "info_dict": info})
+        time.sleep(backend.merge_latency)
+        with open(final_path, "wb") as f:
+            f.truncate(backend.video_size)
+        for suffix, _ in streams:
+            os.remove(os.path.splitext(final_path)[0] + suffix)
+        for hook in list(self._postprocessor_hooks):
+            hook({"status": "finished", "postprocessor": "Merger", "info_dict": info})
+
+        for hook in list(self._post_hooks):
+            hook(final_path)
+
+    def _transfer(self, filename, size, info):
+        bandwidth = self.backend.bandwidth
+        chunk = max(1, size // 4)
+        started = time.monotonic()
+        downloaded = 0
+        while downloaded < size:
+            downloaded = min(size, downloaded + chunk)
+            if bandwidth:
+                # Sleep until the transfer is on schedule for the bandwidth
+                time.sleep(max(0.0, downloaded / bandwidth - (time.monotonic() - started)))
+            elapsed = time.monotonic() - started
+            for hook in list(self._progress_hooks):
+                hook({"status": "downloading", "filename": filename, "downloaded_bytes": downloaded,
+                      "total_bytes": size, "elapsed": elapsed,
+                      "speed": downloaded / elapsed if elapsed else None,
+                      "eta": (size - downloaded) / bandwidth if bandwidth else 0,
+                      "info_dict": info})
+
+        with open(filename, "wb") as f:
+            f.truncate(size)
+        for hook in list(self._progress_hooks):
+            hook({"status": "finished", "filename": filename, "total_bytes": size,
+                  "elapsed": time.monotonic() - started, "info_dict": info})
@@ -0,0 +1,256 @@
+"""
+Offline benchmarks for the archiver.
+
+Times syncs, storage statistics, file lookups, catalog load/save and page
+rendering against synthetic archives, with yt-dlp replaced by a fake backend
+whose latency and bandwidth are configurable. Nothing touches the network.
+
+Usage:
+    python -m benchmarks.run --sizes 1000,10000 --output results.json
+    python -m benchmarks.run --sizes 1000 --bandwidth 50000000 --compare results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from youtube_archiver import YouTubeArchiver  # noqa: E402
+from .synthetic import build_archive  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def measure(fn, repeat, setup=None):
+    """Run ``fn`` ``repeat`` times and return the wall time of each run"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def summarize(name, size, runs, **extra):
+    result = {
+        "name": name,
+        "size": size,
+        "runs": [round(run, 6) for run in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.fmean(runs), 6),
+        "max": round(max(runs), 6)
+    }
+    result.update(extra)
+    return result
+
+
+def load_web():
+    """Import the web app without starting its background threads"""
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        with patch('threading.Thread'):
+            import youtube_archiver.app as web
+    finally:
+        os.chdir(cwd)
+    web.app.config['TESTING'] = True
+    return web
+
+
+def reset_new_videos(archiver, keep):
+    """Delete the videos a sync downloaded so the next run downloads them again"""
+    for video_id in set(archiver.downloaded_videos) - keep:
+        archiver.delete_video(video_id)
+
+
+def bench_size(size, args, web):
+    """Run every benchmark against a synthetic archive of ``size`` videos"""
+    results = []
+    backend_options = {
+        "extract_latency": args.extract_latency,
+        "page_size": args.page_size,
+        "page_latency": args.page_latency,
+        "download_latency": args.download_latency,
+        "bandwidth": args.bandwidth,
+        "merge_latency": args.merge_latency,
+        "video_size": args.video_size,
+        "failure_rate": args.failure_rate
+    }
+
+    with tempfile.TemporaryDirectory(prefix="archiver-bench-") as root:
+        started = time.perf_counter()
+        config_dir, download_dir, backend = build_archive(
+            root, size, playlists=args.playlists, new_per_playlist=args.new_per_playlist,
+            **backend_options)
+        print(f"[{size}] built synthetic archive in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        archivers = []
+
+        def load():
+            archivers.append(YouTubeArchiver(config_dir=config_dir, download_dir=download_dir))
+
+        def release():
+            # Each load takes the catalog lock, so the previous archiver lets go of it first
+            if archivers:
+                archivers[-1].close()
+
+        results.append(summarize("catalog_load", size, measure(load, args.repeat, setup=release)))
+        archiver = archivers[-1]
+        archiver.config["concurrent_downloads"] = args.concurrent_downloads
+        archiver.config["concurrent_playlists"] = args.concurrent_playlists
+        archived = set(archiver.downloaded_videos)
+
+        results.append(summarize("catalog_save", size,
+                                 measure(archiver._save_downloaded_videos, args.repeat)))
+
+        def cold_stats():
+            archiver.storage_totals = None
+
+        results.append(summarize("get_storage_stats_cold", size,
+                                 measure(archiver.get_storage_stats, args.repeat, setup=cold_stats)))
+        results.append(summarize("get_storage_stats", size,
+                                 measure(archiver.get_storage_stats, args.repeat)))
+
+        sample = random.Random(size).sample(sorted(archiver.downloaded_videos),
+                                            min(args.lookups, len(archiver.downloaded_videos)))
+
+        def find_all():
+            for video_id in sample:
+                archiver.find_video_file(video_id)
+
+        runs = measure(find_all, args.repeat)
+        results.append(summarize("find_video_file", size, [run / len(sample) for run in runs],
+                                 lookups=len(sample)))
+
+        def find_unindexed():
+            archiver.file_index.pop(sample[0], None)
+            archiver.find_video_file(sample[0])
+
+        results.append(summarize("find_video_file_unindexed", size, measure(find_unindexed, args.repeat)))
+
+        ydl_class = backend.ydl_class()
+        first_playlist = sorted(archiver.playlists)[0]
+        with patch('yt_dlp.YoutubeDL', ydl_class):
+            reset = lambda: reset_new_videos(archiver, archived)
+            results.append(summarize(
+                "sync_playlist", size,
+                measure(lambda: archiver.sync_playlist(first_playlist), args.repeat, setup=reset),
+                new_videos=args.new_per_playlist))
+            results.append(summarize(
+                "sync_all_playlists", size,
+                measure(archiver.sync_all_playlists, args.repeat, setup=reset),
+                new_videos=args.new_per_playlist * args.playlists))
+            reset()
+
+        original = web.archiver
+        web.archiver = archiver
+        try:
+            with web.app.test_client() as client:
+                for name, url in (("render_index", "/"),
+                                  ("render_videos", "/videos"),
+                                  ("render_playlist", f"/playlist/{first_playlist}")):
+                    def get():
+                        response = client.get(url)
+                        assert response.status_code == 200, f"{url} returned {response.status_code}"
+                    results.append(summarize(name, size, measure(get, args.repeat)))
+        finally:
+            web.archiver = original
+            archiver.close()
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print median times against a previous run, as new/old ratios"""
+    previous = {(result["name"], result["size"]): result for result in baseline["results"]}
+    print(f"{'benchmark':<28} {'size':>7} {'old':>11} {'new':>11} {'ratio':>7}")
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        if not old:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        print(f"{result['name']:<28} {result['size']:>7} {old['median']:>11.6f} "
+              f"{result['median']:>11.6f} {ratio:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline YouTube Archiver benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated archive sizes (videos)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument("--playlists", type=int, default=10, help="Playlists per archive")
+    parser.add_argument("--new-per-playlist", type=int, default=5,
+                        help="Entries per playlist a sync has to download")
+    parser.add_argument("--lookups", type=int, default=1000, help="Videos looked up by find_video_file")
+    parser.add_argument("--concurrent-downloads", type=int, default=4)
+    parser.add_argument("--concurrent-playlists", type=int, default=3)
+    parser.add_argument("--extract-latency", type=float, default=0.0, help="Seconds per extract_info")
+    parser.add_argument("--page-size", type=int, default=100, help="Playlist entries per page")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Seconds per playlist page")
+    parser.add_argument("--download-latency", type=float, default=0.0, help="Seconds before a download starts")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second per download")
+    parser.add_argument("--merge-latency", type=float, default=0.0, help="Seconds per ffmpeg merge")
+    parser.add_argument("--video-size", type=int, default=1024 * 1024, help="Bytes per video")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of downloads that fail")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    web = load_web()
+    results = []
+    # The archiver reports progress with print(); keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        for size in sizes:
+            results.extend(bench_size(size, args, web))
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(),
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Synthetic archives for the benchmarks.
+
+Builds a config directory with playlist and video catalogs plus a download
+directory of sparse files, in the layout the archiver itself produces, and
+the matching FakeBackend playlists (archived entries plus some new ones).
+"""
+
+import os
+import json
+from datetime import datetime, timedelta
+from .fake_ytdl import FakeBackend
+
+WORDS = ("live", "session", "tutorial", "review", "highlights", "interview", "guitar",
+         "cooking", "travel", "vlog", "episode", "remix", "lecture", "unboxing", "trailer")
+
+
+def video_id(n):
+    """An 11 character ID, like YouTube's"""
+    return f"v{n:010d}"
+
+
+def video_title(n):
+    return f"{WORDS[n % len(WORDS)].title()} {WORDS[(n // len(WORDS)) % len(WORDS)]} {n}"
+
+
+def build_archive(root, size, playlists=10, new_per_playlist=10, with_files=True, **backend_options):
+    """Create a synthetic archive of ``size`` downloaded videos
+
+    Args:
+        root: Directory to create ``config`` and ``downloads`` in
+        size: Number of archived videos, spread evenly across the playlists
+        playlists: Number of playlists
+        new_per_playlist: Entries per playlist that are not downloaded yet
+        with_files: Whether to create a (sparse) file for each archived video
+        **backend_options: Passed to FakeBackend
+
+    Returns:
+        tuple: (config_dir, download_dir, FakeBackend)
+    """
+    config_dir = os.path.join(root, "config")
+    download_dir = os.path.join(root, "downloads")
+    os.makedirs(config_dir, exist_ok=True)
+    os.makedirs(download_dir, exist_ok=True)
+
+    video_size = backend_options.get("video_size", 1024 * 1024)
+    started = datetime(2024, 1, 1)
+    playlist_records = {}
+    videos = {}
+    backend_playlists = {}
+    n = 0
+
+    for p in range(playlists):
+        playlist_id = f"PLBENCH{p:04d}"
+        count = size // playlists + (1 if p < size % playlists else 0)
+        entries = []
+
+        for _ in range(count):
+            vid, title = video_id(n), video_title(n)
+            file_path = os.path.join(download_dir, f"{title}-{vid}.mp4")
+            videos[vid] = {
+                "title": title,
+                "downloaded_at": (started + timedelta(minutes=n)).isoformat(),
+                "url": f"https://www.youtube.com/watch?v={vid}",
+                "playlist_id": playlist_id,
+                "uploader": "Benchmark",
+                "file_path": file_path,
+                "file_size": video_size
+            }
+            if with_files:
+                with open(file_path, "wb") as f:
+                    f.truncate(video_size)
+            entries.append((vid, title))
+            n += 1
+
+        # New uploads appear at the top of the playlist
+        new_entries = []
+        for _ in range(new_per_playlist):
+            new_entries.append((video_id(n), video_title(n)))
+            n += 1
+        entries = new_entries + entries
+
+        playlist_records[playlist_id] = {
+            "id": playlist_id,
+            "title": f"Benchmark playlist {p}",
+            "uploader": "Benchmark",
+            "url": f"https://www.youtube.com/playlist?list={playlist_id}",
+            "video_count": count,
+            "last_synced": None
+        }
+        backend_playlists[playlist_id] = {"title": f"Benchmark playlist {p}", "entries": entries}
+
+    with open(os.path.join(config_dir, "config.json"), "w") as f:
+        json.dump({"download_dir": download_dir, "concurrent_downloads": 4}, f)
+    with open(os.path.join(config_dir, "playlists.json"), "w") as f:
+        json.dump(playlist_records, f)
+    with open(os.path.join(config_dir, "downloaded_videos.json"), "w") as f:
+        json.dump(videos, f)
+
+    return config_dir, download_dir, FakeBackend(backend_playlists, **backend_options)
@@ -24,8 +24,13 @@ import json
 import threading
 import schedule
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, send_from_directory, jsonify, abort, stream_with_context
 from .core import YouTubeArchiver
+from .streaming import send_media, media_etag, MEDIA_MAX_AGE
+from .events import EventBroker
+from .jobs import JobRunner
+from .shaper import MB, parse_schedule, format_schedule
+from . import metrics
 
 # Configuration
 CONFIG_DIR = os.path.abspath("./config")
@@ -33,6 +38,8 @@ DOWNLOAD_DIR = os.path.abspath("./youtube_archive")
 DEFAULT_PORT = 8899
 TEMPLATES_DIR = os.path.abspath("./templates")
 STATIC_DIR = os.path.abspath("./static")
+VIDEOS_PER_PAGE = 50
+SEARCH_RESULTS = 100
 
 # Create necessary directories
 os.makedirs(CONFIG_DIR, exist_ok=True)
@@ -71,7 +78,11 @@ if prefix:
     print(f"Running with prefix: {prefix}")
 
 # Initialize YouTube Archiver
-archiver = YouTubeArchiver(config_dir=CONFIG_DIR, download_dir=DOWNLOAD_DIR)
+try:
+    archiver = YouTubeArchiver(config_dir=CONFIG_DIR, download_dir=DOWNLOAD_DIR)
+except RuntimeError as e:
+    print(f"{e}. Wait for the running youtube-archiver command to finish.")
+    raise SystemExit(1)
 
 # Global variables for sync status
 sync_status = {
@@ -84,10 +95,19 @@ sync_status = {
 # Flag to track if scheduler is running
 scheduler_running = False
 
+# Pushes sync status and download events to connected browsers
+events = EventBroker()
+archiver.add_listener(events.publish)
+
+def publish_status():
+    """Push the current sync status to connected browsers"""
+    events.publish("status", dict(sync_status))
+
 def update_sync_status(task, progress):
     """Update the sync status for display in the UI"""
     sync_status["current_task"] = task
     sync_status["progress"] = progress
+    publish_status()
 
 def schedule_sync():
     """Schedule automatic syncing based on configuration"""
@@ -139,66 +159,71 @@ def run_scheduler():
         
         time.sleep(60)
 
-def sync_all_playlists():
-    """Sync all playlists with progress reporting"""
-    if sync_status["is_syncing"]:
-        return {"status": "error", "message": "Sync already in progress"}
+def job_started(job):
+    """Mark the app as syncing when the runner starts a job"""
+    sync_status["is_syncing"] = True
+    publish_status()
+
+def job_finished(job, result):
+    """Report a finished job, and the end of the run once the queue is empty"""
+    if result and result.get("success") and job.get("kind") == "optimize_faststart":
+        sync_status["current_task"] = (f"Optimized for fast start: {result['remuxed']} remuxed, "
+                                       f"{result['already']} already fast-start")
+    elif result and result.get("success"):
+        sync_status["current_task"] = f"Completed {result['playlist_title']}: {result['new_videos']} new videos downloaded"
+    elif result:
+        sync_status["current_task"] = f"Error: {result.get('error')}"
     
-    def run_sync():
-        """Run the sync operation in a thread"""
-        sync_status["is_syncing"] = True
-        try:
-            print(f"Starting sync of all playlists at {datetime.now().isoformat()}")
-            results = archiver.sync_all_playlists(callback=update_sync_status)
-            
-            success_count = sum(1 for r in results if r["success"])
-            sync_status["current_task"] = f"Completed: {success_count}/{len(results)} playlists synced"
-            sync_status["last_run"] = datetime.now().isoformat()
-            print(f"Completed sync of all playlists at {datetime.now().isoformat()}")
-        except Exception as e:
-            sync_status["current_task"] = f"Error: {str(e)}"
-            print(f"Error syncing playlists: {str(e)}")
-        finally:
-            sync_status["is_syncing"] = False
-    
-    # Start sync in a background thread
-    thread = threading.Thread(target=run_sync)
-    thread.daemon = True  # Make thread a daemon so it exits when main thread exits
-    thread.start()
+    if runner.active_jobs == 0 and not archiver.jobs.list(states=("queued",)):
+        sync_status["is_syncing"] = False
+        sync_status["last_run"] = datetime.now().isoformat()
+        print(f"Job queue drained at {datetime.now().isoformat()}")
+    publish_status()
+
+# Runs queued sync jobs, including ones left unfinished by a previous run
+runner = JobRunner(archiver, archiver.jobs, callback=update_sync_status,
+                   on_job_started=job_started, on_job_finished=job_finished)
+
+def sync_all_playlists():
+    """Queue a sync of every playlist"""
+    jobs = archiver.enqueue_sync_all()
+    if not jobs:
+        return {"status": "error", "message": "No playlists to sync"}
     
-    return {"status": "success", "message": "Started syncing all playlists"}
+    runner.wake()
+    return {"status": "success", "message": f"Queued {len(jobs)} playlists for syncing"}
 
 def sync_playlist(playlist_id):
-    """Sync a specific playlist with progress reporting"""
-    if sync_status["is_syncing"]:
-        return {"status": "error", "message": "Sync already in progress"}
-    
+    """Queue a sync of a specific playlist"""
     if playlist_id not in archiver.playlists:
         return {"status": "error", "message": "Playlist not found"}
     
-    def run_sync():
-        """Run the sync operation in a thread"""
-        sync_status["is_syncing"] = True
-        try:
-            result = archiver.sync_playlist(playlist_id, callback=update_sync_status)
-            
-            if result["success"]:
-                sync_status["current_task"] = f"Completed: {result['new_videos']} new videos downloaded"
-            else:
-                sync_status["current_task"] = f"Error: {result['error']}"
-                
-            sync_status["last_run"] = datetime.now().isoformat()
-        except Exception as e:
-            sync_status["current_task"] = f"Error: {str(e)}"
-        finally:
-            sync_status["is_syncing"] = False
-    
-    # Start sync in a background thread
-    thread = threading.Thread(target=run_sync)
-    thread.daemon = True  # Make thread a daemon so it exits when main thread exits
-    thread.start()
+    job, created = archiver.enqueue_sync(playlist_id)
+    runner.wake()
     
-    return {"status": "success", "message": f"Started syncing: {archiver.playlists[playlist_id]['title']}"}
+    title = archiver.playlists[playlist_id]['title']
+    if not created:
+        return {"status": "success", "message": f"Already queued: {title}"}
+    return {"status": "success", "message": f"Queued for syncing: {title}"}
+
+@app.route('/jobs')
+def list_jobs():
+    """API endpoint listing the sync jobs in the queue"""
+    return jsonify(archiver.jobs.list())
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Record request latency per route; streamed bodies count until their headers are ready"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                             method=request.method, status=response.status_code)
+    return response
 
 # Route handlers
 @app.route('/')
@@ -226,27 +251,120 @@ def playlist_detail(playlist_id):
     playlist = archiver.playlists[playlist_id]
     stats = archiver.get_playlist_storage_stats(playlist_id)
     
-    # Get videos in this playlist
-    playlist_videos = {vid_id: vid_info for vid_id, vid_info in archiver.downloaded_videos.items() 
-                      if vid_info.get('playlist_id') == playlist_id}
+    # Get the first page of videos in this playlist, in playlist order by default
+    listing = _list_videos(playlist_id=playlist_id, sort='position', order='asc')
     
-    # Get videos not yet downloaded
-    missing_videos = archiver.get_missing_videos(playlist_id)
+    # Get videos not yet downloaded, from the entry cache so the page never
+    # waits on a live playlist enumeration
+    missing_videos = archiver.get_missing_videos(playlist_id, wait=False)
+    entries_status = archiver.entry_cache.status(playlist_id)
+    
+    # Failed downloads, quarantined first
+    failures = archiver.failures.entries(playlist_id)
+    for failure in failures:
+        failure["retry_at_text"] = datetime.fromtimestamp(failure["retry_at"]).strftime("%Y-%m-%d %H:%M")
     
     return render_template('playlist_detail.html',
                           playlist=playlist,
                           stats=stats,
-                          videos=playlist_videos,
+                          videos=listing['videos'],
+                          listing=listing,
                           missing_videos=missing_videos,
+                          entries_status=entries_status,
+                          failures=failures,
                           sync_status=sync_status)
 
+@app.route('/failures/<video_id>/retry', methods=['POST'])
+def retry_failed_video(video_id):
+    """Let the next sync try a failed or quarantined video again"""
+    failure = archiver.failures.get(video_id)
+    archiver.failures.release(video_id)
+    if failure and failure.get("playlist_id") in archiver.playlists:
+        return redirect(url_for('playlist_detail', playlist_id=failure["playlist_id"]))
+    return redirect(url_for('playlists'))
+
+@app.route('/playlist/<playlist_id>/sync_mode', methods=['POST'])
+def set_sync_mode(playlist_id):
+    """Switch a playlist between full and incremental scanning"""
+    archiver.set_playlist_sync_mode(playlist_id, request.form.get('sync_mode', 'full'))
+    return redirect(url_for('playlist_detail', playlist_id=playlist_id))
+
+@app.route('/refresh_playlist/<playlist_id>', methods=['POST'])
+def refresh_playlist(playlist_id):
+    """Refresh the cached entries of a playlist in the background"""
+    archiver.refresh_playlist_entries(playlist_id)
+    return redirect(url_for('playlist_detail', playlist_id=playlist_id))
+
+def _list_videos(playlist_id=None, sort='downloaded_at', order='desc'):
+    """Get a page of videos using the listing arguments of the current request"""
+    return archiver.list_videos(sort=request.args.get('sort', sort),
+                                order=request.args.get('order', order),
+                                cursor=request.args.get('cursor'),
+                                limit=request.args.get('limit', VIDEOS_PER_PAGE, type=int),
+                                playlist_id=playlist_id or request.args.get('playlist_id'),
+                                query=request.args.get('q', '').strip() or None)
+
 @app.route('/videos')
 def videos():
     """All videos page"""
+    listing = _list_videos()
     return render_template('videos.html',
-                          videos=archiver.downloaded_videos,
+                          videos=listing['videos'],
+                          listing=listing,
+                          q=request.args.get('q', ''),
+                          sync_status=sync_status)
+
+@app.template_global()
+def thumbnail_url(video, fmt=None):
+    """URL of a video's cached thumbnail in the given format (default: the fallback), or None"""
+    names = video.get('thumbnail') or []
+    if fmt:
+        names = [name for name in names if name.endswith('.' + fmt)]
+    return url_for('thumbnail', name=names[-1]) if names else None
+
+@app.route('/thumbnails/<path:name>')
+def thumbnail(name):
+    """Serve a cached thumbnail; names are content hashes, so they never change"""
+    path = archiver.thumbnails.path(name)
+    if not path or not os.path.exists(path):
+        abort(404)
+    response = send_from_directory(archiver.thumbnails.cache_dir, name, max_age=MEDIA_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/videos')
+def api_videos():
+    """A page of videos as JSON, for the "Load more" buttons"""
+    listing = _list_videos()
+    for video in listing['videos']:
+        video['watch_url'] = url_for('watch_video', video_id=video['id'])
+        video['thumbnail_url'] = thumbnail_url(video)
+        video['thumbnail_webp_url'] = thumbnail_url(video, 'webp')
+        video['delete_url'] = url_for('delete_video', video_id=video['id'])
+    return jsonify(listing)
+
+@app.route('/search')
+def search():
+    """Search results page"""
+    query = request.args.get('q', '').strip()
+    results = archiver.search_videos(query, limit=SEARCH_RESULTS) if query else []
+    return render_template('search.html',
+                          q=query,
+                          results=results,
+                          playlists=archiver.playlists,
                           sync_status=sync_status)
 
+@app.route('/api/search')
+def api_search():
+    """Ranked search results as JSON, for search-as-you-type"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), SEARCH_RESULTS))
+    results = archiver.search_videos(query, limit=limit) if query else []
+    for video in results:
+        video['watch_url'] = url_for('watch_video', video_id=video['id'])
+    return jsonify({"query": query, "results": results})
+
 @app.route('/add_playlist', methods=['GET', 'POST'])
 def add_playlist():
     """Add a new playlist"""
@@ -285,6 +403,13 @@ def handle_sync_playlist(playlist_id):
     result = sync_playlist(playlist_id)
     return jsonify(result)
 
+@app.route('/optimize_faststart', methods=['POST'])
+def handle_optimize_faststart():
+    """Queue a fast-start remux of the archived MP4 files"""
+    archiver.enqueue_faststart()
+    runner.wake()
+    return redirect(url_for('settings'))
+
 @app.route('/watch/<video_id>')
 def watch_video(video_id):
     """Watch a downloaded video"""
@@ -307,17 +432,49 @@ def watch_video(video_id):
                           video=video_info,
                           video_id=video_id,  # Pass video_id explicitly for the delete form
                           video_path=os.path.basename(video_file),
+                          # Changes when the file is remuxed in place, so cached copies are not reused
+                          stream_version=media_etag(os.stat(video_file)) if os.path.exists(video_file) else None,
                           sync_status=sync_status)
 
-@app.route('/video/<path:filename>')
-def serve_video(filename):
-    """Serve a video file"""
-    return send_from_directory(os.path.abspath(archiver.download_dir), filename)
+@app.route('/stream/<video_id>')
+def stream_video(video_id):
+    """Stream a video file from its catalog path with range and cache support"""
+    video_file = archiver.find_video_file(video_id)
+    if not video_file or not os.path.exists(video_file):
+        abort(404)
+    
+    return send_media(video_file, archiver.download_dir,
+                      offload=archiver.config.get("media_offload"),
+                      offload_prefix=archiver.config.get("media_offload_prefix", "/protected/"),
+                      version=request.args.get('v'))
 
 @app.route('/status')
 def get_status():
     """API endpoint to get current sync status"""
-    return jsonify(sync_status)
+    return jsonify(dict(sync_status, jobs=archiver.jobs.counts(),
+                        telemetry=archiver.telemetry.snapshot(),
+                        bandwidth=archiver.bandwidth.snapshot(),
+                        concurrency=archiver.concurrency.snapshot() if archiver.concurrency else None))
+
+@app.route('/events')
+def event_stream():
+    """Server-Sent Events stream of sync status and download events"""
+    client = events.subscribe()
+    response = Response(stream_with_context(events.stream(client, initial=[("status", dict(sync_status))])),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format"""
+    for state, count in archiver.jobs.counts().items():
+        metrics.JOBS.set(count, state=state)
+    metrics.ACTIVE_DOWNLOADS.set(archiver.telemetry.active_count)
+    metrics.EVENT_STREAM_CLIENTS.set(events.client_count)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/delete_video/<video_id>', methods=['POST'])
 def delete_video(video_id):
@@ -345,14 +502,29 @@ def delete_video(video_id):
 def settings():
     """Settings page"""
     if request.method == 'POST':
+        try:
+            bandwidth_schedule = parse_schedule(request.form.get('bandwidth_schedule', ''))
+        except ValueError as e:
+            return render_template('settings.html',
+                                  config=archiver.config,
+                                  bandwidth_schedule=request.form.get('bandwidth_schedule', ''),
+                                  error=str(e),
+                                  sync_status=sync_status), 400
+        bandwidth_limit = float(request.form.get('bandwidth_limit') or 0)
+        
         # Update settings
         new_config = {
             "download_dir": request.form.get('download_dir', DOWNLOAD_DIR),
             "max_quality": request.form.get('max_quality', "bestvideo[height<=1080]+bestaudio/best[height<=1080]"),
             "concurrent_downloads": int(request.form.get('concurrent_downloads', 1)),
+            "concurrent_playlists": int(request.form.get('concurrent_playlists', 3)),
+            "adaptive_concurrency": 'adaptive_concurrency' in request.form,
+            "max_concurrent_downloads": int(request.form.get('max_concurrent_downloads', 8)),
             "auto_sync": 'auto_sync' in request.form,
             "sync_interval": int(request.form.get('sync_interval', 24)),
-            "sync_time": request.form.get('sync_time', "00:00")
+            "sync_time": request.form.get('sync_time', "00:00"),
+            "bandwidth_limit": int(bandwidth_limit * MB) or None,
+            "bandwidth_schedule": bandwidth_schedule
         }
         
         archiver.update_config(new_config)
@@ -368,8 +540,21 @@ def settings():
     
     return render_template('settings.html',
                           config=archiver.config,
+                          bandwidth_schedule=format_schedule(archiver.config.get("bandwidth_schedule")),
                           sync_status=sync_status)
 
+def run_stats_rescan():
+    """Periodically rescan the download directory to correct drift in the storage totals"""
+    while True:
+        interval = archiver.config.get("stats_rescan_interval", 24)
+        if not interval:
+            return
+        time.sleep(interval * 3600)
+        try:
+            archiver.rescan_storage_stats()
+        except Exception as e:
+            print(f"Error rescanning storage: {str(e)}")
+
 def start_background_tasks():
     """Start background tasks like scheduler"""
     global scheduler_running
@@ -393,6 +578,12 @@ def start_background_tasks():
 # Initialize background tasks when the module is loaded
 start_background_tasks()
 
+runner.start()
+
+stats_thread = threading.Thread(target=run_stats_rescan)
+stats_thread.daemon = True  # Make thread a daemon so it exits when main thread exits
+stats_thread.start()
+
 def main():
     port = int(os.environ.get('PORT', DEFAULT_PORT))
     app.run(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,98 @@
+"""
+YouTube Archiver Library - Playlist Entry Cache
+
+This module provides the cache of playlist entries used to show which videos
+of a playlist are not downloaded yet without enumerating it on every view.
+"""
+
+import time
+import threading
+
+
+class PlaylistEntryCache:
+    """Playlist entries keyed by playlist ID, with a TTL
+
+    ``get`` with ``wait=False`` never blocks on the remote enumeration: it
+    returns whatever is cached (possibly stale, possibly nothing) and starts
+    a background refresh when the entry is missing or older than ``ttl``
+    seconds (stale-while-revalidate).
+    """
+
+    def __init__(self, fetch, ttl=3600):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = set()
+
+    def put(self, playlist_id, entries):
+        """Store freshly enumerated entries for a playlist"""
+        slim = [{"id": entry["id"], "title": entry.get("title")} for entry in entries]
+        with self._lock:
+            self._entries[playlist_id] = (time.time(), slim)
+        return slim
+
+    def invalidate(self, playlist_id):
+        with self._lock:
+            self._entries.pop(playlist_id, None)
+
+    def status(self, playlist_id):
+        """Return a dict describing the cached entries for a playlist"""
+        with self._lock:
+            cached = self._entries.get(playlist_id)
+            refreshing = playlist_id in self._refreshing
+        return {
+            "cached": cached is not None,
+            "fetched_at": cached[0] if cached else None,
+            "fresh": cached is not None and time.time() - cached[0] < self.ttl,
+            "refreshing": refreshing
+        }
+
+    def get(self, playlist_id, wait=True):
+        """Return the entries of a playlist
+
+        Args:
+            playlist_id: ID of the playlist
+            wait: If True, enumerate synchronously when the cache is missing or
+                stale. If False, return the cached entries (or None) and refresh
+                in the background.
+
+        Returns:
+            list: Entries as dicts with ``id`` and ``title``, or None
+        """
+        with self._lock:
+            cached = self._entries.get(playlist_id)
+
+        if cached is not None and time.time() - cached[0] < self.ttl:
+            return cached[1]
+
+        if wait:
+            return self.put(playlist_id, self.fetch(playlist_id))
+
+        self.refresh(playlist_id)
+        return cached[1] if cached else None
+
+    def refresh(self, playlist_id):
+        """Re-enumerate a playlist in a background thread
+
+        Returns:
+            bool: False if a refresh of this playlist is already running
+        """
+        with self._lock:
+            if playlist_id in self._refreshing:
+                return False
+            self._refreshing.add(playlist_id)
+
+        def run():
+            try:
+                self.put(playlist_id, self.fetch(playlist_id))
+            except Exception as e:
+                print(f"Error refreshing playlist {playlist_id}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(playlist_id)
+
+        thread = threading.Thread(target=run, name=f"playlist-refresh-{playlist_id}")
+        thread.daemon = True
+        thread.start()
+        return True
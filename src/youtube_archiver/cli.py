@@ -5,20 +5,80 @@ Command-line interface for the YouTube Archiver.
 """
 
 import argparse
+import humanize
 from .core import YouTubeArchiver
+from .jobs import JobRunner, job_time
+
+def print_download(event, data):
+    """Print the transfer figures of each finished download"""
+    telemetry = data.get("telemetry")
+    if event != "download_finished" or not telemetry:
+        return
+    speed = telemetry["downloaded_bytes"] / telemetry["download_seconds"] if telemetry["download_seconds"] else 0
+    print(f"  {data['title']}: {humanize.naturalsize(telemetry['downloaded_bytes'])} in "
+          f"{telemetry['download_seconds']:.1f}s ({humanize.naturalsize(speed)}/s), "
+          f"merge {telemetry['merge_seconds']:.1f}s, post-processing "
+          f"{sum(telemetry['postprocess_seconds'].values()):.1f}s")
+
+def print_concurrency(event, data):
+    """Print each change made by the adaptive concurrency controller"""
+    if event != "concurrency_changed":
+        return
+    throughput = f" at {humanize.naturalsize(data['throughput'])}/s" if data.get("throughput") else ""
+    print(f"  Concurrency {data['action']} ({data['reason']}{throughput}): "
+          f"{data['from']['videos']} -> {data['to']['videos']} videos, "
+          f"{data['from']['fragments']} -> {data['to']['fragments']} fragments")
+
+def print_sync_telemetry(totals):
+    """Print the aggregated transfer figures of a playlist sync"""
+    if not totals:
+        return
+    print(f"  Transferred {humanize.naturalsize(totals['bytes'])} for {totals['videos']} videos "
+          f"({totals['failed']} failed), "
+          f"throughput {humanize.naturalsize(totals['throughput'] or 0)}/s, "
+          f"per-download speed {humanize.naturalsize(totals['average_speed'] or 0)}/s, "
+          f"merging {totals['merge_seconds']:.1f}s")
 
 def main():
     parser = argparse.ArgumentParser(description="YouTube Playlist Archiver")
     parser.add_argument("--add-playlist", help="Add a playlist URL to archive")
     parser.add_argument("--sync", help="Sync a playlist by ID", metavar="PLAYLIST_ID")
     parser.add_argument("--sync-all", action="store_true", help="Sync all playlists")
+    parser.add_argument("--sync-mode", nargs=2, metavar=("PLAYLIST_ID", "MODE"),
+                        help="Set a playlist's scan mode: full or incremental")
+    parser.add_argument("--enqueue-only", action="store_true",
+                        help="With --sync/--sync-all/--optimize-faststart, only queue the jobs "
+                             "for the web process to run")
+    parser.add_argument("--run-queue", action="store_true",
+                        help="Run every job in the queue, including jobs left over from an interrupted run")
+    parser.add_argument("--jobs", action="store_true", help="List queued and recent sync jobs")
+    parser.add_argument("--failures", action="store_true",
+                        help="List failed downloads, including quarantined videos")
+    parser.add_argument("--retry-failed", metavar="VIDEO_ID",
+                        help="Let the next sync try a failed or quarantined video again")
     parser.add_argument("--list", action="store_true", help="List all playlists")
     parser.add_argument("--stats", action="store_true", help="Show storage statistics")
+    parser.add_argument("--search", metavar="QUERY",
+                        help="Search archived videos by title, uploader or playlist")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Rebuild the video file index from the download directory")
+    parser.add_argument("--backfill-thumbnails", action="store_true",
+                        help="Build listing thumbnails for archived videos that have none")
+    parser.add_argument("--optimize-faststart", action="store_true",
+                        help="Remux archived MP4 files so playback can start before they are fully loaded")
     parser.add_argument("--config-dir", default="./config", help="Configuration directory")
     parser.add_argument("--download-dir", help="Download directory")
     args = parser.parse_args()
     
-    archiver = YouTubeArchiver(config_dir=args.config_dir)
+    # Commands that change the catalog take the catalog lock, which the web
+    # app holds while it runs; the others open the catalog read-only
+    writes = any([args.add_playlist, args.sync_mode, args.run_queue, args.retry_failed,
+                  args.reconcile, args.backfill_thumbnails, args.download_dir, args.stats,
+                  (args.sync or args.sync_all or args.optimize_faststart) and not args.enqueue_only])
+    try:
+        archiver = YouTubeArchiver(config_dir=args.config_dir, read_only=not writes)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}. Stop the web app first, or use --enqueue-only to queue syncs for it.\n")
     
     if args.download_dir:
         archiver.update_config({"download_dir": args.download_dir})
@@ -30,22 +90,91 @@ def main():
         else:
             print("Failed to add playlist")
     
+    if args.sync_mode:
+        playlist_id, mode = args.sync_mode
+        if archiver.set_playlist_sync_mode(playlist_id, mode):
+            print(f"Scan mode for {playlist_id} set to {mode}")
+        else:
+            print("Failed to set scan mode (unknown playlist or mode)")
+    
+    # Jobs asked for by this invocation; only these are run unless --run-queue is given
+    requested = set()
+    
     if args.sync:
-        print(f"Syncing playlist {args.sync}...")
-        result = archiver.sync_playlist(args.sync, 
-                                       callback=lambda task, progress: print(f"{task} - {progress}%"))
-        if result["success"]:
-            print(f"Sync completed: {result['new_videos']} new videos downloaded")
+        job, created = archiver.enqueue_sync(args.sync)
+        if job is None:
+            print(f"Unknown playlist: {args.sync}")
         else:
-            print(f"Sync failed: {result['error']}")
+            requested.add(job["id"])
+            print(f"{'Queued' if created else 'Already queued'}: sync of playlist {args.sync}")
     
     if args.sync_all:
-        print("Syncing all playlists...")
-        results = archiver.sync_all_playlists(
-            callback=lambda task, progress: print(f"{task} - {progress}%"))
+        jobs = archiver.enqueue_sync_all()
+        requested.update(job["id"] for job in jobs)
+        print(f"Queued {len(jobs)} playlists for syncing")
+    
+    if args.optimize_faststart:
+        job, created = archiver.enqueue_faststart()
+        requested.add(job["id"])
+        print(f"{'Queued' if created else 'Already queued'}: fast-start optimization")
+    
+    if (requested or args.run_queue) and not args.enqueue_only:
+        # Jobs another process is running are left alone
+        results = []
+        archiver.add_listener(print_download)
+        archiver.add_listener(print_concurrency)
+        runner = JobRunner(archiver, archiver.jobs,
+                           callback=lambda task, progress: print(f"{task} - {progress}%"),
+                           on_job_finished=lambda job, result: results.append((job, result)))
+        runner.drain(job_ids=None if args.run_queue else requested)
         
-        success_count = sum(1 for r in results if r["success"])
-        print(f"Sync completed: {success_count}/{len(results)} playlists synced successfully")
+        for job, result in results:
+            if job["kind"] == "optimize_faststart":
+                if result["success"]:
+                    print(f"Optimized for fast start: {result['remuxed']} remuxed, {result['already']} already "
+                          f"fast-start, {result['skipped']} skipped, {result['failed']} failed")
+                    if result['skipped'] and not result['ffmpeg']:
+                        print("Install ffmpeg to remux files whose index is at the end")
+                else:
+                    print(f"Fast-start optimization failed: {result['error']}")
+            elif result["success"]:
+                print(f"Synced {result['playlist_title']}: {result['new_videos']} new videos downloaded")
+                if result.get('skipped_videos'):
+                    print(f"  Skipped {len(result['skipped_videos'])} previously failed videos (see --failures)")
+                print_sync_telemetry(result.get('telemetry'))
+            else:
+                print(f"Sync of {result.get('playlist_id')} failed: {result['error']}")
+        syncs = [result for job, result in results if job["kind"] == "sync_playlist"]
+        if syncs:
+            success_count = sum(1 for r in syncs if r["success"])
+            print(f"Sync completed: {success_count}/{len(syncs)} playlists synced successfully")
+    
+    if args.jobs:
+        jobs = archiver.jobs.list()
+        if not jobs:
+            print("No sync jobs")
+        for job in jobs:
+            title = archiver.playlists.get(job['playlist_id'], {}).get('title', job['playlist_id'] or job['kind'])
+            print(f"- {job['id']} {job['state']}: {title} (attempts: {job['attempts']}, "
+                  f"updated: {job_time(job['updated_at'])})")
+            if job['error']:
+                print(f"  Error: {job['error']}")
+    
+    if args.retry_failed:
+        if archiver.failures.release(args.retry_failed):
+            print(f"{args.retry_failed} will be retried on the next sync")
+        else:
+            print(f"{args.retry_failed} has no recorded failures")
+    
+    if args.failures:
+        failures = archiver.failures.entries()
+        if not failures:
+            print("No failed downloads")
+        for failure in failures:
+            status = "QUARANTINED" if failure['quarantined'] else "retrying"
+            title = failure.get('title') or failure['video_id']
+            print(f"- {title} (ID: {failure['video_id']}) {status} until {job_time(failure['retry_at'])}")
+            print(f"  {failure['kind']} ({failure['reason']}), {failure['attempts']} attempts: {failure['error']}")
     
     if args.list:
         print("Your playlists:")
@@ -55,6 +184,27 @@ def main():
             print(f"  Last synced: {playlist['last_synced'] or 'Never'}")
             print()
     
+    if args.search:
+        results = archiver.search_videos(args.search, limit=20)
+        if not results:
+            print(f"No videos match \"{args.search}\"")
+        for video in results:
+            print(f"- {video['title']} (ID: {video['id']})")
+            if video.get('uploader'):
+                print(f"  Uploader: {video['uploader']}")
+    
+    if args.reconcile:
+        result = archiver.reconcile_file_index()
+        print(f"Indexed {result['indexed']} video files ({result['updated']} updated, "
+              f"{result['missing']} missing)")
+    
+    if args.backfill_thumbnails:
+        result = archiver.backfill_thumbnails()
+        print(f"Built thumbnails for {result['queued']} videos ({result['cached']} already cached, "
+              f"{result['skipped']} skipped)")
+        if result['skipped'] and not archiver.thumbnails.ffmpeg:
+            print("Install ffmpeg to extract poster frames for videos without a saved thumbnail")
+    
     if args.stats:
         stats = archiver.get_storage_stats()
         print("Storage Statistics:")
@@ -62,6 +212,10 @@ def main():
         print(f"Total storage used: {stats['total_size_human']}")
         if stats['video_count'] > 0:
             print(f"Average video size: {stats['average_size_human']}")
+        for ext, size in sorted(stats['by_extension'].items()):
+            print(f"  {ext}: {humanize.naturalsize(size)}")
+    
+    archiver.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+"""
+YouTube Archiver Library - Adaptive Concurrency
+
+This module provides an AIMD (additive increase, multiplicative decrease)
+controller for download concurrency. It is told the outcome and throughput
+of every download. Rate limiting (HTTP 429), throttled streams and
+forbidden responses halve both the number of videos downloaded at once and
+the number of fragments fetched per video. Rounds of clean downloads probe
+one step higher, alternating between the two levels, and a step that does
+not raise aggregate throughput is undone, so concurrency settles at the
+ceiling of the current network.
+"""
+
+import re
+import time
+import threading
+import statistics
+from collections import deque
+from .scheduler import DownloadSlots
+
+# Error classes that mean we are asking for too much
+CONGESTION = ("rate_limited", "throttled", "forbidden")
+
+ERROR_CLASSES = (
+    ("rate_limited", re.compile(r"\b429\b|too many requests", re.I)),
+    ("forbidden", re.compile(r"\b403\b|forbidden", re.I)),
+    ("throttled", re.compile(r"throttl", re.I)),
+    ("network", re.compile(r"timed? ?out|connection|reset by peer|temporary failure|unreachable", re.I)),
+)
+
+
+def classify_error(error):
+    """Return the class of a download error message, or "other" """
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(error or ""):
+            return name
+    return "other"
+
+
+class AdaptiveConcurrency:
+    """Video- and fragment-level download concurrency tuned at runtime
+
+    Args:
+        videos: Initial number of concurrent video downloads
+        fragments: Initial concurrent fragment downloads per video
+        min_videos, max_videos: Bounds for ``videos``
+        min_fragments, max_fragments: Bounds for ``fragments``
+        throttle_rate: Bytes per second below which a finished download counts as
+            throttled, or None to only react to errors
+        backoff: Factor applied to both levels on congestion
+        min_gain: Fractional throughput gain a probe step must bring to be kept
+        hold_rounds: Rounds to wait after a backoff or undone step before probing again
+        cooldown: Seconds after a backoff during which further congestion is ignored,
+            since downloads already in flight report the same congestion
+        on_decision: Optional function(decision) called on every change
+        slots: Optional DownloadSlots to resize instead of a new budget
+    """
+
+    def __init__(self, videos=1, fragments=5, min_videos=1, max_videos=8, min_fragments=1,
+                 max_fragments=16, throttle_rate=None, backoff=0.5, min_gain=0.05, hold_rounds=3,
+                 cooldown=30.0, on_decision=None, slots=None):
+        self.min_videos, self.max_videos = max(1, min_videos), max(1, min_videos, max_videos)
+        self.min_fragments, self.max_fragments = max(1, min_fragments), max(1, min_fragments, max_fragments)
+        self.videos = min(self.max_videos, max(self.min_videos, videos))
+        self.fragments = min(self.max_fragments, max(self.min_fragments, fragments))
+        self.throttle_rate = throttle_rate
+        self.backoff = backoff
+        self.min_gain = min_gain
+        self.hold_rounds = hold_rounds
+        self.cooldown = cooldown
+        self.on_decision = on_decision
+
+        self.slots = slots or DownloadSlots(self.videos)
+        self.slots.resize(self.videos)
+        self.decisions = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._round = []
+        self._hold = 0
+        self._probe = None
+        self._next_probe = "videos"
+        self._last_throughput = None
+        self._last_backoff = None
+
+    @classmethod
+    def from_config(cls, config, on_decision=None, slots=None):
+        return cls(videos=int(config.get("concurrent_downloads", 1)),
+                   fragments=int(config.get("concurrent_fragment_downloads", 5)),
+                   min_videos=int(config.get("min_concurrent_downloads", 1)),
+                   max_videos=int(config.get("max_concurrent_downloads", 8)),
+                   min_fragments=int(config.get("min_fragment_downloads", 1)),
+                   max_fragments=int(config.get("max_fragment_downloads", 16)),
+                   throttle_rate=config.get("throttled_rate_limit", 100000),
+                   on_decision=on_decision,
+                   slots=slots)
+
+    def observe(self, success, error=None, throughput=None, shaped=False):
+        """Feed back the outcome of one download
+
+        Args:
+            success: Whether the download succeeded
+            error: The error message of a failed download
+            throughput: Bytes per second the download achieved
+            shaped: Whether our own bandwidth cap was in effect, in which case
+                slow downloads are not taken as throttling
+
+        Returns:
+            dict: The decision taken, or None if nothing changed
+        """
+        with self._lock:
+            decision = self._observe(success, error, throughput, shaped)
+            if decision:
+                self.decisions.append(decision)
+        if decision and self.on_decision:
+            try:
+                self.on_decision(decision)
+            except Exception as e:
+                print(f"Error recording concurrency decision: {str(e)}")
+        return decision
+
+    def _observe(self, success, error, throughput, shaped):
+        if success:
+            throttled = (not shaped and self.throttle_rate and throughput is not None
+                         and throughput < self.throttle_rate)
+            signal = "throttled" if throttled else None
+        else:
+            signal = classify_error(error)
+
+        if signal in CONGESTION:
+            now = time.monotonic()
+            if self._last_backoff is not None and now - self._last_backoff < self.cooldown:
+                return None
+            self._last_backoff = now
+            decision = self._set(max(self.min_videos, int(self.videos * self.backoff)),
+                                 max(self.min_fragments, int(self.fragments * self.backoff)),
+                                 "decrease", signal, throughput)
+            self._restart(hold=True)
+            return decision
+
+        if not success or not throughput:
+            # Failures such as unavailable videos say nothing about capacity
+            return None
+
+        # A round is as many clean downloads as are allowed at once
+        self._round.append(throughput)
+        if len(self._round) < self.videos:
+            return None
+        aggregate = statistics.median(self._round) * self.videos
+        self._round = []
+
+        if self._hold:
+            self._hold -= 1
+            self._last_throughput = aggregate
+            return None
+
+        if self._probe and self._last_throughput and aggregate < self._last_throughput * (1 + self.min_gain):
+            # The last step bought nothing: undo it and stay here for a while
+            probe = self._probe
+            decision = self._set(self.videos - (probe == "videos"), self.fragments - (probe == "fragments"),
+                                 "decrease", "plateau", aggregate)
+            self._restart(hold=True)
+            self._last_throughput = aggregate
+            return decision
+
+        self._last_throughput = aggregate
+        probe = self._pick_probe()
+        if probe is None:
+            self._probe = None
+            return None
+        decision = self._set(self.videos + (probe == "videos"), self.fragments + (probe == "fragments"),
+                             "increase", "probe", aggregate)
+        self._probe = probe
+        return decision
+
+    def _pick_probe(self):
+        order = ("videos", "fragments") if self._next_probe == "videos" else ("fragments", "videos")
+        for dimension in order:
+            if (dimension == "videos" and self.videos < self.max_videos) or \
+               (dimension == "fragments" and self.fragments < self.max_fragments):
+                self._next_probe = "fragments" if dimension == "videos" else "videos"
+                return dimension
+        return None
+
+    def _restart(self, hold):
+        self._round = []
+        self._probe = None
+        self._hold = self.hold_rounds if hold else 0
+
+    def _set(self, videos, fragments, action, reason, throughput):
+        decision = {
+            "at": time.time(),
+            "action": action,
+            "reason": reason,
+            "from": {"videos": self.videos, "fragments": self.fragments},
+            "to": {"videos": videos, "fragments": fragments},
+            "throughput": throughput
+        }
+        self.videos, self.fragments = videos, fragments
+        self.slots.resize(videos)
+        return decision
+
+    def snapshot(self):
+        """Return the current levels, their bounds and recent decisions"""
+        with self._lock:
+            return {
+                "videos": self.videos,
+                "fragments": self.fragments,
+                "bounds": {"videos": [self.min_videos, self.max_videos],
+                           "fragments": [self.min_fragments, self.max_fragments]},
+                "decisions": list(self.decisions)
+            }
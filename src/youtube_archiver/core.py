@@ -11,19 +11,60 @@ This module provides core functionality for:
 import os
 import json
 import glob
+import time
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import yt_dlp
+from urllib.parse import urlsplit
 import humanize
+from .cache import PlaylistEntryCache
+from .listing import VideoIndex, SORT_KEYS, PLAYLIST_SORT_KEYS, ORDERS, encode_cursor, decode_cursor, page_keys
+from .membership import PlaylistMembership
+from .search import SearchIndex
+from .jobs import JobQueue
+from .telemetry import DownloadTelemetry
+from .shaper import BandwidthShaper
+from .concurrency import AdaptiveConcurrency
+from .failures import FailureLedger
+from .scheduler import DownloadSlots
+from .stats import StorageTotals
+from .thumbnails import ThumbnailPipeline, find_sidecar_thumbnail, remove_sidecar_thumbnails
+from .faststart import is_mp4, moov_first, remux_faststart
+from .storage import open_store, claim_catalog
+from .ytdl_pool import YoutubeDLPool
+from . import metrics
+
+# Extensions of files yt-dlp leaves in the download directory
+VIDEO_EXTENSIONS = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
+
+# Playlist sync modes and the number of leading entry IDs remembered per playlist
+SYNC_MODES = ("full", "incremental")
+HEAD_SIZE = 50
 
 class YouTubeArchiver:
-    def __init__(self, config_dir="./config", download_dir="./youtube_archive"):
-        """Initialize YouTube Archiver with configuration"""
+    def __init__(self, config_dir="./config", download_dir="./youtube_archive", read_only=False):
+        """Initialize YouTube Archiver with configuration
+        
+        Only one process at a time may change a catalog. Unless read_only is
+        set, the archiver takes the catalog lock and raises RuntimeError when
+        another process (such as the web app) already holds it. A read-only
+        archiver may still queue jobs for the process holding the lock.
+        """
         self.config_dir = config_dir
         self.download_dir = download_dir
         self.playlists_file = os.path.join(config_dir, "playlists.json")
         self.videos_file = os.path.join(config_dir, "downloaded_videos.json")
         self.config_file = os.path.join(config_dir, "config.json")
         
+        # Guards the in-memory catalog and its files against concurrent downloads
+        self._catalog_lock = threading.RLock()
+        
+        # Videos claimed for download by a running sync, guarded by _catalog_lock,
+        # so playlists that share a video never download it twice at once
+        self._in_flight = set()
+        
         # Create necessary directories
         os.makedirs(config_dir, exist_ok=True)
         os.makedirs(download_dir, exist_ok=True)
@@ -35,10 +76,94 @@ class YouTubeArchiver:
         if "download_dir" in self.config:
             self.download_dir = self.config["download_dir"]
             os.makedirs(self.download_dir, exist_ok=True)
+        
+        # Held until close; see claim_catalog
+        self.catalog_claim = None
+        if not read_only:
+            self.catalog_claim = claim_catalog(config_dir)
+            if self.catalog_claim is None:
+                raise RuntimeError(f"The catalog in {config_dir} is in use by another process")
+        
+        # Catalog persistence backend ("json" or "sqlite")
+        self.store = open_store(self.config, config_dir, self.playlists_file, self.videos_file,
+                                read_only=read_only)
             
         self.playlists = self._load_playlists()
         self.downloaded_videos = self._load_downloaded_videos()
         
+        # video_id -> file path, seeded from the paths recorded in the catalog
+        self.file_index = {video_id: video["file_path"]
+                           for video_id, video in self.downloaded_videos.items()
+                           if video.get("file_path")}
+        
+        # Playlist -> ordered video IDs and video -> playlists. Catalogs from
+        # before the index existed are seeded from each video's playlist_id.
+        self.membership = PlaylistMembership()
+        memberships = self.store.load_memberships()
+        self.membership.rebuild(memberships)
+        if not memberships and self.membership.seed(self.downloaded_videos):
+            self.store.save_memberships(self.membership.snapshot())
+        
+        # Sorted views of the catalog for paginated listings
+        self.video_index = VideoIndex()
+        self.video_index.rebuild(self.downloaded_videos)
+        
+        # Inverted index over titles, uploaders and playlist titles
+        self.search_index = SearchIndex()
+        self.search_index.rebuild(self._search_documents())
+        
+        # Running storage totals, seeded from the catalog's file sizes on first use
+        self.storage_totals = None
+        
+        # Test mode: YouTube URLs are served by a local stand-in server, and
+        # yt-dlp only uses the stand-in's extractor
+        self.test_server = self.config.get("test_server")
+        
+        # Reusable yt-dlp sessions shared by extractions and downloads
+        if self.test_server:
+            from .standin import standin_extractor
+            extractor = standin_extractor(self.test_server)
+            self.ytdl_pool = YoutubeDLPool(extractors=[extractor],
+                                           params={"allowed_extractors": [extractor.IE_NAME]})
+        else:
+            self.ytdl_pool = YoutubeDLPool()
+        
+        # Durable queue of sync jobs shared with other processes
+        self.jobs = JobQueue(os.path.join(self.config_dir, "jobs.json"),
+                             lease_seconds=self.config.get("job_lease_seconds", 120))
+        
+        # Byte-level progress of downloads, aggregated per playlist sync
+        self.telemetry = DownloadTelemetry()
+        
+        # Failed downloads, retried with backoff or quarantined
+        self.failures = FailureLedger.from_config(os.path.join(self.config_dir, "failures.json"), self.config)
+        
+        # Global download rate cap, shared by all active downloads
+        self.bandwidth = BandwidthShaper.from_config(self.config)
+        
+        # Download slots shared by every playlist being synced
+        self.slots = DownloadSlots(self.config.get("concurrent_downloads", 1))
+        
+        # Video- and fragment-level concurrency tuned from download outcomes,
+        # when adaptive_concurrency is on
+        self.concurrency = None
+        self._configure_concurrency()
+        
+        # Functions called with (event, data) as downloads start and finish
+        self.listeners = []
+        
+        # Used to remux downloads to fast-start MP4
+        self.ffmpeg = shutil.which("ffmpeg")
+        
+        # Small cached thumbnails for the listings, built in worker processes
+        self.thumbnails = ThumbnailPipeline.from_config(
+            self.config.get("thumbnail_dir") or os.path.join(config_dir, "thumbnails"), self.config,
+            on_done=self._record_thumbnail)
+        
+        # Playlist entries, refreshed by syncs and on demand
+        self.entry_cache = PlaylistEntryCache(self._fetch_playlist_entries,
+                                              ttl=self.config.get("playlist_cache_ttl", 3600))
+        
     def _load_config(self):
         """Load application configuration"""
         if os.path.exists(self.config_file):
@@ -50,6 +175,7 @@ class YouTubeArchiver:
                 "download_dir": self.download_dir,
                 "max_quality": "bestvideo[height<=1080]+bestaudio/best[height<=1080]",
                 "concurrent_downloads": 1,
+                "concurrent_playlists": 3,
                 "auto_sync": False,
                 "sync_interval": 24,  # hours
                 "sync_time": "00:00"  # Default to midnight
@@ -66,39 +192,117 @@ class YouTubeArchiver:
     
     def _load_playlists(self):
         """Load playlist data"""
-        if os.path.exists(self.playlists_file):
-            with open(self.playlists_file, 'r') as f:
-                return json.load(f)
-        else:
-            # Empty playlists dictionary
-            playlists = {}
-            self._save_playlists(playlists)
-            return playlists
+        return self.store.load_playlists()
     
     def _save_playlists(self, playlists=None):
         """Save playlist data"""
-        if playlists is not None:
-            self.playlists = playlists
-        with open(self.playlists_file, 'w') as f:
-            json.dump(self.playlists, f, indent=2)
+        with self._catalog_lock:
+            if playlists is not None:
+                self.playlists = playlists
+            with metrics.CATALOG_SAVE_SECONDS.time(catalog="playlists"):
+                self.store.save_playlists(self.playlists)
+    
+    def add_listener(self, listener):
+        """Register a function(event, data) to be told about download events
+        
+        Events are "download_started" and "download_finished"; ``data`` has
+        the video_id, title and playlist_id, plus ``success`` when finished.
+        "concurrency_changed" carries a decision of the adaptive concurrency
+        controller. Listeners are called from the download worker threads.
+        """
+        self.listeners.append(listener)
+    
+    def _emit(self, event, data):
+        for listener in list(self.listeners):
+            try:
+                listener(event, data)
+            except Exception as e:
+                print(f"Error in event listener: {str(e)}")
+    
+    def _configure_concurrency(self):
+        """Create or drop the adaptive concurrency controller to match the config
+        
+        The controller resizes the shared slot budget in place, so syncs
+        already holding it follow its decisions.
+        """
+        if self.config.get("adaptive_concurrency"):
+            self.concurrency = AdaptiveConcurrency.from_config(self.config, slots=self.slots,
+                                                               on_decision=self._record_concurrency_decision)
+        else:
+            self.concurrency = None
+            self.slots.resize(self.config.get("concurrent_downloads", 1))
+    
+    def _record_concurrency_decision(self, decision):
+        self.telemetry.record_decision(decision)
+        metrics.CONCURRENCY_DECISIONS.inc(action=decision["action"], reason=decision["reason"])
+        for level, value in decision["to"].items():
+            metrics.CONCURRENCY_LIMIT.set(value, level=level)
+        self._emit("concurrency_changed", decision)
+    
+    def download_slots(self):
+        """Return the download slot budget for syncing several playlists at once
+        
+        With adaptive concurrency the controller resizes it at runtime;
+        otherwise it holds ``concurrent_downloads`` slots.
+        """
+        return self.slots
     
     def _load_downloaded_videos(self):
         """Load downloaded videos data"""
-        if os.path.exists(self.videos_file):
-            with open(self.videos_file, 'r') as f:
-                return json.load(f)
-        else:
-            # Empty videos dictionary
-            videos = {}
-            self._save_downloaded_videos(videos)
-            return videos
+        return self.store.load_videos()
     
     def _save_downloaded_videos(self, videos=None):
         """Save downloaded videos data"""
-        if videos is not None:
-            self.downloaded_videos = videos
-        with open(self.videos_file, 'w') as f:
-            json.dump(self.downloaded_videos, f, indent=2)
+        with self._catalog_lock:
+            if videos is not None:
+                self.downloaded_videos = videos
+            with metrics.CATALOG_SAVE_SECONDS.time(catalog="videos"):
+                self.store.save_videos(self.downloaded_videos)
+            if hasattr(self, "video_index"):
+                self.membership.seed(self.downloaded_videos)
+                self.video_index.rebuild(self.downloaded_videos)
+                self.search_index.rebuild(self._search_documents())
+    
+    def _search_fields(self, video_id, video):
+        """Return the searchable fields of a video record
+        
+        ``playlist_title`` holds the titles of every playlist the video is in.
+        """
+        titles = [self.playlists[playlist_id].get("title") or ""
+                  for playlist_id in sorted(self._video_playlists(video_id, video))
+                  if playlist_id in self.playlists]
+        return {
+            "title": video.get("title"),
+            "uploader": video.get("uploader"),
+            "playlist_title": " ".join(titles)
+        }
+    
+    def _reindex_search(self, video_ids):
+        """Refresh the search fields of archived videos whose playlists changed"""
+        for video_id in video_ids:
+            video = self.downloaded_videos.get(video_id)
+            if video is not None:
+                self.search_index.add(video_id, self._search_fields(video_id, video))
+    
+    def _video_playlists(self, video_id, video=None):
+        """Return the IDs of every playlist a video is in"""
+        playlists = set(self.membership.playlists(video_id))
+        if video and video.get("playlist_id"):
+            playlists.add(video["playlist_id"])
+        return playlists
+    
+    def _search_documents(self):
+        return {video_id: self._search_fields(video_id, video)
+                for video_id, video in self.downloaded_videos.items()}
+    
+    def _route_url(self, url):
+        """Point a YouTube URL at the stand-in server when in test mode"""
+        if not self.test_server:
+            return url
+        parts = urlsplit(url)
+        if not parts.netloc.endswith("youtube.com"):
+            return url
+        return self.test_server.rstrip("/") + parts.path + (f"?{parts.query}" if parts.query else "")
     
     def get_playlist_info(self, playlist_url):
         """Extract information about a playlist using yt-dlp"""
@@ -109,8 +313,11 @@ class YouTubeArchiver:
         }
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                playlist_info = ydl.extract_info(playlist_url, download=False)
+            with self.ytdl_pool.session(ydl_opts) as ydl:
+                start = time.perf_counter()
+                playlist_info = ydl.extract_info(self._route_url(playlist_url), download=False)
+                metrics.EXTRACT_INFO_SECONDS.observe(time.perf_counter() - start,
+                                                     playlist=playlist_info.get('id') or playlist_url)
                 return {
                     "id": playlist_info.get('id', ''),
                     "title": playlist_info.get('title', 'Unknown Playlist'),
@@ -127,71 +334,360 @@ class YouTubeArchiver:
         """Add a playlist to the archiver"""
         playlist_info = self.get_playlist_info(playlist_url)
         if playlist_info:
-            self.playlists[playlist_info['id']] = playlist_info
-            self._save_playlists()
+            with self._catalog_lock:
+                self.playlists[playlist_info['id']] = playlist_info
+                self.store.put_playlist(playlist_info['id'], playlist_info)
             return playlist_info['id']
         return None
     
     def remove_playlist(self, playlist_id):
         """Remove a playlist from the archiver"""
         if playlist_id in self.playlists:
-            del self.playlists[playlist_id]
-            self._save_playlists()
+            with self._catalog_lock:
+                del self.playlists[playlist_id]
+                self.store.remove_playlist(playlist_id)
+                members = self.membership.videos(playlist_id)
+                self.membership.remove_playlist(playlist_id)
+                self._reindex_search(members)
+            self.entry_cache.invalidate(playlist_id)
             return True
         return False
     
-    def get_playlist_videos(self, playlist_url):
+    def get_playlist_videos(self, playlist_url, playlist_id=None):
         """Get all videos in a playlist"""
+        return list(self.iter_playlist_entries(playlist_url, playlist_id))
+    
+    def iter_playlist_entries(self, playlist_url, playlist_id=None):
+        """Yield the videos in a playlist as yt-dlp pages through it
+        
+        The playlist is extracted without processing, so for paged playlists
+        each page is only fetched when iteration reaches it.
+        
+        Args:
+            playlist_url: URL of the playlist
+            playlist_id: ID to label metrics with, if known
+        """
+        label = playlist_id or playlist_url
+        playlist_url = self._route_url(playlist_url)
         ydl_opts = {
             'quiet': True,
             'extract_flat': True,
             'force_generic_extractor': False,
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            playlist_dict = ydl.extract_info(playlist_url, download=False)
-            videos = playlist_dict.get('entries', [])
+        with self.ytdl_pool.session(ydl_opts) as ydl:
+            with metrics.EXTRACT_INFO_SECONDS.time(playlist=label):
+                playlist_dict = ydl.extract_info(playlist_url, download=False, process=False)
+                if playlist_dict.get('_type') in ('url', 'url_transparent'):
+                    # The URL points elsewhere; let yt-dlp resolve it fully
+                    playlist_dict = ydl.extract_info(playlist_url, download=False)
+            
+            for entry in playlist_dict.get('entries') or []:
+                if entry and entry.get('id'):
+                    metrics.PLAYLIST_ENTRIES.inc(playlist=label)
+                    yield entry
+    
+    def set_playlist_sync_mode(self, playlist_id, mode):
+        """Choose between full and incremental scanning for a playlist"""
+        if playlist_id not in self.playlists or mode not in SYNC_MODES:
+            return False
+        with self._catalog_lock:
+            self.playlists[playlist_id]["sync_mode"] = mode
+            self.store.put_playlist(playlist_id, self.playlists[playlist_id])
+        return True
+    
+    def _use_incremental_scan(self, playlist):
+        """Whether the next sync of a playlist may stop at already-archived entries
         
-        return videos
+        Incremental playlists still get a full rescan every
+        ``full_rescan_interval`` hours, and always on their first sync.
+        """
+        if playlist.get("sync_mode") != "incremental" or not playlist.get("last_full_scan"):
+            return False
+        interval = self.config.get("full_rescan_interval", 168)
+        last_full_scan = datetime.fromisoformat(playlist["last_full_scan"])
+        return (datetime.now() - last_full_scan).total_seconds() < interval * 3600
+    
+    def _scan_playlist(self, playlist_id, incremental=False):
+        """Yield the entries of a playlist, stopping early in incremental mode
+        
+        An incremental scan stops after ``incremental_stop_after`` consecutive
+        entries that were already downloaded or were among the head entries
+        seen by the previous scan.
+        """
+        playlist = self.playlists[playlist_id]
+        known = set(self.downloaded_videos) | set(playlist.get("head_ids") or [])
+        stop_after = max(1, int(self.config.get("incremental_stop_after", 10)))
+        run = 0
+        
+        for entry in self.iter_playlist_entries(playlist["url"], playlist_id):
+            yield entry
+            if not incremental:
+                continue
+            if entry['id'] in known:
+                run += 1
+                if run >= stop_after:
+                    return
+            else:
+                run = 0
     
     def download_video(self, video_id, video_title, playlist_id=None):
         """Download a single video using yt-dlp"""
         video_url = f"https://www.youtube.com/watch?v={video_id}"
         output_template = os.path.join(self.download_dir, '%(title)s-%(id)s.%(ext)s')
+        final_paths = []
+        info = {}
+        
+        def capture_info(d):
+            if d.get('status') == 'finished' and d.get('info_dict'):
+                info.update(d['info_dict'])
         
         ydl_opts = {
             'format': self.config.get("max_quality", "bestvideo[height<=1080]+bestaudio/best[height<=1080]"),
             'outtmpl': output_template,
             'quiet': False,
             'no_warnings': False,
-            'concurrent_fragment_downloads': 5,
-            'throttledratelimit': 100000,  # 100KB/s minimum
+            'concurrent_fragment_downloads': (self.concurrency.fragments if self.concurrency
+                                              else self.config.get("concurrent_fragment_downloads", 5)),
             'merge_output_format': 'mp4',
+            'writethumbnail': self.config.get("thumbnails", True),
         }
         
+        # Below this speed yt-dlp assumes YouTube is throttling and re-extracts.
+        # Skip the check when our own cap leaves each download less than that.
+        min_rate = self.config.get("throttled_rate_limit", 100000)  # 100KB/s minimum
+        limit = self.bandwidth.current_limit()
+        workers = (self.concurrency.videos if self.concurrency
+                   else max(1, int(self.config.get("concurrent_downloads", 1))))
+        if min_rate and (limit is None or limit / workers >= min_rate):
+            ydl_opts['throttledratelimit'] = min_rate
+        
+        event = {"video_id": video_id, "title": video_title, "playlist_id": playlist_id}
+        self._emit("download_started", event)
+        progress_hook, postprocessor_hook = self.telemetry.start(video_id, video_title, playlist_id)
+        shaper_hook = self.bandwidth.start(video_id)
+        started = time.perf_counter()
+        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video_url])
+            # The post hook is called with the final filename once merging and
+            # post-processing are done
+            with self.ytdl_pool.session(ydl_opts, progress_hooks=[capture_info, progress_hook, shaper_hook],
+                                        postprocessor_hooks=[postprocessor_hook],
+                                        post_hooks=[final_paths.append]) as ydl:
+                ydl.download([self._route_url(video_url)])
+            
+            file_path = final_paths[-1] if final_paths else None
+            faststart = self._faststart_download(file_path)
+            file_size = os.path.getsize(file_path) if file_path and os.path.exists(file_path) else None
             
             # Update the database with download information
-            self.downloaded_videos[video_id] = {
-                "title": video_title,
-                "downloaded_at": datetime.now().isoformat(),
-                "url": video_url,
-                "playlist_id": playlist_id
-            }
-            self._save_downloaded_videos()
+            with self._catalog_lock:
+                self.downloaded_videos[video_id] = {
+                    "title": video_title,
+                    "downloaded_at": datetime.now().isoformat(),
+                    "url": video_url,
+                    "playlist_id": playlist_id,
+                    "uploader": info.get("uploader") or info.get("channel"),
+                    "file_path": file_path,
+                    "file_size": file_size
+                }
+                if faststart:
+                    self.downloaded_videos[video_id]["faststart"] = True
+                if file_path:
+                    self.file_index[video_id] = file_path
+                if playlist_id:
+                    self.membership.add(playlist_id, video_id)
+                if file_size is not None and self.storage_totals is not None:
+                    self.storage_totals.add(file_path, file_size,
+                                            self._video_playlists(video_id, self.downloaded_videos[video_id]))
+                self.video_index.add(video_id, self.downloaded_videos[video_id])
+                self.search_index.add(video_id, self._search_fields(video_id, self.downloaded_videos[video_id]))
+                self.store.put_video(video_id, self.downloaded_videos[video_id])
+            self.failures.record_success(video_id)
+            self._queue_thumbnail(video_id, file_path, info)
+            telemetry = self.telemetry.finish(video_id, True)
+            self._record_download_metrics("success", started, telemetry)
+            self._observe_download(True, None, telemetry, limit)
+            self._emit("download_finished", dict(event, success=True, telemetry=telemetry))
             return True
         except Exception as e:
             print(f"Error downloading {video_title}: {str(e)}")
+            self.failures.record_failure(video_id, str(e), video_title, playlist_id)
+            telemetry = self.telemetry.finish(video_id, False)
+            self._record_download_metrics("error", started, telemetry)
+            self._observe_download(False, str(e), telemetry, limit)
+            self._emit("download_finished", dict(event, success=False, error=str(e), telemetry=telemetry))
+            return False
+        finally:
+            self.bandwidth.finish(video_id)
+    
+    def _make_faststart(self, file_path):
+        """Remux an MP4 file to fast-start layout if its index is at the end
+        
+        Returns:
+            str: "already", "remuxed", or "skipped" if the file is not an MP4
+            or needs remuxing but ffmpeg is not installed
+        """
+        if not is_mp4(file_path):
+            return "skipped"
+        layout = moov_first(file_path)
+        if layout is None:
+            return "skipped"
+        if layout:
+            return "already"
+        if not self.ffmpeg:
+            return "skipped"
+        with metrics.POSTPROCESS_SECONDS.time(postprocessor="faststart"):
+            remux_faststart(file_path, self.ffmpeg)
+        return "remuxed"
+    
+    def _faststart_download(self, file_path):
+        """Make a finished download fast-start; returns True if it now is"""
+        if not file_path or not self.config.get("faststart", True) or not os.path.exists(file_path):
+            return False
+        try:
+            return self._make_faststart(file_path) != "skipped"
+        except Exception as e:
+            print(f"Error optimizing {file_path} for fast start: {str(e)}")
             return False
     
-    def sync_playlist(self, playlist_id, callback=None):
+    def optimize_faststart(self, callback=None):
+        """Remux archived MP4 files whose index is at the end to fast-start layout
+        
+        Each file is flagged ``faststart`` in the catalog as soon as it has
+        been checked or remuxed, so an interrupted run resumes where it stopped.
+        
+        Args:
+            callback: Optional function(current_task, progress) to report progress
+        
+        Returns:
+            dict: ``success`` and counts of remuxed, already fast-start,
+            skipped and failed files
+        """
+        pending = [video_id for video_id, video in list(self.downloaded_videos.items())
+                   if not video.get("faststart")]
+        result = {"success": True, "remuxed": 0, "already": 0, "skipped": 0, "failed": 0}
+        
+        for i, video_id in enumerate(pending):
+            file_path = self.file_index.get(video_id)
+            if not file_path or not os.path.exists(file_path):
+                result["skipped"] += 1
+            else:
+                try:
+                    outcome = self._make_faststart(file_path)
+                    result[outcome] += 1
+                    if outcome != "skipped":
+                        self._record_faststart(video_id, file_path)
+                except Exception as e:
+                    print(f"Error optimizing {file_path} for fast start: {str(e)}")
+                    result["failed"] += 1
+            if callback:
+                callback(f"Optimizing for fast start: {i + 1}/{len(pending)}", int((i + 1) * 100 / len(pending)))
+        
+        result["ffmpeg"] = bool(self.ffmpeg)
+        return result
+    
+    def _record_faststart(self, video_id, file_path):
+        """Flag a video as fast-start and account for its remuxed size"""
+        size = os.path.getsize(file_path)
+        with self._catalog_lock:
+            video = self.downloaded_videos.get(video_id)
+            if video is None:
+                return
+            video["faststart"] = True
+            if video.get("file_size") != size:
+                video["file_size"] = size
+                if self.storage_totals is not None:
+                    self.storage_totals.add(file_path, size, self._video_playlists(video_id, video))
+            self.store.put_video(video_id, video)
+    
+    def _queue_thumbnail(self, video_id, file_path, info):
+        """Hand the thumbnail yt-dlp saved for a download to the thumbnail pipeline"""
+        if not self.config.get("thumbnails", True):
+            return
+        saved = [thumbnail["filepath"] for thumbnail in info.get("thumbnails") or []
+                 if thumbnail.get("filepath") and os.path.exists(thumbnail["filepath"])]
+        source = saved[-1] if saved else (find_sidecar_thumbnail(file_path) if file_path else None)
+        if source:
+            try:
+                # Never holds up the download worker; a full queue defers the build
+                self.thumbnails.submit(video_id, source, block=False)
+            except Exception as e:
+                print(f"Error queueing thumbnail for {video_id}: {str(e)}")
+    
+    def _record_thumbnail(self, video_id, names):
+        """Store the cache names of a video's thumbnail in its catalog record"""
+        with self._catalog_lock:
+            video = self.downloaded_videos.get(video_id)
+            if video is None or video.get("thumbnail") == names:
+                return
+            video["thumbnail"] = names
+            self.store.put_video(video_id, video)
+    
+    def backfill_thumbnails(self, wait=True):
+        """Build thumbnails for archived videos that do not have one yet
+        
+        Uses the thumbnail yt-dlp saved next to the file where there is one,
+        and a poster frame extracted with ffmpeg otherwise. Videos whose
+        thumbnail is already cached are skipped, so an interrupted backfill
+        picks up where it stopped.
+        
+        Args:
+            wait: Wait for the queued thumbnails to be built
+        
+        Returns:
+            dict: Counts of queued, already cached and skipped videos
+        """
+        result = {"queued": 0, "cached": 0, "skipped": 0}
+        for video_id, video in list(self.downloaded_videos.items()):
+            if self.thumbnails.has(video.get("thumbnail")):
+                result["cached"] += 1
+                continue
+            file_path = self.file_index.get(video_id)
+            if not file_path or not os.path.exists(file_path):
+                result["skipped"] += 1
+                continue
+            sidecar = find_sidecar_thumbnail(file_path)
+            future = self.thumbnails.submit(video_id, sidecar or file_path, from_video=not sidecar)
+            if future is None:
+                result["skipped"] += 1
+                continue
+            result["queued"] += 1
+        
+        if wait:
+            self.thumbnails.wait()
+        return result
+    
+    @staticmethod
+    def _record_download_metrics(result, started, telemetry):
+        metrics.DOWNLOADS.inc(result=result)
+        metrics.DOWNLOAD_SECONDS.observe(time.perf_counter() - started, result=result)
+        if telemetry:
+            metrics.DOWNLOAD_BYTES.inc(telemetry["downloaded_bytes"])
+            for name, seconds in telemetry["postprocess_seconds"].items():
+                metrics.POSTPROCESS_SECONDS.observe(seconds, postprocessor=name)
+    
+    def _observe_download(self, success, error, telemetry, limit):
+        """Feed a download's outcome to the adaptive concurrency controller"""
+        if not self.concurrency:
+            return
+        throughput = None
+        if telemetry and telemetry["download_seconds"]:
+            throughput = telemetry["downloaded_bytes"] / telemetry["download_seconds"]
+        self.concurrency.observe(success, error, throughput, shaped=limit is not None)
+    
+    def sync_playlist(self, playlist_id, callback=None, slots=None):
         """Sync a playlist, downloading any new videos
         
+        The playlist is processed as a streaming pipeline: entries are
+        enumerated lazily, already-archived IDs are filtered out, and new
+        videos are handed to the download workers through a bounded queue as
+        soon as they are found, so downloads start before enumeration ends.
+        
         Args:
             playlist_id: ID of the playlist to sync
             callback: Optional function(current_task, progress) to report progress
+            slots: Optional DownloadSlots shared with other playlists being synced
         
         Returns:
             dict: A summary of the sync operation
@@ -204,31 +700,78 @@ class YouTubeArchiver:
         if callback:
             callback(f"Syncing playlist: {playlist['title']}", 0)
         
+        self.telemetry.begin_sync(playlist_id)
+        
         try:
-            # Get videos in the playlist
-            videos = self.get_playlist_videos(playlist["url"])
+            incremental = self._use_incremental_scan(playlist)
+            previous_head = playlist.get("head_ids") or []
+            known_before = set(self.downloaded_videos) | set(previous_head)
             
-            total_videos = len(videos)
-            new_videos = 0
+            # Filled in by the enumeration stage as it runs
+            scan = {"count": 0, "archived": 0, "unseen": 0, "ids": [], "head": [], "entries": [], "skipped": []}
             
-            for index, video in enumerate(videos):
-                video_id = video['id']
-                title = video.get('title', f"Video {video_id}")
-                
-                if callback:
-                    callback(f"Processing: {title}", int((index / total_videos) * 100))
-                
-                if video_id not in self.downloaded_videos:
-                    print(f"New video found: {title}")
-                    if self.download_video(video_id, title, playlist_id):
-                        new_videos += 1
-                else:
-                    print(f"Already downloaded: {title}")
+            def new_videos():
+                """Filter stage: yield only entries that are not archived yet"""
+                for video in self._scan_playlist(playlist_id, incremental):
+                    video_id = video['id']
+                    title = video.get('title', f"Video {video_id}")
+                    scan["count"] += 1
+                    scan["ids"].append(video_id)
+                    if len(scan["head"]) < HEAD_SIZE:
+                        scan["head"].append(video_id)
+                    if not incremental:
+                        scan["entries"].append({"id": video_id, "title": video.get('title')})
+                    if video_id not in known_before:
+                        scan["unseen"] += 1
+                    
+                    if video_id in self.downloaded_videos:
+                        print(f"Already downloaded: {title}")
+                        scan["archived"] += 1
+                    elif self.failures.should_skip(video_id):
+                        # Failed before and not due for another attempt yet
+                        print(f"Skipping previously failed video: {title}")
+                        scan["skipped"].append(video_id)
+                        scan["archived"] += 1
+                    elif not self._claim_download(video_id):
+                        print(f"Already downloading in another sync: {title}")
+                        scan["archived"] += 1
+                    else:
+                        print(f"New video found: {title}")
+                        yield video_id, title
+            
+            # The previous video count is the best estimate of the total until
+            # enumeration has finished
+            estimate = playlist.get("video_count") or 0
+            
+            def progress(completed):
+                total = max(estimate, scan["count"], 1)
+                return min(100, int(((scan["archived"] + completed) / total) * 100))
+            
+            video_results = self._download_videos(new_videos(), playlist_id, callback,
+                                                  slots=slots, progress=progress)
+            new_count = sum(1 for ok in video_results.values() if ok)
+            total_videos = scan["count"]
+            telemetry = self.telemetry.end_sync(playlist_id)
+            
+            if not incremental:
+                self.entry_cache.put(playlist_id, scan["entries"])
             
             # Update playlist information
-            self.playlists[playlist_id]["last_synced"] = datetime.now().isoformat()
-            self.playlists[playlist_id]["video_count"] = total_videos
-            self._save_playlists()
+            with self._catalog_lock:
+                playlist_record = self.playlists[playlist_id]
+                playlist_record["last_synced"] = datetime.now().isoformat()
+                if incremental:
+                    # Only the head was scanned; count entries not seen before
+                    playlist_record["video_count"] = (playlist_record.get("video_count") or 0) + scan["unseen"]
+                    scanned = set(scan["head"])
+                    head = scan["head"] + [vid for vid in previous_head if vid not in scanned]
+                else:
+                    playlist_record["video_count"] = total_videos
+                    playlist_record["last_full_scan"] = playlist_record["last_synced"]
+                    head = scan["head"]
+                playlist_record["head_ids"] = head[:HEAD_SIZE]
+                self.store.put_playlist(playlist_id, playlist_record)
+                self._update_membership(playlist_id, scan["ids"], incremental)
             
             if callback:
                 callback(f"Finished syncing {playlist['title']}", 100)
@@ -238,7 +781,12 @@ class YouTubeArchiver:
                 "playlist_id": playlist_id,
                 "playlist_title": playlist["title"],
                 "total_videos": total_videos,
-                "new_videos": new_videos,
+                "scan_mode": "incremental" if incremental else "full",
+                "new_videos": new_count,
+                "failed_videos": [vid for vid, ok in video_results.items() if not ok],
+                "skipped_videos": scan["skipped"],
+                "video_results": video_results,
+                "telemetry": telemetry,
                 "completed_at": datetime.now().isoformat()
             }
             
@@ -247,54 +795,250 @@ class YouTubeArchiver:
         except Exception as e:
             error_msg = f"Error syncing playlist {playlist['title']}: {str(e)}"
             print(error_msg)
+            self.telemetry.end_sync(playlist_id)
             
             if callback:
                 callback(f"Error: {str(e)}", 0)
             
             return {"success": False, "error": error_msg}
     
+    def _update_membership(self, playlist_id, video_ids, incremental):
+        """Record the order of a playlist after a scan
+        
+        A full scan replaces the playlist's order. Archived videos that have
+        since left the playlist stay in it, after the current entries, so
+        they can still be found from the playlist. An incremental scan only
+        moves the entries it saw to the top.
+        """
+        with self._catalog_lock:
+            if incremental:
+                changed = self.membership.merge_head(playlist_id, video_ids)
+            else:
+                scanned = set(video_ids)
+                departed = [video_id for video_id in self.membership.videos(playlist_id)
+                            if video_id not in scanned and video_id in self.downloaded_videos]
+                changed = self.membership.set_playlist(playlist_id, list(video_ids) + departed)
+            self.store.put_membership(playlist_id, self.membership.videos(playlist_id))
+            self._reindex_search(changed)
+            
+            # Already-archived videos that joined count towards this playlist's totals too
+            if self.storage_totals is not None:
+                for video_id in changed:
+                    file_path = self.file_index.get(video_id)
+                    if file_path:
+                        self.storage_totals.retag(file_path, self._video_playlists(
+                            video_id, self.downloaded_videos.get(video_id)))
+    
+    def _claim_download(self, video_id):
+        """Reserve a video for download; False if it is archived or already claimed"""
+        with self._catalog_lock:
+            if video_id in self.downloaded_videos or video_id in self._in_flight:
+                return False
+            self._in_flight.add(video_id)
+            return True
+    
+    def _download_videos(self, videos, playlist_id, callback=None, slots=None, progress=None):
+        """Download videos with a bounded pool of workers
+        
+        ``videos`` may be a lazy iterable. A feeder thread pulls from it into
+        a bounded queue, so it is only consumed as fast as the workers keep
+        up. Up to ``concurrent_downloads`` videos are downloaded at once; when
+        ``slots`` is given, every download must also hold one of its shared
+        slots. Progress is reported from the calling thread as each download
+        finishes. An exception raised while iterating ``videos`` is re-raised
+        here once the downloads already queued have finished. The videos must
+        have been claimed with _claim_download; their claims are released
+        here once each download ends.
+        
+        Args:
+            videos: Iterable of (video_id, title) tuples to download
+            playlist_id: Playlist the videos belong to
+            callback: Optional function(current_task, progress) to report progress
+            slots: Optional DownloadSlots budget shared with other playlists
+            progress: Optional function(completed) returning the progress percentage
+        
+        Returns:
+            dict: Mapping of video ID to True if downloaded, False otherwise
+        """
+        if self.concurrency:
+            # Enough workers for the upper bound; the controller's slots decide
+            # how many of them download at once
+            workers = self.concurrency.max_videos
+            if slots is None:
+                slots = self.concurrency.slots
+        else:
+            workers = max(1, int(self.config.get("concurrent_downloads", 1)))
+        work = queue.Queue(maxsize=workers * 2)
+        done = queue.Queue()
+        feed_error = []
+        results = {}
+        
+        def feed():
+            try:
+                for item in videos:
+                    work.put(item)
+                    metrics.DOWNLOAD_QUEUE_DEPTH.inc()
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                for _ in range(workers):
+                    work.put(None)
+        
+        def download():
+            while True:
+                item = work.get()
+                if item is None:
+                    done.put(None)
+                    return
+                metrics.DOWNLOAD_QUEUE_DEPTH.dec()
+                video_id, title = item
+                try:
+                    if video_id in self.downloaded_videos:
+                        # Archived since it was queued
+                        ok = None
+                    elif slots is None:
+                        ok = self.download_video(video_id, title, playlist_id)
+                    else:
+                        with slots.slot(playlist_id):
+                            ok = self.download_video(video_id, title, playlist_id)
+                except Exception as e:
+                    print(f"Error downloading {title}: {str(e)}")
+                    ok = False
+                finally:
+                    with self._catalog_lock:
+                        self._in_flight.discard(video_id)
+                done.put((video_id, title, ok))
+        
+        threads = [threading.Thread(target=feed, name="download-feed", daemon=True)]
+        threads += [threading.Thread(target=download, name=f"download-{i}", daemon=True)
+                    for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        
+        finished_workers = 0
+        completed = 0
+        while finished_workers < workers:
+            item = done.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            video_id, title, ok = item
+            completed += 1
+            if ok is None:
+                continue
+            results[video_id] = bool(ok)
+            if callback:
+                status = "Downloaded" if ok else "Failed"
+                percent = progress(completed) if progress else 0
+                callback(f"{status}: {title}", percent)
+        
+        for thread in threads:
+            thread.join()
+        
+        if feed_error:
+            raise feed_error[0]
+        
+        return results
+    
     def sync_all_playlists(self, callback=None):
         """Sync all playlists
         
+        Up to ``concurrent_playlists`` playlists are enumerated and synced at
+        once. Their downloads share a single budget of ``concurrent_downloads``
+        slots, handed out fairly between playlists, and the smallest playlists
+        are started first so they finish quickly.
+        
         Args:
             callback: Optional function(current_task, progress) to report progress
         
         Returns:
-            list: Results of all sync operations
+            list: Results of all sync operations, in playlist order
         """
-        results = []
+        playlist_ids = list(self.playlists)
+        if not playlist_ids:
+            return []
         
-        for playlist_id in self.playlists:
-            if callback:
-                callback(f"Starting sync of playlist: {self.playlists[playlist_id]['title']}", 0)
+        slots = self.download_slots()
+        workers = max(1, int(self.config.get("concurrent_playlists", 1)))
+        
+        # Overall progress is the mean of the per-playlist progress
+        progress = {playlist_id: 0 for playlist_id in playlist_ids}
+        callback_lock = threading.Lock()
+        
+        def sync_one(playlist_id):
+            def report(task, percent):
+                with callback_lock:
+                    progress[playlist_id] = percent
+                    if callback:
+                        callback(task, int(sum(progress.values()) / len(progress)))
             
-            result = self.sync_playlist(playlist_id, callback)
-            results.append(result)
+            report(f"Starting sync of playlist: {self.playlists[playlist_id]['title']}", 0)
+            result = self.sync_playlist(playlist_id, report, slots=slots)
+            report(f"Finished playlist: {self.playlists[playlist_id]['title']}", 100)
+            return result
         
-        return results
+        # Smallest playlists first so they are not held up by large backfills
+        order = sorted(playlist_ids, key=lambda pid: self.playlists[pid].get("video_count") or 0)
+        
+        with ThreadPoolExecutor(max_workers=min(workers, len(order)),
+                                thread_name_prefix="playlist-sync") as pool:
+            futures = {playlist_id: pool.submit(sync_one, playlist_id) for playlist_id in order}
+        
+        return [futures[playlist_id].result() for playlist_id in playlist_ids]
+    
+    def enqueue_sync(self, playlist_id):
+        """Queue a sync of one playlist
+        
+        Returns:
+            tuple: (job dict, True if queued now, False if already queued or
+            running), or (None, False) if the playlist is unknown
+        """
+        if playlist_id not in self.playlists:
+            return None, False
+        return self.jobs.enqueue("sync_playlist", playlist_id)
+    
+    def enqueue_sync_all(self):
+        """Queue a sync of every playlist, smallest playlists first
+        
+        Returns:
+            list: The job of each playlist
+        """
+        order = sorted(self.playlists, key=lambda pid: self.playlists[pid].get("video_count") or 0)
+        return [self.jobs.enqueue("sync_playlist", playlist_id)[0] for playlist_id in order]
+    
+    def enqueue_faststart(self):
+        """Queue a run of optimize_faststart over the archive
+        
+        Returns:
+            tuple: (job dict, True if queued now, False if already queued or running)
+        """
+        return self.jobs.enqueue("optimize_faststart")
     
     def get_storage_stats(self):
-        """Get storage statistics for downloaded videos"""
+        """Get storage statistics for downloaded videos
+        
+        Served from running totals that downloads and deletions keep up to
+        date, seeded from the file sizes recorded in the catalog. The download
+        directory is only scanned when rescan_storage_stats is called to
+        correct drift, or once for catalogs that predate recorded sizes.
+        """
+        with metrics.STORAGE_STATS_SECONDS.time():
+            return self._storage_stats()
+    
+    def _storage_stats(self):
         if not os.path.exists(self.download_dir):
             return {
                 "total_size": 0,
                 "total_size_human": "0 B",
                 "video_count": 0,
                 "average_size": 0,
-                "average_size_human": "0 B"
+                "average_size_human": "0 B",
+                "by_extension": {}
             }
         
-        total_size = 0
-        file_extensions = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
-        video_files = []
-        
-        for ext in file_extensions:
-            video_files.extend(glob.glob(os.path.join(self.download_dir, f"*{ext}")))
-        
-        for file_path in video_files:
-            total_size += os.path.getsize(file_path)
-        
-        video_count = len(video_files)
+        totals = self.storage_totals or self._load_storage_totals()
+        total_size = totals.total_size
+        video_count = totals.video_count
         average_size = total_size / video_count if video_count > 0 else 0
         
         return {
@@ -302,27 +1046,179 @@ class YouTubeArchiver:
             "total_size_human": humanize.naturalsize(total_size),
             "video_count": video_count,
             "average_size": average_size,
-            "average_size_human": humanize.naturalsize(average_size)
+            "average_size_human": humanize.naturalsize(average_size),
+            "by_extension": dict(totals.by_extension)
         }
     
+    def _load_storage_totals(self):
+        """Seed the running storage totals from the catalog without touching the disk
+        
+        Catalogs with records that have no recorded size are reconciled
+        against the download directory instead, which records the sizes (or
+        marks the file missing) so the next start does not need the scan.
+        
+        Returns:
+            StorageTotals: The seeded totals
+        """
+        with self._catalog_lock:
+            videos = [(video_id, video) for video_id, video in self.downloaded_videos.items()
+                      if not video.get("file_missing")]
+        if any(video.get("file_size") is None for video_id, video in videos):
+            self.reconcile_file_index()
+            return self.storage_totals
+        
+        totals = StorageTotals()
+        root = os.path.join(os.path.abspath(self.download_dir), "")
+        for video_id, video in videos:
+            file_path = video.get("file_path")
+            # Files left in a previous download directory are not counted
+            if file_path and os.path.abspath(file_path).startswith(root):
+                totals.add(file_path, video["file_size"], self._video_playlists(video_id, video))
+        self.storage_totals = totals
+        return totals
+    
+    def rescan_storage_stats(self):
+        """Recompute the storage totals from a full scan of the download directory
+        
+        Returns:
+            StorageTotals: The freshly computed totals
+        """
+        totals = StorageTotals()
+        for file_path, size, video_id in self._scan_download_dir():
+            video = self.downloaded_videos.get(video_id) if video_id else None
+            totals.add(file_path, size, self._video_playlists(video_id, video) if video else ())
+            if video_id:
+                # The scan already found the file, so index it for free
+                with self._catalog_lock:
+                    self.file_index.setdefault(video_id, file_path)
+        
+        self.storage_totals = totals
+        return totals
+    
+    def _scan_download_dir(self):
+        """List the video files in the download directory
+        
+        Files are matched to catalog entries by the ``-<video_id>.<ext>`` suffix
+        of the output template.
+        
+        Returns:
+            list: (file_path, size, video_id or None) for each video file
+        """
+        files = []
+        if not os.path.exists(self.download_dir):
+            return files
+        
+        with os.scandir(self.download_dir) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext not in VIDEO_EXTENSIONS or entry.name.startswith('.') or not entry.is_file():
+                    continue
+                # The ID follows one of the dashes; try each split point
+                video_id = None
+                parts = stem.split('-')
+                for i in range(1, len(parts)):
+                    candidate = '-'.join(parts[i:])
+                    if candidate in self.downloaded_videos:
+                        video_id = candidate
+                        break
+                files.append((entry.path, entry.stat().st_size, video_id))
+        
+        return files
+    
     def find_video_file(self, video_id):
-        """Find the file path for a downloaded video"""
-        file_extensions = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
+        """Find the file path for a downloaded video
         
-        for ext in file_extensions:
-            video_files = glob.glob(os.path.join(self.download_dir, f"*{video_id}*{ext}"))
+        Looks the video up in the file index first. Only videos that are not
+        indexed (or whose indexed file has gone) fall back to scanning the
+        download directory, and a file found that way is indexed.
+        """
+        start = time.perf_counter()
+        file_path = self.file_index.get(video_id)
+        if file_path and os.path.exists(file_path):
+            metrics.FIND_VIDEO_FILE_SECONDS.observe(time.perf_counter() - start, source="index")
+            return file_path
+        
+        for ext in VIDEO_EXTENSIONS:
+            video_files = glob.glob(os.path.join(self.download_dir, f"*{glob.escape(video_id)}*{ext}"))
             if video_files:
+                self._record_file_path(video_id, video_files[0])
+                metrics.FIND_VIDEO_FILE_SECONDS.observe(time.perf_counter() - start, source="scan")
                 return video_files[0]  # Return the first matching file
         
+        metrics.FIND_VIDEO_FILE_SECONDS.observe(time.perf_counter() - start, source="missing")
         return None
     
-    def get_missing_videos(self, playlist_id):
-        """Get list of videos in a playlist that haven't been downloaded yet"""
+    def _record_file_path(self, video_id, file_path):
+        """Index a video's file and persist the path in its catalog record"""
+        with self._catalog_lock:
+            self.file_index[video_id] = file_path
+            video = self.downloaded_videos.get(video_id)
+            if video is not None and video.get("file_path") != file_path:
+                video["file_path"] = file_path
+                self.store.put_video(video_id, video)
+    
+    def reconcile_file_index(self):
+        """Rebuild the file index from a single scan of the download directory
+        
+        Catalog records whose path or size changed are updated, records whose
+        file is gone are marked ``file_missing``, and the storage totals are
+        recomputed from the same scan.
+        
+        Returns:
+            dict: Counts of indexed, updated and missing videos
+        """
+        found = {}
+        totals = StorageTotals()
+        for file_path, size, video_id in self._scan_download_dir():
+            video = self.downloaded_videos.get(video_id) if video_id else None
+            totals.add(file_path, size, self._video_playlists(video_id, video) if video else ())
+            if video_id:
+                found.setdefault(video_id, (file_path, size))
+        
+        updated = 0
+        with self._catalog_lock:
+            self.file_index = {video_id: file_path for video_id, (file_path, size) in found.items()}
+            self.storage_totals = totals
+            for video_id, video in self.downloaded_videos.items():
+                if video_id not in found:
+                    if not video.get("file_missing"):
+                        video["file_missing"] = True
+                        self.store.put_video(video_id, video)
+                    continue
+                file_path, size = found[video_id]
+                if (video.get("file_path") != file_path or video.get("file_size") != size
+                        or video.get("file_missing")):
+                    video["file_path"] = file_path
+                    video["file_size"] = size
+                    video.pop("file_missing", None)
+                    self.store.put_video(video_id, video)
+                    updated += 1
+        
+        return {
+            "indexed": len(found),
+            "updated": updated,
+            "missing": len(self.downloaded_videos) - len(found)
+        }
+    
+    def _fetch_playlist_entries(self, playlist_id):
+        """Enumerate a playlist for the entry cache"""
+        return self.get_playlist_videos(self.playlists[playlist_id]["url"], playlist_id)
+    
+    def get_missing_videos(self, playlist_id, wait=True):
+        """Get list of videos in a playlist that haven't been downloaded yet
+        
+        Args:
+            playlist_id: ID of the playlist
+            wait: If False, answer from the playlist entry cache even when it is
+                stale or empty, refreshing it in the background instead
+        
+        Returns:
+            list: Entries (dicts with ``id`` and ``title``) not downloaded yet
+        """
         if playlist_id not in self.playlists:
             return []
         
-        playlist = self.playlists[playlist_id]
-        videos = self.get_playlist_videos(playlist["url"])
+        videos = self.entry_cache.get(playlist_id, wait=wait) or []
         
         missing_videos = []
         for video in videos:
@@ -332,23 +1228,87 @@ class YouTubeArchiver:
         
         return missing_videos
     
+    def refresh_playlist_entries(self, playlist_id):
+        """Re-enumerate a playlist in the background to refresh the entry cache"""
+        if playlist_id not in self.playlists:
+            return False
+        return self.entry_cache.refresh(playlist_id)
+    
+    def list_videos(self, sort="downloaded_at", order="desc", cursor=None, limit=50,
+                    playlist_id=None, query=None):
+        """Get one page of downloaded videos
+        
+        Args:
+            sort: "downloaded_at" or "title", or "position" (playlist order)
+                together with ``playlist_id``
+            order: "desc" or "asc"
+            cursor: Cursor returned with the previous page, or None for the first
+            limit: Maximum number of videos on the page
+            playlist_id: Only include videos from this playlist
+            query: Only include videos matching this search (see search_videos)
+        
+        Returns:
+            dict: ``videos`` (list of records with their ``id``) and
+            ``next_cursor`` (None on the last page)
+        """
+        sort = sort if sort in (PLAYLIST_SORT_KEYS if playlist_id else SORT_KEYS) else "downloaded_at"
+        order = order if order in ORDERS else "desc"
+        limit = max(1, min(int(limit), 500))
+        after = decode_cursor(cursor, sort, order) if cursor else None
+        
+        predicate = None
+        if query:
+            predicate = self.search_index.matches(query).__contains__
+        
+        if playlist_id:
+            # Only the playlist's own videos are sorted, never the whole archive
+            if sort == "position":
+                keys = [(position, video_id)
+                        for position, video_id in enumerate(self.membership.videos(playlist_id))
+                        if video_id in self.downloaded_videos]
+            else:
+                keys = sorted(self.video_index.keys(sort, self.membership.videos(playlist_id)))
+            ids, last_key = page_keys(keys, order, after=after, limit=limit, predicate=predicate)
+        else:
+            ids, last_key = self.video_index.page(sort, order, after=after, limit=limit, predicate=predicate)
+        
+        videos = []
+        for video_id in ids:
+            video = self.downloaded_videos.get(video_id)
+            if video is not None:
+                videos.append(dict(video, id=video_id))
+        
+        return {
+            "videos": videos,
+            "next_cursor": encode_cursor(sort, order, last_key) if last_key else None,
+            "sort": sort,
+            "order": order
+        }
+    
+    def search_videos(self, query, limit=50):
+        """Search the archive by title, uploader and playlist title
+        
+        Args:
+            query: Search text; the last word also matches as a prefix
+            limit: Maximum number of results
+        
+        Returns:
+            list: Video records with their ``id`` and ``score``, best match first
+        """
+        results = []
+        for video_id, score in self.search_index.search(query, limit=limit):
+            video = self.downloaded_videos.get(video_id)
+            if video is not None:
+                results.append(dict(video, id=video_id, score=score))
+        return results
+    
     def get_playlist_storage_stats(self, playlist_id):
         """Get storage statistics for a specific playlist"""
         if playlist_id not in self.playlists:
             return None
         
-        total_size = 0
-        video_count = 0
-        
-        # Get all videos from this playlist
-        playlist_videos = [vid_id for vid_id, vid_info in self.downloaded_videos.items() 
-                          if vid_info.get('playlist_id') == playlist_id]
-        
-        for video_id in playlist_videos:
-            video_file = self.find_video_file(video_id)
-            if video_file:
-                total_size += os.path.getsize(video_file)
-                video_count += 1
+        totals = self.storage_totals or self._load_storage_totals()
+        total_size, video_count = totals.playlist(playlist_id)
         
         return {
             "total_size": total_size,
@@ -359,16 +1319,47 @@ class YouTubeArchiver:
     
     def update_config(self, new_config):
         """Update the configuration"""
+        concurrency_keys = ("adaptive_concurrency", "concurrent_downloads", "concurrent_fragment_downloads",
+                            "min_concurrent_downloads", "max_concurrent_downloads",
+                            "min_fragment_downloads", "max_fragment_downloads")
+        concurrency_changed = any(key in new_config and new_config[key] != self.config.get(key)
+                                  for key in concurrency_keys)
         self.config.update(new_config)
         self._save_config()
         
+        if "playlist_cache_ttl" in new_config:
+            self.entry_cache.ttl = new_config["playlist_cache_ttl"]
+        
+        if concurrency_changed:
+            self._configure_concurrency()
+        
+        for key, attribute in (("failure_retry_delay", "retry_delay"), ("failure_max_delay", "max_delay"),
+                               ("quarantine_after", "quarantine_after"),
+                               ("quarantine_cooldown", "quarantine_cooldown")):
+            if key in new_config:
+                setattr(self.failures, attribute, new_config[key])
+        
+        if "bandwidth_limit" in new_config or "bandwidth_schedule" in new_config:
+            self.bandwidth.configure(self.config.get("bandwidth_limit"), self.config.get("bandwidth_schedule"))
+        
         # Update download directory if needed
-        if "download_dir" in new_config:
+        if "download_dir" in new_config and new_config["download_dir"] != self.download_dir:
             self.download_dir = new_config["download_dir"]
             os.makedirs(self.download_dir, exist_ok=True)
+            # Totals describe the old directory; rescan on next use
+            self.storage_totals = None
         
         return self.config
 
+    def close(self):
+        """Flush pending catalog writes and release the storage backend"""
+        self.ytdl_pool.close()
+        self.thumbnails.close()
+        self.store.close()
+        if self.catalog_claim is not None:
+            self.catalog_claim.close()
+            self.catalog_claim = None
+
     def delete_video(self, video_id):
         """Delete a video from the archive
 
@@ -388,10 +1379,18 @@ class YouTubeArchiver:
             if video_file and os.path.exists(video_file):
                 # Delete the actual file
                 os.remove(video_file)
+                # The thumbnail yt-dlp saved next to it; the cached copy may be shared
+                remove_sidecar_thumbnails(video_file)
+                if self.storage_totals is not None:
+                    self.storage_totals.remove(video_file)
 
             # Remove from the downloaded videos database
-            del self.downloaded_videos[video_id]
-            self._save_downloaded_videos()
+            with self._catalog_lock:
+                del self.downloaded_videos[video_id]
+                self.file_index.pop(video_id, None)
+                self.video_index.remove(video_id)
+                self.search_index.remove(video_id)
+                self.store.remove_video(video_id)
 
             return True
         except Exception as e:
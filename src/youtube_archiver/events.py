@@ -0,0 +1,98 @@
+"""
+YouTube Archiver Web Interface - Event Stream
+
+This module pushes sync progress to connected browsers as Server-Sent
+Events, so pages can update in place instead of reloading to poll the
+sync status.
+"""
+
+import json
+import queue
+import threading
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Events buffered per client before the oldest ones are dropped
+CLIENT_BUFFER = 100
+
+
+def format_event(event, data, event_id=None):
+    """Format one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    """Fans published events out to every connected client
+
+    Each client gets its own bounded queue. Publishing never blocks: if a
+    client falls behind, its oldest buffered events are dropped, which is
+    harmless for progress updates that supersede each other.
+    """
+
+    def __init__(self, buffer=CLIENT_BUFFER):
+        self.buffer = buffer
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._next_id = 1
+
+    @property
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def subscribe(self):
+        """Register a client and return its queue"""
+        client = queue.Queue(maxsize=self.buffer)
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, event, data):
+        """Send an event to every connected client"""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            clients = list(self._clients)
+
+        message = format_event(event, data, event_id)
+        for client in clients:
+            while True:
+                try:
+                    client.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        client.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stream(self, client, initial=(), heartbeat=HEARTBEAT_INTERVAL):
+        """Yield the Server-Sent Events for one client until it disconnects
+
+        Args:
+            client: Queue returned by subscribe
+            initial: (event, data) pairs sent first, e.g. the current status
+            heartbeat: Seconds of silence after which a keep-alive is sent
+        """
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            for event, data in initial:
+                yield format_event(event, data)
+            while True:
+                try:
+                    yield client.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comments keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(client)
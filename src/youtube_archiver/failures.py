@@ -0,0 +1,177 @@
+"""
+YouTube Archiver Library - Failure Ledger
+
+This module keeps a persistent record of videos whose download failed, so
+syncs stop re-extracting the same dead videos on every run. Errors are
+classified as permanent (private, removed, region-locked, age-gated, ...) or
+transient (rate limits, network errors, ...). Transient failures are retried
+with exponential backoff and jitter; permanent failures, and transient ones
+that keep failing, are quarantined and skipped until a cooldown has passed.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from .journal import write_snapshot
+
+# Error messages of videos that will not download no matter how often we try
+PERMANENT_ERRORS = (
+    ("private", re.compile(r"private video", re.I)),
+    ("removed", re.compile(r"video unavailable|has been removed|no longer available|"
+                           r"account associated with this video has been terminated|"
+                           r"copyright claim|does not exist", re.I)),
+    ("region_locked", re.compile(r"not available in your country|geo.?restrict|"
+                                 r"uploader has not made this video available", re.I)),
+    ("age_gated", re.compile(r"confirm your age|age.?restricted|inappropriate for some users", re.I)),
+    ("members_only", re.compile(r"members.?only|join this channel", re.I)),
+)
+
+
+def classify_failure(error):
+    """Classify a download error message
+
+    Returns:
+        tuple: (kind, reason) where kind is "permanent" or "transient"
+    """
+    for reason, pattern in PERMANENT_ERRORS:
+        if pattern.search(error or ""):
+            return "permanent", reason
+    return "transient", "error"
+
+
+class FailureLedger:
+    """Failed downloads persisted to a JSON file
+
+    Args:
+        path: JSON file holding the ledger
+        retry_delay: Seconds before the first retry of a transient failure;
+            doubled on every further failure
+        max_delay: Upper bound for the transient backoff
+        jitter: Fraction by which each delay is randomly stretched or shrunk
+        quarantine_after: Transient failures in a row after which a video is quarantined
+        quarantine_cooldown: Seconds a quarantined video is skipped for
+    """
+
+    def __init__(self, path, retry_delay=3600, max_delay=7 * 86400, jitter=0.2,
+                 quarantine_after=5, quarantine_cooldown=30 * 86400):
+        self.path = path
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.quarantine_after = quarantine_after
+        self.quarantine_cooldown = quarantine_cooldown
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mtime = None
+        self._reload()
+
+    @classmethod
+    def from_config(cls, path, config):
+        return cls(path,
+                   retry_delay=config.get("failure_retry_delay", 3600),
+                   max_delay=config.get("failure_max_delay", 7 * 86400),
+                   quarantine_after=config.get("quarantine_after", 5),
+                   quarantine_cooldown=config.get("quarantine_cooldown", 30 * 86400))
+
+    def _reload(self):
+        """Re-read the file if another process has written it"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Error reading failure ledger: {str(e)}")
+
+    def _save(self):
+        write_snapshot(self.path, self._entries)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _delay(self, attempts):
+        delay = min(self.max_delay, self.retry_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def record_failure(self, video_id, error, title=None, playlist_id=None):
+        """Record a failed download and schedule its next attempt
+
+        Returns:
+            dict: The video's ledger entry
+        """
+        kind, reason = classify_failure(error)
+        now = time.time()
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(video_id) or {"video_id": video_id, "attempts": 0, "first_failed": now}
+            entry["attempts"] += 1
+            entry.update({
+                "title": title or entry.get("title"),
+                "playlist_id": playlist_id or entry.get("playlist_id"),
+                "error": error,
+                "kind": kind,
+                "reason": reason,
+                "last_failed": now
+            })
+            if kind == "permanent" or entry["attempts"] >= self.quarantine_after:
+                entry["quarantined"] = True
+                entry["retry_at"] = now + self.quarantine_cooldown
+            else:
+                entry["quarantined"] = False
+                entry["retry_at"] = now + self._delay(entry["attempts"])
+            self._entries[video_id] = entry
+            self._save()
+            return dict(entry)
+
+    def record_success(self, video_id):
+        """Forget a video once it has downloaded"""
+        with self._lock:
+            self._reload()
+            if self._entries.pop(video_id, None) is not None:
+                self._save()
+
+    def release(self, video_id):
+        """Make a video eligible for download again right away
+
+        Returns:
+            bool: True if the video was in the ledger
+        """
+        with self._lock:
+            self._reload()
+            if self._entries.pop(video_id, None) is None:
+                return False
+            self._save()
+            return True
+
+    def should_skip(self, video_id, now=None):
+        """Whether a sync should leave a video alone for now"""
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(video_id)
+            return entry is not None and (now or time.time()) < entry["retry_at"]
+
+    def get(self, video_id):
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(video_id)
+            return dict(entry) if entry else None
+
+    def entries(self, playlist_id=None, quarantined=None):
+        """Return ledger entries, quarantined first, then by next attempt
+
+        Args:
+            playlist_id: Only entries for this playlist
+            quarantined: Only quarantined (True) or only backing off (False) entries
+        """
+        with self._lock:
+            self._reload()
+            entries = [dict(entry) for entry in self._entries.values()
+                       if (playlist_id is None or entry.get("playlist_id") == playlist_id)
+                       and (quarantined is None or entry["quarantined"] == quarantined)]
+        return sorted(entries, key=lambda entry: (not entry["quarantined"], entry["retry_at"]))
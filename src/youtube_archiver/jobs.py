@@ -0,0 +1,372 @@
+"""
+YouTube Archiver Library - Job Queue
+
+This module provides the durable queue of sync jobs shared by the web
+process and the CLI. Jobs are stored in a JSON file under the config
+directory, so work survives restarts: a job whose runner died is picked up
+again once its lease expires, and playlists already synced in an
+interrupted run are not synced again.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from .journal import write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+JOB_STATES = ("queued", "running", "done", "failed")
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobQueue:
+    """Sync jobs persisted to a JSON file
+
+    Every operation re-reads the file under an exclusive file lock, so
+    several processes (the web app and CLI invocations) can share a queue.
+    A runner claims a job by taking a lease on it and must renew the lease
+    while it works; a running job with an expired lease is claimable again.
+    Enqueuing a job that is already queued or running for the same playlist
+    returns the existing job instead of adding a duplicate.
+    """
+
+    def __init__(self, path, lease_seconds=120, max_attempts=3, retry_delay=60, keep_finished=200):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        """Yield the jobs dict under the lock and write it back afterwards"""
+        with self._lock:
+            lock_file = open(self.path + ".lock", "a")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                jobs = self._read()
+                before = json.dumps(jobs, sort_keys=True)
+                yield jobs
+                if json.dumps(jobs, sort_keys=True) != before:
+                    self._prune(jobs)
+                    write_snapshot(self.path, jobs)
+            finally:
+                lock_file.close()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading job queue: {str(e)}")
+            return {}
+
+    def _prune(self, jobs):
+        """Forget the oldest finished jobs beyond ``keep_finished``"""
+        finished = sorted((job for job in jobs.values() if job["state"] not in ACTIVE_STATES),
+                          key=lambda job: job["updated_at"])
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del jobs[job["id"]]
+
+    def enqueue(self, kind, playlist_id=None):
+        """Add a job unless an equivalent one is already queued or running
+
+        Returns:
+            tuple: (job dict, True if a new job was created)
+        """
+        with self._transaction() as jobs:
+            for job in jobs.values():
+                if (job["kind"] == kind and job["playlist_id"] == playlist_id
+                        and job["state"] in ACTIVE_STATES):
+                    return dict(job), False
+
+            now = time.time()
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "kind": kind,
+                "playlist_id": playlist_id,
+                "state": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+                "available_at": now,
+                "owner": None,
+                "lease_expires": None,
+                "result": None,
+                "error": None
+            }
+            jobs[job["id"]] = job
+            return dict(job), True
+
+    def claim(self, owner, job_ids=None):
+        """Lease the oldest job that is ready to run
+
+        Queued jobs past their retry delay are claimable, as are running jobs
+        whose lease has expired because their runner stopped.
+
+        Args:
+            owner: Identifier of the runner taking the lease
+            job_ids: Only consider these jobs, or None for any job
+
+        Returns:
+            dict: The claimed job, or None if there is nothing to do
+        """
+        with self._transaction() as jobs:
+            now = time.time()
+            ready = [job for job in jobs.values()
+                     if (job_ids is None or job["id"] in job_ids)
+                     and ((job["state"] == "queued" and job["available_at"] <= now)
+                          or (job["state"] == "running" and job["lease_expires"] < now))]
+            for job in sorted(ready, key=lambda job: job["created_at"]):
+                if job["state"] == "running":
+                    print(f"Resuming job {job['id']} abandoned by {job['owner']}")
+                    if job["attempts"] >= self.max_attempts:
+                        self._finish(job, "failed", error="Runner stopped while the job was running")
+                        continue
+
+                job["state"] = "running"
+                job["owner"] = owner
+                job["attempts"] += 1
+                job["lease_expires"] = now + self.lease_seconds
+                job["updated_at"] = now
+                return dict(job)
+            return None
+
+    def renew(self, job_id, owner):
+        """Extend the lease on a running job
+
+        Returns:
+            bool: False if the job is no longer leased by ``owner``
+        """
+        with self._transaction() as jobs:
+            job = jobs.get(job_id)
+            if not job or job["state"] != "running" or job["owner"] != owner:
+                return False
+            job["lease_expires"] = time.time() + self.lease_seconds
+            return True
+
+    def complete(self, job_id, owner, result=None):
+        with self._transaction() as jobs:
+            job = jobs.get(job_id)
+            if job and job["owner"] == owner:
+                self._finish(job, "done", result=result)
+
+    def fail(self, job_id, owner, error):
+        """Record a failed attempt; the job is retried until max_attempts"""
+        with self._transaction() as jobs:
+            job = jobs.get(job_id)
+            if not job or job["owner"] != owner:
+                return
+            if job["attempts"] < self.max_attempts:
+                now = time.time()
+                job["state"] = "queued"
+                job["owner"] = None
+                job["lease_expires"] = None
+                job["error"] = error
+                job["available_at"] = now + self.retry_delay * job["attempts"]
+                job["updated_at"] = now
+            else:
+                self._finish(job, "failed", error=error)
+
+    @staticmethod
+    def _finish(job, state, result=None, error=None):
+        job["state"] = state
+        job["owner"] = None
+        job["lease_expires"] = None
+        job["result"] = result
+        job["error"] = error
+        job["updated_at"] = time.time()
+
+    def list(self, states=None):
+        """Return jobs, oldest first, optionally only those in ``states``"""
+        with self._transaction() as jobs:
+            selected = [dict(job) for job in jobs.values() if states is None or job["state"] in states]
+        return sorted(selected, key=lambda job: job["created_at"])
+
+    def counts(self):
+        """Return the number of jobs in each state"""
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self.list():
+            counts[job["state"]] += 1
+        return counts
+
+
+class JobRunner:
+    """Runs sync and fast-start jobs from a JobQueue on a pool of worker threads
+
+    Up to ``concurrent_playlists`` jobs run at once and their downloads
+    share one DownloadSlots budget, as in YouTubeArchiver.sync_all_playlists.
+    A heartbeat thread renews the leases of running jobs.
+    """
+
+    def __init__(self, archiver, jobs, callback=None, on_job_started=None, on_job_finished=None,
+                 poll_interval=5):
+        """
+        Args:
+            archiver: YouTubeArchiver that runs the syncs
+            jobs: JobQueue to take jobs from
+            callback: Optional function(current_task, progress) to report progress
+            on_job_started: Optional function(job) called when a job starts
+            on_job_finished: Optional function(job, result) called when a job ends
+            poll_interval: Seconds between checks for jobs enqueued elsewhere
+        """
+        self.archiver = archiver
+        self.jobs = jobs
+        self.callback = callback
+        self.on_job_started = on_job_started
+        self.on_job_finished = on_job_finished
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._held = set()
+        self._progress = {}
+        self._threads = []
+
+    @property
+    def active_jobs(self):
+        with self._lock:
+            return len(self._held)
+
+    def wake(self):
+        """Tell idle workers to look for new jobs now"""
+        self._wake.set()
+
+    def start(self):
+        """Start the workers and heartbeat in the background"""
+        self._start_threads(drain=False)
+
+    def drain(self, job_ids=None):
+        """Run jobs in the foreground until none are ready, then return
+
+        Args:
+            job_ids: Only run these jobs, or None to run the whole queue
+        """
+        self._start_threads(drain=True, job_ids=job_ids)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _start_threads(self, drain, job_ids=None):
+        config = self.archiver.config
+        workers = max(1, int(config.get("concurrent_playlists", 1)))
+        self._stop.clear()
+
+        self._threads = [threading.Thread(target=self._work, args=(drain, job_ids), name=f"job-worker-{i}",
+                                          daemon=True)
+                         for i in range(workers)]
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        for thread in self._threads:
+            thread.start()
+        heartbeat.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(max(1, self.jobs.lease_seconds / 3)):
+            with self._lock:
+                held = list(self._held)
+            for job_id in held:
+                try:
+                    if not self.jobs.renew(job_id, self.owner):
+                        print(f"Lost the lease on job {job_id}")
+                except Exception as e:
+                    print(f"Error renewing job lease: {str(e)}")
+            if not self._threads or not any(thread.is_alive() for thread in self._threads):
+                return
+
+    def _work(self, drain, job_ids=None):
+        while not self._stop.is_set():
+            try:
+                job = self.jobs.claim(self.owner, job_ids)
+            except Exception as e:
+                print(f"Error claiming job: {str(e)}")
+                job = None
+
+            if job is None:
+                if drain:
+                    return
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            self.run_job(job)
+
+    def _report(self, job_id, task, percent):
+        # Overall progress is the mean over the jobs of the current batch
+        with self._lock:
+            self._progress[job_id] = percent
+            overall = int(sum(self._progress.values()) / len(self._progress))
+        if self.callback:
+            self.callback(task, overall)
+
+    def run_job(self, job):
+        """Run one claimed job and record its outcome"""
+        with self._lock:
+            if not self._held:
+                # First job of a new batch
+                self._progress = {}
+            self._held.add(job["id"])
+            self._progress[job["id"]] = 0
+        if self.on_job_started:
+            self.on_job_started(job)
+
+        result = None
+        try:
+            report = lambda task, percent: self._report(job["id"], task, percent)
+            if job["kind"] == "sync_playlist":
+                # Looked up per job, so settings changes apply to the next sync
+                result = self.archiver.sync_playlist(job["playlist_id"], callback=report,
+                                                     slots=self.archiver.download_slots())
+            elif job["kind"] == "optimize_faststart":
+                # Resumes from the catalog's faststart flags if it was interrupted
+                result = self.archiver.optimize_faststart(callback=report)
+            else:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+
+            if result["success"]:
+                self.jobs.complete(job["id"], self.owner, result=_summarize(result))
+            else:
+                self.jobs.fail(job["id"], self.owner, result.get("error", "Sync failed"))
+        except Exception as e:
+            print(f"Error running job {job['id']}: {str(e)}")
+            result = {"success": False, "playlist_id": job["playlist_id"], "error": str(e)}
+            self.jobs.fail(job["id"], self.owner, str(e))
+        finally:
+            with self._lock:
+                self._held.discard(job["id"])
+                self._progress[job["id"]] = 100
+            if self.on_job_finished:
+                self.on_job_finished(job, result)
+        return result
+
+
+def _summarize(result):
+    """The parts of a job result worth keeping in the job file"""
+    if "playlist_id" not in result:
+        return dict(result)
+    summary = {key: result.get(key) for key in
+               ("playlist_title", "total_videos", "scan_mode", "new_videos", "telemetry", "completed_at")}
+    summary["failed_videos"] = len(result.get("failed_videos") or [])
+    return summary
+
+
+def job_time(timestamp):
+    """Format a job timestamp for display"""
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
@@ -0,0 +1,199 @@
+"""
+YouTube Archiver Library - Catalog Journal
+
+This module provides an append-only JSON-lines journal that records single
+video changes next to the downloaded_videos.json snapshot. Records are
+written with group commit and periodically folded back into the snapshot.
+"""
+
+import os
+import json
+import time
+import atexit
+import weakref
+import threading
+from . import metrics
+
+# Journals with records that may still need flushing at exit
+_open_journals = weakref.WeakSet()
+
+
+@atexit.register
+def _close_journals():
+    for journal in list(_open_journals):
+        journal.close()
+
+
+class CatalogJournal:
+    """Append-only journal of changes to a JSON snapshot
+
+    Each record is one JSON line, ``{"op": "put", "id": ..., "data": ...}``
+    or ``{"op": "del", "id": ...}``. Appends are buffered and written
+    together; the file is fsynced at most once per ``fsync_interval``
+    seconds (0 means on every append). Compaction rotates the journal aside,
+    writes a fresh snapshot atomically and only then drops the old journal.
+    """
+
+    def __init__(self, snapshot_file, fsync_interval=1.0, compact_threshold=500):
+        self.snapshot_file = snapshot_file
+        self.journal_file = snapshot_file + ".journal"
+        self.compacting_file = self.journal_file + ".compacting"
+        self.fsync_interval = max(0.0, float(fsync_interval))
+        self.compact_threshold = max(1, int(compact_threshold))
+        self.records = 0
+
+        self._lock = threading.RLock()
+        self.compaction_lock = threading.Lock()
+        self._pending = []
+        self._file = None
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._closed = False
+        _open_journals.add(self)
+
+    def load(self):
+        """Load the snapshot and replay any journaled changes on top of it"""
+        data = {}
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r') as f:
+                data = json.load(f)
+
+        # A leftover .compacting file means a compaction was interrupted; its
+        # records are absolute, so replaying them again is harmless
+        self.records = 0
+        for path in (self.compacting_file, self.journal_file):
+            self.records += self._replay(path, data)
+        return data
+
+    def _replay(self, path, data):
+        if not os.path.exists(path):
+            return 0
+        count = 0
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    print(f"Ignoring incomplete journal record in {path}")
+                    break
+                if record.get("op") == "put":
+                    data[record["id"]] = record["data"]
+                elif record.get("op") == "del":
+                    data.pop(record["id"], None)
+                count += 1
+        return count
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.journal_file, 'a')
+        return self._file
+
+    def append(self, op, key, value=None):
+        """Queue one change; it is written by the next group commit"""
+        record = {"op": op, "id": key}
+        if op == "put":
+            record["data"] = value
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+
+        with self._lock:
+            self._pending.append(line)
+            self.records += 1
+            if self.fsync_interval == 0:
+                self.flush()
+            else:
+                self._start_flusher()
+                self._wakeup.set()
+
+    def flush(self, sync=True):
+        """Write all pending records and optionally fsync the journal"""
+        with self._lock:
+            if self._pending:
+                f = self._open()
+                f.write("".join(self._pending))
+                f.flush()
+                self._pending = []
+                if sync:
+                    os.fsync(f.fileno())
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="catalog-journal", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Let further appends pile up so they share one write and fsync
+            time.sleep(self.fsync_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing catalog journal: {str(e)}")
+
+    def needs_compaction(self):
+        return self.records >= self.compact_threshold
+
+    def rotate(self):
+        """Move the current journal aside so a snapshot can absorb it
+
+        Must be followed by ``write(snapshot)`` while holding
+        ``compaction_lock``, with the snapshot taken at the time of rotation.
+        """
+        with self._lock:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.journal_file):
+                if os.path.exists(self.compacting_file):
+                    # Fold an interrupted compaction into this one
+                    with open(self.journal_file, 'r') as src, open(self.compacting_file, 'a') as dst:
+                        dst.write(src.read())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.compacting_file)
+            self.records = 0
+
+    def write(self, snapshot):
+        """Write the snapshot that replaces the rotated journal"""
+        write_snapshot(self.snapshot_file, snapshot)
+        if os.path.exists(self.compacting_file):
+            os.remove(self.compacting_file)
+
+    def compact(self, data):
+        """Fold the journal into a new snapshot of ``data``"""
+        with self.compaction_lock:
+            snapshot = dict(data)
+            self.rotate()
+            self.write(snapshot)
+
+    def close(self):
+        """Flush pending records and stop the background flusher"""
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except (OSError, ValueError):
+                pass
+            self._closed = True
+            self._wakeup.set()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def write_snapshot(path, data):
+    """Atomically replace ``path`` with the JSON serialization of ``data``"""
+    tmp_path = path + ".tmp"
+    name = os.path.basename(path)
+    with metrics.SNAPSHOT_SECONDS.time(file=name):
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, path)
+    metrics.SNAPSHOT_BYTES.set(size, file=name)
@@ -0,0 +1,145 @@
+"""
+YouTube Archiver Library - Video Listing
+
+This module provides the sorted index behind the paginated video listings.
+Pages are addressed with keyset cursors, so fetching any page costs the same
+regardless of how deep into the archive it is.
+"""
+
+import json
+import base64
+import bisect
+import threading
+
+SORT_KEYS = ("downloaded_at", "title")
+# Listings of a single playlist can also follow the playlist's own order
+PLAYLIST_SORT_KEYS = SORT_KEYS + ("position",)
+ORDERS = ("desc", "asc")
+
+
+def _sort_value(sort, video):
+    if sort == "title":
+        return (video.get("title") or "").casefold()
+    return video.get("downloaded_at") or ""
+
+
+def encode_cursor(sort, order, key):
+    """Encode the position after ``key`` as an opaque URL-safe cursor"""
+    raw = json.dumps([sort, order, list(key)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort, order):
+    """Decode a cursor; returns None if it is malformed or for another ordering
+
+    The key must have the types of the sort's keys, ``(str, video_id)`` or
+    ``(int, video_id)`` for "position", since it is compared against them.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if cursor_sort != sort or cursor_order != order:
+        return None
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[1], str):
+        return None
+    value_type = int if sort == "position" else str
+    if not isinstance(key[0], value_type) or isinstance(key[0], bool):
+        return None
+    return (key[0], key[1])
+
+
+class VideoIndex:
+    """Videos kept sorted by download date and by title
+
+    Each ordering is a sorted list of ``(sort value, video_id)`` tuples, so
+    inserts and removals are a binary search plus a list splice, and a page
+    starts with a binary search for the cursor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._sorted = {sort: [] for sort in SORT_KEYS}
+
+    def rebuild(self, videos):
+        """Rebuild the index from a dict of video records"""
+        with self._lock:
+            self._keys = {video_id: {sort: (_sort_value(sort, video), video_id) for sort in SORT_KEYS}
+                          for video_id, video in videos.items()}
+            self._sorted = {sort: sorted(keys[sort] for keys in self._keys.values())
+                            for sort in SORT_KEYS}
+
+    def add(self, video_id, video):
+        """Index a new or updated video"""
+        with self._lock:
+            self._discard(video_id)
+            keys = {sort: (_sort_value(sort, video), video_id) for sort in SORT_KEYS}
+            self._keys[video_id] = keys
+            for sort, key in keys.items():
+                bisect.insort(self._sorted[sort], key)
+
+    def remove(self, video_id):
+        with self._lock:
+            self._discard(video_id)
+
+    def _discard(self, video_id):
+        keys = self._keys.pop(video_id, None)
+        if keys is None:
+            return
+        for sort, key in keys.items():
+            entries = self._sorted[sort]
+            i = bisect.bisect_left(entries, key)
+            if i < len(entries) and entries[i] == key:
+                del entries[i]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self, sort, video_ids):
+        """Return the sort keys of the indexed videos among ``video_ids``"""
+        with self._lock:
+            return [self._keys[video_id][sort] for video_id in video_ids if video_id in self._keys]
+
+    def page(self, sort="downloaded_at", order="desc", after=None, limit=50, predicate=None):
+        """Return up to ``limit`` video IDs following the ``after`` key
+
+        Args:
+            sort: One of SORT_KEYS
+            order: "asc" or "desc"
+            after: Key of the last item on the previous page, or None
+            limit: Maximum number of IDs to return
+            predicate: Optional function(video_id) selecting which videos to include
+
+        Returns:
+            tuple: (list of video IDs, key of the last one or None if no more pages)
+        """
+        with self._lock:
+            return page_keys(self._sorted[sort], order, after=after, limit=limit, predicate=predicate)
+
+
+def page_keys(entries, order="desc", after=None, limit=50, predicate=None):
+    """Return up to ``limit`` video IDs from a sorted list of ``(value, video_id)`` keys
+
+    See VideoIndex.page for the arguments and return value.
+    """
+    if order == "asc":
+        start = bisect.bisect_right(entries, after) if after else 0
+        positions = range(start, len(entries))
+    else:
+        start = bisect.bisect_left(entries, after) if after else len(entries)
+        positions = range(start - 1, -1, -1)
+
+    ids = []
+    last_key = None
+    for i in positions:
+        key = entries[i]
+        if predicate is not None and not predicate(key[1]):
+            continue
+        if len(ids) == limit:
+            # There is at least one more match, so hand out a cursor
+            return ids, last_key
+        ids.append(key[1])
+        last_key = key
+    return ids, None
@@ -0,0 +1,127 @@
+"""
+YouTube Archiver Library - Playlist Membership
+
+This module provides the many-to-many index between playlists and videos.
+Each playlist keeps its video IDs in playlist order and each video knows
+every playlist it appears in, so a playlist view costs O(playlist size)
+instead of a scan of the whole archive.
+"""
+
+import threading
+
+
+class PlaylistMembership:
+    """Playlists mapped to their ordered video IDs, and videos to their playlists
+
+    A playlist lists the entries seen by its last scan, downloaded or not, so
+    positions match the playlist on YouTube. Videos added outside a scan are
+    appended until the next scan puts them in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._order = {}
+        self._positions = {}
+        self._playlists = {}
+
+    def rebuild(self, memberships):
+        """Rebuild the index from a dict of playlist ID -> ordered video IDs"""
+        with self._lock:
+            self._order = {}
+            self._positions = {}
+            self._playlists = {}
+            for playlist_id, video_ids in memberships.items():
+                self._set(playlist_id, video_ids)
+
+    def _set(self, playlist_id, video_ids):
+        old = self._order.get(playlist_id, [])
+        order = list(dict.fromkeys(video_ids))
+        for video_id in set(old) - set(order):
+            playlists = self._playlists.get(video_id)
+            if playlists is not None:
+                playlists.discard(playlist_id)
+                if not playlists:
+                    del self._playlists[video_id]
+        for video_id in order:
+            self._playlists.setdefault(video_id, set()).add(playlist_id)
+        self._order[playlist_id] = order
+        self._positions[playlist_id] = {video_id: i for i, video_id in enumerate(order)}
+        return set(old) ^ set(order)
+
+    def set_playlist(self, playlist_id, video_ids):
+        """Replace the videos of a playlist with the order found by a full scan
+
+        Returns:
+            set: IDs of the videos that joined or left the playlist
+        """
+        with self._lock:
+            return self._set(playlist_id, video_ids)
+
+    def merge_head(self, playlist_id, video_ids):
+        """Move the entries found by an incremental scan to the top of a playlist
+
+        Returns:
+            set: IDs of the videos that joined the playlist
+        """
+        with self._lock:
+            head = list(dict.fromkeys(video_ids))
+            scanned = set(head)
+            rest = [video_id for video_id in self._order.get(playlist_id, []) if video_id not in scanned]
+            return self._set(playlist_id, head + rest)
+
+    def add(self, playlist_id, video_id):
+        """Append a video to a playlist unless it is already in it
+
+        Returns:
+            bool: True if the video was added
+        """
+        with self._lock:
+            positions = self._positions.setdefault(playlist_id, {})
+            if video_id in positions:
+                return False
+            order = self._order.setdefault(playlist_id, [])
+            positions[video_id] = len(order)
+            order.append(video_id)
+            self._playlists.setdefault(video_id, set()).add(playlist_id)
+            return True
+
+    def seed(self, videos):
+        """Add every video record to the playlist named by its ``playlist_id``
+
+        Used to build the index for catalogs written before it existed.
+
+        Returns:
+            set: IDs of the playlists that changed
+        """
+        changed = set()
+        for video_id, video in videos.items():
+            playlist_id = video.get("playlist_id")
+            if playlist_id and self.add(playlist_id, video_id):
+                changed.add(playlist_id)
+        return changed
+
+    def remove_playlist(self, playlist_id):
+        with self._lock:
+            self._set(playlist_id, [])
+            del self._order[playlist_id]
+            del self._positions[playlist_id]
+
+    def videos(self, playlist_id):
+        """Return the video IDs of a playlist in playlist order"""
+        with self._lock:
+            return list(self._order.get(playlist_id, []))
+
+    def playlists(self, video_id):
+        """Return the IDs of the playlists a video is in"""
+        with self._lock:
+            return sorted(self._playlists.get(video_id, ()))
+
+    def position(self, playlist_id, video_id):
+        """Return the zero-based position of a video in a playlist, or None"""
+        with self._lock:
+            return self._positions.get(playlist_id, {}).get(video_id)
+
+    def snapshot(self):
+        """Return every playlist's ordered video IDs"""
+        with self._lock:
+            return {playlist_id: list(order) for playlist_id, order in self._order.items()}
@@ -0,0 +1,214 @@
+"""
+YouTube Archiver Library - Metrics
+
+This module provides counters, gauges and histograms for the archiver's hot
+paths and renders them in the Prometheus text exposition format, without
+depending on a Prometheus client library. Metrics are module-level objects
+registered with ``REGISTRY``, so any module can record into them.
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+PREFIX = "youtube_archiver_"
+
+# Bucket bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DOWNLOAD_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) tuples"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield "", key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the ``with`` block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state["counts"]), state["sum"]) for key, state in self._values.items()]
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield "_bucket", key, (("le", _format_value(float(bound))),), cumulative
+            yield "_sum", key, (), total
+            yield "_count", key, (), cumulative
+
+
+class Registry:
+    """The set of metrics rendered by the /metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """Return every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+EXTRACT_INFO_SECONDS = Histogram(
+    "extract_info_seconds", "Time for yt-dlp extract_info to return a playlist (its first page when paged lazily)",
+    ["playlist"], buckets=SLOW_BUCKETS)
+PLAYLIST_ENTRIES = Counter(
+    "playlist_entries_total", "Playlist entries enumerated", ["playlist"])
+DOWNLOADS = Counter(
+    "downloads_total", "Video downloads by result", ["result"])
+DOWNLOAD_SECONDS = Histogram(
+    "download_seconds", "Wall time of a video download, including post-processing",
+    ["result"], buckets=DOWNLOAD_BUCKETS)
+DOWNLOAD_BYTES = Counter(
+    "download_bytes_total", "Bytes downloaded from YouTube")
+POSTPROCESS_SECONDS = Histogram(
+    "postprocess_seconds", "Time spent in each yt-dlp postprocessor, such as the ffmpeg merge",
+    ["postprocessor"], buckets=SLOW_BUCKETS)
+CATALOG_SAVE_SECONDS = Histogram(
+    "catalog_save_seconds", "Time to save a whole catalog", ["catalog"])
+SNAPSHOT_SECONDS = Histogram(
+    "snapshot_write_seconds", "Time to serialize and write a JSON snapshot", ["file"])
+SNAPSHOT_BYTES = Gauge(
+    "snapshot_bytes", "Size of the last JSON snapshot written", ["file"])
+FIND_VIDEO_FILE_SECONDS = Histogram(
+    "find_video_file_seconds", "Latency of find_video_file", ["source"])
+STORAGE_STATS_SECONDS = Histogram(
+    "storage_stats_seconds", "Latency of get_storage_stats")
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Latency of web requests per route", ["route", "method", "status"])
+DOWNLOAD_QUEUE_DEPTH = Gauge(
+    "download_queue_depth", "Videos waiting for a download worker")
+ACTIVE_DOWNLOADS = Gauge(
+    "active_downloads", "Downloads in progress")
+CONCURRENCY_LIMIT = Gauge(
+    "concurrency_limit", "Concurrency chosen by the adaptive controller", ["level"])
+CONCURRENCY_DECISIONS = Counter(
+    "concurrency_decisions_total", "Adaptive concurrency changes", ["action", "reason"])
+JOBS = Gauge(
+    "jobs", "Sync jobs in the job queue by state", ["state"])
+EVENT_STREAM_CLIENTS = Gauge(
+    "event_stream_clients", "Browsers connected to the event stream")
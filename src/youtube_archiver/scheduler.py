@@ -0,0 +1,73 @@
+"""
+YouTube Archiver Library - Download Scheduling
+
+This module provides the shared download-slot budget used when several
+playlists are synced at the same time.
+"""
+
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+class DownloadSlots:
+    """A global budget of download slots shared fairly between playlists
+
+    Every download asks for a slot on behalf of an owner (the playlist it
+    belongs to). When a slot frees up it goes to the waiting owner with the
+    fewest downloads in flight, oldest request first, so a playlist with a
+    handful of new videos is never stuck behind a large backfill.
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, int(limit))
+        self._cond = threading.Condition()
+        self._active = {}
+        self._waiting = []
+        self._tickets = itertools.count()
+
+    @property
+    def in_use(self):
+        """Number of slots currently held"""
+        with self._cond:
+            return sum(self._active.values())
+
+    def resize(self, limit):
+        """Change the number of slots; held slots are kept until released"""
+        with self._cond:
+            self.limit = max(1, int(limit))
+            self._cond.notify_all()
+
+    def _next_waiter(self):
+        return min(self._waiting, key=lambda w: (self._active.get(w[0], 0), w[1]))
+
+    def acquire(self, owner):
+        """Block until a slot is granted to ``owner``"""
+        with self._cond:
+            waiter = (owner, next(self._tickets))
+            self._waiting.append(waiter)
+            try:
+                while sum(self._active.values()) >= self.limit or self._next_waiter() != waiter:
+                    self._cond.wait()
+            finally:
+                self._waiting.remove(waiter)
+            self._active[owner] = self._active.get(owner, 0) + 1
+            # Another slot may still be free for the next waiter in line
+            self._cond.notify_all()
+
+    def release(self, owner):
+        """Return a slot previously granted to ``owner``"""
+        with self._cond:
+            self._active[owner] -= 1
+            if not self._active[owner]:
+                del self._active[owner]
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, owner):
+        """Context manager holding one slot for ``owner``"""
+        self.acquire(owner)
+        try:
+            yield
+        finally:
+            self.release(owner)
@@ -0,0 +1,224 @@
+"""
+YouTube Archiver Library - Search Index
+
+This module provides the inverted index behind title search. Video titles,
+uploaders and playlist titles are split into tokens, and each token maps to
+the videos that contain it, so a query only touches the postings of its own
+terms instead of every video in the archive.
+"""
+
+import re
+import bisect
+import itertools
+import threading
+
+# Relative weight of a token depending on the field it was found in
+FIELD_WEIGHTS = (("title", 3.0), ("uploader", 2.0), ("playlist_title", 1.0))
+
+# Prefix matches score less than exact token matches
+PREFIX_FACTOR = 0.5
+
+# Upper bound on the number of tokens a single prefix expands to
+MAX_PREFIX_EXPANSION = 256
+
+# Distinct terms of a query beyond this many are ignored
+MAX_QUERY_TERMS = 8
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN_RE.findall((text or "").casefold())
+
+
+class SearchIndex:
+    """Inverted index from tokens to video IDs
+
+    Each token maps to ``{weight: set of video IDs}``. Keeping the postings
+    as sets split by weight means matching and ranking are done with set
+    operations, even for tokens shared by most of the archive (such as a
+    playlist title), rather than by visiting every matching video. The
+    distinct tokens are also kept in a sorted list so prefix queries are a
+    binary search followed by a short scan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._tokens = []
+        self._docs = {}
+
+    def rebuild(self, documents):
+        """Rebuild the index from a dict of video_id -> searchable fields"""
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            for video_id, fields in documents.items():
+                weights = _weigh(fields)
+                self._docs[video_id] = weights
+                for token, weight in weights.items():
+                    self._postings.setdefault(token, {}).setdefault(weight, set()).add(video_id)
+            self._tokens = sorted(self._postings)
+
+    def add(self, video_id, fields):
+        """Index a new or updated video
+
+        Args:
+            video_id: ID of the video
+            fields: dict with any of ``title``, ``uploader`` and ``playlist_title``
+        """
+        weights = _weigh(fields)
+        with self._lock:
+            self._discard(video_id)
+            self._docs[video_id] = weights
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    bisect.insort(self._tokens, token)
+                postings.setdefault(weight, set()).add(video_id)
+
+    def remove(self, video_id):
+        with self._lock:
+            self._discard(video_id)
+
+    def _discard(self, video_id):
+        weights = self._docs.pop(video_id, None)
+        if weights is None:
+            return
+        for token, weight in weights.items():
+            postings = self._postings[token]
+            postings[weight].discard(video_id)
+            if not postings[weight]:
+                del postings[weight]
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._tokens, token)
+                del self._tokens[i]
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _term_tiers(self, term, prefix):
+        """Return [(score, set of video IDs)] for one query term, best first
+
+        The sets are disjoint: each video appears once, in its best tier.
+        They may be the index's own posting sets, so callers must hold the
+        lock while using them and must not modify them.
+        """
+        tiers = {}
+        for weight, ids in self._postings.get(term, {}).items():
+            tiers.setdefault(weight, []).append(ids)
+
+        if prefix:
+            start = bisect.bisect_right(self._tokens, term)
+            for token in self._tokens[start:start + MAX_PREFIX_EXPANSION]:
+                if not token.startswith(term):
+                    break
+                for weight, ids in self._postings[token].items():
+                    tiers.setdefault(weight * PREFIX_FACTOR, []).append(ids)
+
+        result = []
+        seen = None
+        scores = sorted(tiers, reverse=True)
+        for i, score in enumerate(scores):
+            sets = tiers[score]
+            ids = sets[0] if len(sets) == 1 else set().union(*sets)
+            if seen is not None:
+                ids = ids - seen
+            if not ids:
+                continue
+            result.append((score, ids))
+            if i < len(scores) - 1:
+                seen = ids if seen is None else seen | ids
+        return result
+
+    def _parse(self, query):
+        """Return the distinct (token, prefix) terms of a query
+
+        A repeated word adds nothing, and an exact occurrence of a word makes
+        a prefix occurrence of it redundant.
+        """
+        raw_terms = query.split()
+        terms = {}
+        for i, raw in enumerate(raw_terms):
+            prefix = raw.endswith("*") or i == len(raw_terms) - 1
+            for token in tokenize(raw):
+                terms[token] = terms.get(token, True) and prefix
+        return list(terms.items())[:MAX_QUERY_TERMS]
+
+    def matches(self, query):
+        """Return the set of video IDs matching every term of a query"""
+        terms = self._parse(query)
+        if not terms:
+            return set()
+        with self._lock:
+            per_term = [set().union(*(ids for _, ids in self._term_tiers(token, prefix)))
+                        for token, prefix in terms]
+        return per_term[0].intersection(*per_term[1:])
+
+    def search(self, query, limit=50):
+        """Find the videos matching every term of a query
+
+        The last term is matched as a prefix, so results appear while a word
+        is still being typed; a trailing ``*`` makes any other term a prefix
+        too. Exact token matches rank above prefix matches, and title matches
+        above uploader and playlist matches. Results with equal scores are
+        listed by video ID; when more of them match than fit in ``limit``,
+        which ones are returned is arbitrary.
+
+        Args:
+            query: Search text
+            limit: Maximum number of results, or None for all of them
+
+        Returns:
+            list: (video_id, score) tuples, best match first
+        """
+        terms = self._parse(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            per_term = [self._term_tiers(token, prefix) for token, prefix in terms]
+            if not all(per_term):
+                return []
+
+            # A video's score is the sum of its tier in every term. Group the
+            # videos matching every term so far by that running sum, one term
+            # at a time and starting with the rarest. Scores are sums of a few
+            # field weights, so there are only ever a handful of groups.
+            groups = {0: None}
+            for tiers in sorted(per_term, key=lambda tiers: sum(len(ids) for _, ids in tiers)):
+                merged = {}
+                for total, group in groups.items():
+                    for score, ids in tiers:
+                        matched = ids if group is None else group & ids
+                        if not matched:
+                            continue
+                        key = total + score
+                        merged[key] = merged[key] | matched if key in merged else set(matched)
+                groups = merged
+                if not groups:
+                    return []
+
+            results = []
+            for score in sorted(groups, reverse=True):
+                remaining = None if limit is None else limit - len(results)
+                if remaining == 0:
+                    break
+                ids = groups[score]
+                if remaining is not None and len(ids) > remaining:
+                    ids = itertools.islice(ids, remaining)
+                results.extend((video_id, score) for video_id in sorted(ids))
+        return results
+
+
+def _weigh(fields):
+    """Return {token: weight} for a video, keeping each token's best field"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(fields.get(field)):
+            if weight > weights.get(token, 0):
+                weights[token] = weight
+    return weights
@@ -0,0 +1,178 @@
+"""
+YouTube Archiver Library - Bandwidth Shaping
+
+This module provides a token-bucket rate limiter shared by every active
+download, so concurrent downloads together stay under a configured cap. The
+cap can change with the time of day (for example unlimited overnight and
+2 MB/s during the day). Downloads draw from the bucket through a yt-dlp
+progress hook, so the available bandwidth is redistributed automatically as
+downloads start and finish.
+"""
+
+import re
+import time
+import threading
+from datetime import datetime
+
+# Bytes per "MB" in the settings page
+MB = 1000 * 1000
+
+WINDOW_RE = re.compile(r"^(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})\s+(\S+)$")
+
+
+def _minutes(value):
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time: {value}")
+    return hours * 60 + minutes
+
+
+def parse_schedule(text):
+    """Parse schedule windows written one per line as ``HH:MM-HH:MM LIMIT``
+
+    LIMIT is in MB/s, or ``unlimited``. Blank lines are ignored.
+
+    Returns:
+        list: Windows as {"start", "end", "limit"} dicts, limit in bytes per second or None
+
+    Raises:
+        ValueError: If a line cannot be parsed
+    """
+    windows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = WINDOW_RE.match(line)
+        if not match:
+            raise ValueError(f"Invalid schedule window: {line}")
+        start, end, limit = match.groups()
+        _minutes(start), _minutes(end)
+        if limit.lower() in ("unlimited", "none", "0"):
+            limit = None
+        else:
+            limit = int(float(limit) * MB)
+        windows.append({"start": start, "end": end, "limit": limit})
+    return windows
+
+
+def format_schedule(windows):
+    """Inverse of parse_schedule, for the settings form"""
+    lines = []
+    for window in windows or []:
+        limit = "unlimited" if not window.get("limit") else f"{window['limit'] / MB:g}"
+        lines.append(f"{window['start']}-{window['end']} {limit}")
+    return "\n".join(lines)
+
+
+class BandwidthShaper:
+    """A global download rate limit with time-of-day windows
+
+    Args:
+        limit: Bytes per second outside any window, or None for no limit
+        schedule: Windows as {"start": "HH:MM", "end": "HH:MM", "limit": bytes/s or None};
+            a window whose end is before its start runs over midnight
+        burst: Seconds of traffic the bucket can hold
+    """
+
+    def __init__(self, limit=None, schedule=None, burst=1.0):
+        self._lock = threading.Lock()
+        self.burst = burst
+        self.limit = None
+        self.schedule = []
+        self._tokens = 0.0
+        self._rate = None
+        self._updated = time.monotonic()
+        self._active = set()
+        self.configure(limit, schedule)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get("bandwidth_limit"), config.get("bandwidth_schedule"))
+
+    def configure(self, limit=None, schedule=None):
+        """Change the cap and schedule; takes effect for downloads in progress"""
+        with self._lock:
+            self.limit = int(limit) if limit else None
+            self.schedule = [dict(window, limit=int(window["limit"]) if window.get("limit") else None)
+                             for window in schedule or []]
+
+    def current_limit(self, now=None):
+        """The cap in bytes per second at ``now`` (default: the local time), or None"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for window in self.schedule:
+            start, end = _minutes(window["start"]), _minutes(window["end"])
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end
+            if inside:
+                return window["limit"]
+        return self.limit
+
+    def consume(self, amount):
+        """Take ``amount`` bytes from the bucket, sleeping if it runs dry
+
+        Each caller is charged immediately and then waits until the bucket
+        has refilled past its debt, so concurrent downloads are served in
+        the order they asked and together never exceed the rate.
+        """
+        rate = self.current_limit()
+        with self._lock:
+            now = time.monotonic()
+            if rate != self._rate:
+                # The cap changed (or a window began/ended): start from a full bucket
+                self._rate = rate
+                self._tokens = rate * self.burst if rate else 0.0
+            elif rate:
+                self._tokens = min(rate * self.burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            if not rate:
+                return 0.0
+            self._tokens -= amount
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def start(self, video_id):
+        """Register an active download
+
+        Returns:
+            callable: A yt-dlp progress hook that charges the download's bytes to the bucket
+        """
+        with self._lock:
+            self._active.add(video_id)
+        downloaded = {}
+
+        def progress_hook(d):
+            if d.get("status") != "downloading":
+                return
+            filename = d.get("filename") or d.get("tmpfilename") or ""
+            current = d.get("downloaded_bytes") or 0
+            delta = current - downloaded.get(filename, 0)
+            downloaded[filename] = current
+            if delta > 0:
+                self.consume(delta)
+
+        return progress_hook
+
+    def finish(self, video_id):
+        """Unregister a download, leaving its share to the others"""
+        with self._lock:
+            self._active.discard(video_id)
+
+    def snapshot(self):
+        """Return the current cap and each active download's fair share"""
+        limit = self.current_limit()
+        with self._lock:
+            active = len(self._active)
+        return {
+            "limit": limit,
+            "base_limit": self.limit,
+            "schedule": list(self.schedule),
+            "active_downloads": active,
+            "share": limit / active if limit and active else None
+        }
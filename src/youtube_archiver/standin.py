@@ -0,0 +1,365 @@
+"""
+YouTube Archiver Library - Local YouTube Stand-in
+
+This module provides a small local HTTP service that plays the part of
+YouTube for end-to-end tests. It serves synthetic playlists (paged, like the
+real thing), per-video metadata and throttled media streams, and can be told
+to answer with 429s or other errors. ``StandinIE`` is the yt-dlp extractor
+for it (``standin_extractor`` builds one for a given address); an archiver whose config has a ``test_server`` URL routes playlist
+extraction and downloads through it instead of YouTube, so downloads, merges
+and retries are exercised for real without network access.
+
+Usage:
+    python -m youtube_archiver.standin --port 8900 --videos 50 --bandwidth 2000000
+    # then set "test_server": "http://127.0.0.1:8900" in config.json
+"""
+
+import re
+import json
+import time
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from yt_dlp.extractor.common import InfoExtractor
+
+# Bytes written per throttled send
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_PATH_RE = re.compile(r"^/media/(?P<id>[^/]+)/(?P<stream>[a-z]+)\.(?P<ext>[a-z0-9]+)$")
+
+# Format IDs, extensions and codecs of the streams served for each video
+STREAMS = {
+    "combined": {"format_id": "18", "ext": "mp4", "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "height": 720},
+    "video": {"format_id": "137", "ext": "mp4", "vcodec": "avc1.640028", "acodec": "none", "height": 1080},
+    "audio": {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2", "height": None},
+}
+
+
+def synthetic_playlists(count=1, videos=20):
+    """Playlists of numbered videos: {playlist_id: {"title", "entries": [(video_id, title)]}}"""
+    playlists = {}
+    n = 0
+    for p in range(count):
+        entries = []
+        for _ in range(videos):
+            entries.append((f"sv{n:09d}", f"Stand-in video {n}"))
+            n += 1
+        playlists[f"PLSTANDIN{p:03d}"] = {"title": f"Stand-in playlist {p}", "entries": entries}
+    return playlists
+
+
+class StandinServer:
+    """A local stand-in for YouTube
+
+    Args:
+        playlists: dict of playlist_id -> {"title": ..., "entries": [(video_id, title), ...]};
+            defaults to one playlist of 20 synthetic videos
+        host: Interface to listen on
+        port: Port to listen on, 0 for any free port
+        page_size: Playlist entries per page
+        latency: Seconds added to every metadata (playlist and video) response
+        bandwidth: Bytes per second per media stream, or None for no limit
+        video_size: Bytes per synthetic video (split 80/20 between video and
+            audio when streams are separate)
+        separate_streams: Offer video-only and audio-only formats, so yt-dlp
+            downloads both and merges them with ffmpeg
+        media_files: Optional {"combined"|"video"|"audio": path} of real media to serve
+            instead of synthetic bytes; needed for the ffmpeg merge to succeed
+        failure_rate: Fraction of videos whose media always fails with a 403
+    """
+
+    def __init__(self, playlists=None, host="127.0.0.1", port=0, page_size=100, latency=0.0,
+                 bandwidth=None, video_size=1024 * 1024, separate_streams=False, media_files=None,
+                 failure_rate=0.0):
+        self.playlists = playlists if playlists is not None else synthetic_playlists()
+        self.page_size = page_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.video_size = video_size
+        self.separate_streams = separate_streams
+        self.failure_rate = failure_rate
+        self.media = {}
+        for stream, path in (media_files or {}).items():
+            with open(path, "rb") as f:
+                self.media[stream] = f.read()
+
+        self._lock = threading.Lock()
+        self._faults = []
+        self.stats = {"requests": 0, "media_requests": 0, "errors_served": 0, "bytes_sent": 0,
+                      "active_streams": 0, "max_active_streams": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def videos(self):
+        return {video_id: title
+                for playlist in self.playlists.values()
+                for video_id, title in playlist["entries"]}
+
+    def start(self):
+        """Serve requests from a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin-server")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def inject(self, status=429, times=1, match="", retry_after=None):
+        """Answer the next ``times`` requests whose path contains ``match`` with ``status``
+
+        Args:
+            status: HTTP status to return, 429 by default
+            times: Number of requests to fail
+            match: Substring of the request path (such as a video ID or "/media/")
+            retry_after: Optional Retry-After header value, in seconds
+        """
+        with self._lock:
+            self._faults.append({"status": status, "times": times, "match": match,
+                                 "retry_after": retry_after})
+
+    def failing(self, video_id):
+        """Whether a video's media always fails; stable for a given ID"""
+        return (zlib.crc32(video_id.encode()) % 10000) < self.failure_rate * 10000
+
+    def _take_fault(self, path):
+        with self._lock:
+            for fault in self._faults:
+                if fault["match"] in path:
+                    fault["times"] -= 1
+                    if fault["times"] <= 0:
+                        self._faults.remove(fault)
+                    return fault
+        return None
+
+    def _count(self, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+            self.stats["max_active_streams"] = max(self.stats["max_active_streams"],
+                                                   self.stats["active_streams"])
+
+    def _payload(self, stream):
+        """The bytes of one media stream"""
+        if stream in self.media:
+            return self.media[stream]
+        if stream == "video":
+            size = int(self.video_size * 0.8)
+        elif stream == "audio":
+            size = self.video_size - int(self.video_size * 0.8)
+        else:
+            size = self.video_size
+        return bytes(size)
+
+    def playlist_page(self, playlist_id, page):
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            return None
+        start = page * self.page_size
+        entries = playlist["entries"][start:start + self.page_size]
+        return {
+            "id": playlist_id,
+            "title": playlist["title"],
+            "uploader": playlist.get("uploader", "Stand-in"),
+            "entries": [{"id": video_id, "title": title} for video_id, title in entries],
+            "next_page": page + 1 if start + self.page_size < len(playlist["entries"]) else None
+        }
+
+    def video_info(self, video_id):
+        title = self.videos.get(video_id)
+        if title is None:
+            return None
+        streams = ("video", "audio") if self.separate_streams else ("combined",)
+        formats = []
+        for stream in streams:
+            spec = STREAMS[stream]
+            formats.append(dict(spec, url=f"{self.url}/media/{video_id}/{stream}.{spec['ext']}",
+                                filesize=len(self._payload(stream)), protocol="http"))
+        return {"id": video_id, "title": title, "uploader": "Stand-in", "duration": 60,
+                "formats": formats}
+
+
+def _handler(server):
+    class StandinHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            server._count(requests=1)
+            fault = server._take_fault(self.path)
+            if fault:
+                server._count(errors_served=1)
+                headers = {"Retry-After": str(fault["retry_after"])} if fault["retry_after"] is not None else {}
+                return self._send_json({"error": "injected"}, fault["status"], headers)
+
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            media = MEDIA_PATH_RE.match(parts.path)
+
+            if media:
+                return self._send_media(media.group("id"), media.group("stream"))
+
+            time.sleep(server.latency)
+            if parts.path == "/api/playlist":
+                page = server.playlist_page(query.get("list", [""])[0], int(query.get("page", ["0"])[0]))
+                return self._send_json(page) if page else self._send_json({"error": "not found"}, 404)
+            if parts.path == "/api/video":
+                info = server.video_info(query.get("v", [""])[0])
+                return self._send_json(info) if info else self._send_json({"error": "not found"}, 404)
+            if parts.path in ("/playlist", "/watch"):
+                # What a browser would get; yt-dlp uses the API endpoints
+                return self._send_json({"stand_in": True})
+            return self._send_json({"error": "not found"}, 404)
+
+        def _send_json(self, data, status=200, headers=None):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_media(self, video_id, stream):
+            if video_id not in server.videos or stream not in STREAMS:
+                return self._send_json({"error": "not found"}, 404)
+            if server.failing(video_id):
+                server._count(errors_served=1)
+                return self._send_json({"error": "forbidden"}, 403)
+
+            payload = server._payload(stream)
+            start, end = 0, len(payload) - 1
+            byte_range = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+            if byte_range and byte_range.group(1):
+                start = int(byte_range.group(1))
+                end = min(end, int(byte_range.group(2))) if byte_range.group(2) else end
+
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", "video/mp4" if stream != "audio" else "audio/mp4")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+            self.end_headers()
+
+            server._count(media_requests=1, active_streams=1)
+            try:
+                sent_started = time.monotonic()
+                sent = 0
+                position = start
+                while position <= end:
+                    chunk = payload[position:min(end + 1, position + CHUNK_SIZE)]
+                    self.wfile.write(chunk)
+                    position += len(chunk)
+                    sent += len(chunk)
+                    server._count(bytes_sent=len(chunk))
+                    if server.bandwidth:
+                        time.sleep(max(0.0, sent / server.bandwidth - (time.monotonic() - sent_started)))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                server._count(active_streams=-1)
+
+    return StandinHandler
+
+
+class StandinIE(InfoExtractor):
+    """yt-dlp extractor for the stand-in server's /playlist and /watch URLs
+
+    Matches a stand-in on the loopback interface; standin_extractor builds
+    one for a stand-in at any other address.
+    """
+
+    IE_NAME = "standin"
+    _PATH = r"/(?P<kind>playlist|watch)\?(?:list|v)=(?P<id>[^&#]+)"
+    _VALID_URL = r"(?P<base>https?://(?:localhost|127\.0\.0\.1|\[::1\])(?::\d+)?)" + _PATH
+
+    def _real_extract(self, url):
+        base, kind, item_id = self._match_valid_url(url).group("base", "kind", "id")
+
+        if kind == "watch":
+            info = self._download_json(f"{base}/api/video?v={item_id}", item_id)
+            return info
+
+        first = self._download_json(f"{base}/api/playlist?list={item_id}&page=0", item_id,
+                                    note="Downloading playlist page 0")
+
+        def entries():
+            page = first
+            while True:
+                for entry in page["entries"]:
+                    yield self.url_result(f"{base}/watch?v={entry['id']}", type(self),
+                                          entry["id"], entry["title"])
+                if page["next_page"] is None:
+                    return
+                number = page["next_page"]
+                page = self._download_json(f"{base}/api/playlist?list={item_id}&page={number}", item_id,
+                                           note=f"Downloading playlist page {number}")
+
+        return self.playlist_result(entries(), item_id, first["title"], uploader=first["uploader"])
+
+
+def standin_extractor(server_url):
+    """Return a StandinIE that only matches URLs of the stand-in at ``server_url``
+
+    Args:
+        server_url: The configured ``test_server``, e.g. "http://10.0.0.5:8900"
+    """
+    base = re.escape(server_url.rstrip("/"))
+    return type("ConfiguredStandinIE", (StandinIE,), {"_VALID_URL": f"(?P<base>{base})" + StandinIE._PATH})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local YouTube stand-in for end-to-end tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--playlists", type=int, default=1, help="Number of synthetic playlists")
+    parser.add_argument("--videos", type=int, default=20, help="Videos per playlist")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per metadata response")
+    parser.add_argument("--bandwidth", type=float, help="Bytes per second per media stream")
+    parser.add_argument("--video-size", type=int, default=1024 * 1024)
+    parser.add_argument("--separate-streams", action="store_true",
+                        help="Serve separate video and audio formats (merged with ffmpeg)")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StandinServer(synthetic_playlists(args.playlists, args.videos), host=args.host, port=args.port,
+                           page_size=args.page_size, latency=args.latency, bandwidth=args.bandwidth,
+                           video_size=args.video_size, separate_streams=args.separate_streams,
+                           failure_rate=args.failure_rate)
+    print(f"Stand-in serving at {server.url}")
+    for playlist_id in server.playlists:
+        print(f"  {server.url}/playlist?list={playlist_id}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
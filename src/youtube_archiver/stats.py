@@ -0,0 +1,88 @@
+"""
+YouTube Archiver Library - Storage Statistics
+
+This module provides the running storage totals behind the dashboard and
+playlist statistics, so they can be read without scanning the disk.
+"""
+
+import os
+import threading
+
+
+class StorageTotals:
+    """Running totals of the files in the download directory
+
+    Tracks total bytes and file count, plus bytes and counts per playlist and
+    bytes per extension. A video in several playlists counts towards each of
+    them. Each file is remembered with its size so it can be removed again
+    exactly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self.total_size = 0
+        self.by_playlist = {}
+        self.by_extension = {}
+
+    @property
+    def video_count(self):
+        return len(self._files)
+
+    def add(self, file_path, size, playlists=()):
+        """Account for a file, replacing any earlier entry for the same path
+
+        Args:
+            file_path: Path of the file
+            size: Size in bytes
+            playlists: IDs of the playlists the file's video is in
+        """
+        ext = os.path.splitext(file_path)[1]
+        with self._lock:
+            self._discard(file_path)
+            self._add(file_path, size, ext, tuple(playlists))
+
+    def _add(self, file_path, size, ext, playlists):
+        self._files[file_path] = (size, ext, playlists)
+        self.total_size += size
+        self.by_extension[ext] = self.by_extension.get(ext, 0) + size
+        for playlist_id in playlists:
+            totals = self.by_playlist.setdefault(playlist_id, {"size": 0, "count": 0})
+            totals["size"] += size
+            totals["count"] += 1
+
+    def retag(self, file_path, playlists):
+        """Change the playlists a file counts towards, keeping its size"""
+        with self._lock:
+            entry = self._files.get(file_path)
+            if entry is None:
+                return
+            self._discard(file_path)
+            self._add(file_path, entry[0], entry[1], tuple(playlists))
+
+    def remove(self, file_path):
+        """Stop accounting for a file"""
+        with self._lock:
+            self._discard(file_path)
+
+    def _discard(self, file_path):
+        entry = self._files.pop(file_path, None)
+        if entry is None:
+            return
+        size, ext, playlists = entry
+        self.total_size -= size
+        self.by_extension[ext] -= size
+        if not self.by_extension[ext]:
+            del self.by_extension[ext]
+        for playlist_id in playlists:
+            totals = self.by_playlist[playlist_id]
+            totals["size"] -= size
+            totals["count"] -= 1
+            if not totals["count"]:
+                del self.by_playlist[playlist_id]
+
+    def playlist(self, playlist_id):
+        """Return (size, count) for a playlist"""
+        with self._lock:
+            totals = self.by_playlist.get(playlist_id, {"size": 0, "count": 0})
+            return totals["size"], totals["count"]
@@ -0,0 +1,424 @@
+"""
+YouTube Archiver Library - Catalog Storage
+
+This module provides the storage backends used to persist the catalog of
+playlists and downloaded videos:
+1. JSONCatalogStore keeps the original playlists.json / downloaded_videos.json files,
+   journaling video changes between compactions
+2. SQLiteCatalogStore keeps everything in an embedded, indexed SQLite database
+"""
+
+import os
+import copy
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from .journal import CatalogJournal, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class CatalogStore(ABC):
+    """Base class for catalog storage backends
+
+    The archiver keeps the catalog in memory as two dictionaries and calls
+    the ``put_*``/``remove_*`` methods for every single-record change. The
+    ``save_*`` methods persist a whole dictionary at once.
+    """
+
+    @abstractmethod
+    def load_playlists(self):
+        """Return the stored playlists as a dict keyed by playlist ID"""
+
+    @abstractmethod
+    def load_videos(self):
+        """Return the stored videos as a dict keyed by video ID"""
+
+    @abstractmethod
+    def save_playlists(self, playlists):
+        """Replace all stored playlists"""
+
+    @abstractmethod
+    def save_videos(self, videos):
+        """Replace all stored videos"""
+
+    @abstractmethod
+    def put_playlist(self, playlist_id, playlist):
+        """Insert or update a single playlist"""
+
+    @abstractmethod
+    def remove_playlist(self, playlist_id):
+        """Remove a single playlist"""
+
+    @abstractmethod
+    def put_video(self, video_id, video):
+        """Insert or update a single video"""
+
+    @abstractmethod
+    def remove_video(self, video_id):
+        """Remove a single video"""
+
+    @abstractmethod
+    def load_memberships(self):
+        """Return each playlist's video IDs, in playlist order, keyed by playlist ID"""
+
+    @abstractmethod
+    def save_memberships(self, memberships):
+        """Replace the video lists of all playlists"""
+
+    @abstractmethod
+    def put_membership(self, playlist_id, video_ids):
+        """Replace the video list of a single playlist"""
+
+    def close(self):
+        """Release any resources held by the store"""
+
+
+class JSONCatalogStore(CatalogStore):
+    """Catalog stored as JSON documents
+
+    Playlist changes rewrite playlists.json. Video changes are appended to a
+    CatalogJournal next to downloaded_videos.json and folded back into it
+    by a background compaction once the journal grows past
+    ``compact_threshold`` records. Playlist membership is kept in
+    playlist_membership.json, rewritten once per playlist sync.
+    """
+
+    def __init__(self, playlists_file, videos_file, fsync_interval=1.0, compact_threshold=500,
+                 membership_file=None, read_only=False):
+        self.playlists_file = playlists_file
+        # A read-only store never compacts, since the snapshot and journal
+        # belong to the process that holds the catalog lock
+        self.read_only = read_only
+        self.videos_file = videos_file
+        self.membership_file = membership_file or os.path.join(os.path.dirname(playlists_file),
+                                                               "playlist_membership.json")
+        self.journal = CatalogJournal(videos_file, fsync_interval=fsync_interval,
+                                      compact_threshold=compact_threshold)
+        self._playlists = {}
+        self._videos = {}
+        self._memberships = {}
+        self._lock = threading.RLock()
+        self._compactor = None
+
+    def _dump(self, path, data):
+        write_snapshot(path, data)
+
+    def load_playlists(self):
+        with self._lock:
+            if os.path.exists(self.playlists_file):
+                with open(self.playlists_file, 'r') as f:
+                    self._playlists = json.load(f)
+            else:
+                self._playlists = {}
+                self._dump(self.playlists_file, self._playlists)
+            return dict(self._playlists)
+
+    def load_videos(self):
+        with self._lock:
+            existed = os.path.exists(self.videos_file)
+            self._videos = self.journal.load()
+            if not self.read_only and (not existed or self.journal.needs_compaction()):
+                self.journal.compact(self._videos)
+            return copy.deepcopy(self._videos)
+
+    def save_playlists(self, playlists):
+        with self._lock:
+            self._playlists = dict(playlists)
+            self._dump(self.playlists_file, self._playlists)
+
+    def save_videos(self, videos):
+        with self._lock:
+            self._videos = copy.deepcopy(videos)
+        self.compact()
+
+    def put_playlist(self, playlist_id, playlist):
+        with self._lock:
+            self._playlists[playlist_id] = playlist
+            self._dump(self.playlists_file, self._playlists)
+
+    def remove_playlist(self, playlist_id):
+        with self._lock:
+            self._playlists.pop(playlist_id, None)
+            self._dump(self.playlists_file, self._playlists)
+            if self._memberships.pop(playlist_id, None) is not None:
+                self._dump(self.membership_file, self._memberships)
+
+    def put_video(self, video_id, video):
+        with self._lock:
+            # The store keeps its own copy, so records the caller changes in
+            # place later cannot change under a compaction
+            self._videos[video_id] = copy.deepcopy(video)
+            self.journal.append("put", video_id, video)
+            self._maybe_compact()
+
+    def remove_video(self, video_id):
+        with self._lock:
+            self._videos.pop(video_id, None)
+            self.journal.append("del", video_id)
+            self._maybe_compact()
+
+    def load_memberships(self):
+        with self._lock:
+            if os.path.exists(self.membership_file):
+                with open(self.membership_file, 'r') as f:
+                    self._memberships = json.load(f)
+            else:
+                self._memberships = {}
+            return {playlist_id: list(video_ids) for playlist_id, video_ids in self._memberships.items()}
+
+    def save_memberships(self, memberships):
+        with self._lock:
+            self._memberships = {playlist_id: list(video_ids) for playlist_id, video_ids in memberships.items()}
+            self._dump(self.membership_file, self._memberships)
+
+    def put_membership(self, playlist_id, video_ids):
+        with self._lock:
+            self._memberships[playlist_id] = list(video_ids)
+            self._dump(self.membership_file, self._memberships)
+
+    def _maybe_compact(self):
+        """Start a background compaction when the journal is large enough"""
+        if self.read_only or not self.journal.needs_compaction():
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="catalog-compaction", daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """Fold the video journal into downloaded_videos.json
+
+        Only the snapshot copy and journal rotation block other writers; the
+        snapshot itself is serialized without holding the store lock. Records
+        held by the store are replaced, never changed in place, so the shallow
+        copy is stable while it is written.
+        """
+        try:
+            with self.journal.compaction_lock:
+                with self._lock:
+                    videos = dict(self._videos)
+                    self.journal.rotate()
+                self.journal.write(videos)
+        except OSError as e:
+            print(f"Error compacting catalog journal: {str(e)}")
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        self.journal.close()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    downloaded_at TEXT,
+    playlist_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_downloaded_at ON videos (downloaded_at, id);
+CREATE INDEX IF NOT EXISTS idx_videos_title ON videos (title COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS idx_videos_playlist ON videos (playlist_id);
+CREATE TABLE IF NOT EXISTS playlist_videos (
+    playlist_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    position INTEGER,
+    PRIMARY KEY (playlist_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS idx_playlist_videos_video ON playlist_videos (video_id);
+CREATE INDEX IF NOT EXISTS idx_playlist_videos_position ON playlist_videos (playlist_id, position);
+"""
+
+
+class SQLiteCatalogStore(CatalogStore):
+    """Catalog stored in an embedded SQLite database
+
+    Every single-record change is its own small transaction, so the cost of
+    recording a download does not grow with the size of the catalog. On first
+    open, any existing JSON catalog files are imported once. Playlist
+    membership lives in ``playlist_videos``; videos recorded with a playlist
+    are added to it without a position until the next scan orders them, and
+    removed videos are taken out of it.
+    """
+
+    def __init__(self, db_file, playlists_file=None, videos_file=None):
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._migrate_from_json(playlists_file, videos_file)
+
+    def _migrate_from_json(self, playlists_file, videos_file):
+        """Import the JSON catalog files the first time the database is opened"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if row:
+                return
+
+            playlists = {}
+            videos = {}
+            if playlists_file and os.path.exists(playlists_file):
+                try:
+                    with open(playlists_file, 'r') as f:
+                        playlists.update(json.load(f))
+                except (OSError, ValueError) as e:
+                    print(f"Error reading {playlists_file} for migration: {str(e)}")
+            if videos_file:
+                # Changes not yet compacted into the snapshot are in its journal
+                journal = CatalogJournal(videos_file)
+                try:
+                    videos.update(journal.load())
+                except (OSError, ValueError) as e:
+                    print(f"Error reading {videos_file} for migration: {str(e)}")
+                finally:
+                    journal.close()
+
+            with self._conn:
+                for playlist_id, playlist in playlists.items():
+                    self._upsert_playlist(playlist_id, playlist)
+                for video_id, video in videos.items():
+                    self._upsert_video(video_id, video)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                                   (str(len(videos)),))
+
+            if playlists or videos:
+                print(f"Migrated {len(playlists)} playlists and {len(videos)} videos to {self.db_file}")
+
+    def _upsert_playlist(self, playlist_id, playlist):
+        self._conn.execute(
+            "INSERT INTO playlists (id, title, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, data = excluded.data",
+            (playlist_id, playlist.get("title"), json.dumps(playlist)))
+
+    def _upsert_video(self, video_id, video):
+        playlist_id = video.get("playlist_id")
+        self._conn.execute(
+            "INSERT INTO videos (id, title, downloaded_at, playlist_id, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, downloaded_at = excluded.downloaded_at, "
+            "playlist_id = excluded.playlist_id, data = excluded.data",
+            (video_id, video.get("title"), video.get("downloaded_at"), playlist_id, json.dumps(video)))
+        if playlist_id:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO playlist_videos (playlist_id, video_id) VALUES (?, ?)",
+                (playlist_id, video_id))
+
+    def load_playlists(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM playlists").fetchall()
+        return {playlist_id: json.loads(data) for playlist_id, data in rows}
+
+    def load_videos(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM videos ORDER BY downloaded_at, id").fetchall()
+        return {video_id: json.loads(data) for video_id, data in rows}
+
+    def save_playlists(self, playlists):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlists")
+            for playlist_id, playlist in playlists.items():
+                self._upsert_playlist(playlist_id, playlist)
+
+    def save_videos(self, videos):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM videos")
+            for video_id, video in videos.items():
+                self._upsert_video(video_id, video)
+
+    def put_playlist(self, playlist_id, playlist):
+        with self._lock, self._conn:
+            self._upsert_playlist(playlist_id, playlist)
+
+    def remove_playlist(self, playlist_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+            self._conn.execute("DELETE FROM playlist_videos WHERE playlist_id = ?", (playlist_id,))
+
+    def put_video(self, video_id, video):
+        with self._lock, self._conn:
+            self._upsert_video(video_id, video)
+
+    def remove_video(self, video_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM videos WHERE id = ?", (video_id,))
+            self._conn.execute("DELETE FROM playlist_videos WHERE video_id = ?", (video_id,))
+
+    def load_memberships(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT playlist_id, video_id FROM playlist_videos "
+                "ORDER BY playlist_id, position IS NULL, position, rowid").fetchall()
+        memberships = {}
+        for playlist_id, video_id in rows:
+            memberships.setdefault(playlist_id, []).append(video_id)
+        return memberships
+
+    def _replace_membership(self, playlist_id, video_ids):
+        self._conn.execute("DELETE FROM playlist_videos WHERE playlist_id = ?", (playlist_id,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO playlist_videos (playlist_id, video_id, position) VALUES (?, ?, ?)",
+            [(playlist_id, video_id, position) for position, video_id in enumerate(video_ids)])
+
+    def save_memberships(self, memberships):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM playlist_videos")
+            for playlist_id, video_ids in memberships.items():
+                self._replace_membership(playlist_id, video_ids)
+
+    def put_membership(self, playlist_id, video_ids):
+        with self._lock, self._conn:
+            self._replace_membership(playlist_id, video_ids)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def claim_catalog(config_dir):
+    """Take the lock that makes this process the catalog's only writer
+
+    Every process keeps its own copy of the catalog in memory and compacts
+    its own journal, so two writers would overwrite each other's records.
+    The lock is an exclusive lock on catalog.lock in the config directory.
+
+    Returns:
+        file: The open lock file, holding the lock until it is closed, or
+        None if another process holds the lock
+    """
+    lock_file = open(os.path.join(config_dir, "catalog.lock"), "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
+
+
+def open_store(config, config_dir, playlists_file, videos_file, read_only=False):
+    """Create the catalog store selected by the ``storage_backend`` setting"""
+    backend = config.get("storage_backend", "json")
+    if backend == "sqlite":
+        return SQLiteCatalogStore(os.path.join(config_dir, "catalog.db"),
+                                  playlists_file=playlists_file, videos_file=videos_file)
+    if backend not in (None, "json"):
+        print(f"Unknown storage backend '{backend}', using json")
+    return JSONCatalogStore(playlists_file, videos_file,
+                            fsync_interval=config.get("journal_fsync_interval", 1.0),
+                            compact_threshold=config.get("journal_compact_threshold", 500),
+                            read_only=read_only)
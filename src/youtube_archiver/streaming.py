@@ -0,0 +1,155 @@
+"""
+YouTube Archiver Web Interface - Media Streaming
+
+This module serves archived video files to the player with:
+1. Single and multi-range (multipart/byteranges) partial content
+2. ETag / Last-Modified conditional responses
+3. Long-lived caching of versioned URLs; a file remuxed in place (fast
+   start) gets a new version, and unversioned URLs revalidate by ETag
+4. Optional offload to a fronting proxy via X-Accel-Redirect or X-Sendfile
+"""
+
+import os
+import uuid
+import mimetypes
+from urllib.parse import quote
+from flask import Response, request, send_file
+from werkzeug.http import http_date
+
+# A versioned URL always names the same bytes, so browsers and proxies keep it for a year
+MEDIA_MAX_AGE = 365 * 24 * 3600
+CHUNK_SIZE = 256 * 1024
+
+mimetypes.add_type('video/x-matroska', '.mkv')
+mimetypes.add_type('video/webm', '.webm')
+mimetypes.add_type('audio/mp4', '.m4a')
+
+
+def media_etag(stat):
+    """Cheap validator derived from the file's modification time and size"""
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def send_media(file_path, root_dir, offload=None, offload_prefix="/protected/", version=None):
+    """Build the response that streams an archived media file
+
+    Args:
+        file_path: Path of the file to serve, taken from the catalog
+        root_dir: Download directory the file lives in; used for offload paths
+        offload: None, "x-accel" (nginx) or "x-sendfile" (Apache/lighttpd)
+        offload_prefix: Internal location nginx maps to the download directory
+        version: The ``v`` the URL was requested with; only a URL whose
+            version is the file's current ETag is cached as immutable
+
+    Returns:
+        Response: The streaming, partial or not-modified response
+    """
+    stat = os.stat(file_path)
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    etag = media_etag(stat)
+
+    if offload in ("x-accel", "x-sendfile"):
+        # The proxy does ranges, conditionals and zero-copy sendfile itself
+        response = Response(status=200, mimetype=mimetype)
+        if offload == "x-accel":
+            relative = os.path.relpath(os.path.abspath(file_path), os.path.abspath(root_dir))
+            response.headers['X-Accel-Redirect'] = offload_prefix.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+        else:
+            response.headers['X-Sendfile'] = os.path.abspath(file_path)
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        _cache_headers(response, version == etag)
+        return response
+
+    ranges = request.range.ranges if request.range and request.range.units == 'bytes' else []
+    if len(ranges) > 1 and _if_range_matches(etag, stat) and not _not_modified(etag, stat):
+        return _send_multirange(file_path, stat, mimetype, etag, ranges, version == etag)
+
+    # send_file handles 304s, single ranges and If-Range, and hands the open
+    # file to the server's wsgi.file_wrapper for sendfile where available
+    response = send_file(file_path, mimetype=mimetype, conditional=True, etag=etag,
+                         last_modified=stat.st_mtime, max_age=MEDIA_MAX_AGE)
+    _cache_headers(response, version == etag)
+    return response
+
+
+def _cache_headers(response, versioned):
+    response.cache_control.public = True
+    if versioned:
+        response.cache_control.max_age = MEDIA_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # The file may still be rewritten in place; revalidate by ETag
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    response.headers['Accept-Ranges'] = 'bytes'
+
+
+def _if_range_matches(etag, stat):
+    """Whether ranges may be honoured under the request's If-Range header"""
+    if_range = request.if_range
+    if not if_range or (if_range.etag is None and if_range.date is None):
+        return True
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    return int(if_range.date.timestamp()) >= int(stat.st_mtime)
+
+
+def _not_modified(etag, stat):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return int(stat.st_mtime) <= int(request.if_modified_since.timestamp())
+    return False
+
+
+def _send_multirange(file_path, stat, mimetype, etag, ranges, versioned):
+    """Serve several byte ranges as one multipart/byteranges response"""
+    size = stat.st_size
+    spans = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            spans.append((start, stop))
+
+    if not spans:
+        response = Response(status=416)
+        response.headers['Content-Range'] = f"bytes */{size}"
+        return response
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    length = 0
+    for start, stop in spans:
+        header = (f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                  f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode()
+        parts.append((header, start, stop))
+        length += len(header) + stop - start
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    length += len(closing)
+
+    def generate():
+        with open(file_path, 'rb') as f:
+            for header, start, stop in parts:
+                yield header
+                f.seek(start)
+                remaining = stop - start
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+            yield closing
+
+    response = Response(generate(), status=206,
+                        content_type=f"multipart/byteranges; boundary={boundary}",
+                        direct_passthrough=True)
+    response.headers['Content-Length'] = str(length)
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.set_etag(etag)
+    _cache_headers(response, versioned)
+    return response
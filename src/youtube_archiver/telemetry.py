@@ -0,0 +1,228 @@
+"""
+YouTube Archiver Library - Download Telemetry
+
+This module collects byte-level progress from yt-dlp's progress and
+postprocessor hooks: bytes downloaded, speed, ETA and fragment counts while
+a video downloads, then the time spent in each postprocessor (such as the
+ffmpeg merge). Figures are kept per video and aggregated per playlist sync,
+so a slow sync can be attributed to the network, to throttling or to
+post-processing.
+"""
+
+import time
+import threading
+from collections import deque
+
+# Postprocessors counted as merge time
+MERGE_POSTPROCESSORS = ("Merger", "FFmpegMerger")
+
+
+class VideoTelemetry:
+    """Progress of a single video download"""
+
+    def __init__(self, video_id, title=None, playlist_id=None):
+        self.video_id = video_id
+        self.title = title
+        self.playlist_id = playlist_id
+        self.status = "starting"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.speed = None
+        self.eta = None
+        self.fragment_index = None
+        self.fragment_count = None
+        # filename -> [downloaded bytes, total bytes]; video and audio
+        # formats are downloaded to separate files before being merged
+        self.files = {}
+        self.download_seconds = 0.0
+        self._file_started = {}
+        self.postprocessors = {}
+        self._pp_started = {}
+
+    @property
+    def downloaded_bytes(self):
+        return sum(downloaded for downloaded, _ in self.files.values())
+
+    @property
+    def total_bytes(self):
+        totals = [total for _, total in self.files.values()]
+        return sum(totals) if totals and None not in totals else None
+
+    @property
+    def merge_seconds(self):
+        return sum(seconds for name, seconds in self.postprocessors.items()
+                   if name in MERGE_POSTPROCESSORS)
+
+    def on_progress(self, d):
+        status = d.get("status")
+        filename = d.get("filename") or d.get("tmpfilename") or ""
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+
+        if status == "downloading":
+            self.status = "downloading"
+            self._file_started.setdefault(filename, time.monotonic())
+            self.files[filename] = [d.get("downloaded_bytes") or 0, total]
+            self.speed = d.get("speed")
+            self.eta = d.get("eta")
+            self.fragment_index = d.get("fragment_index", self.fragment_index)
+            self.fragment_count = d.get("fragment_count", self.fragment_count)
+        elif status == "finished":
+            size = d.get("total_bytes") or d.get("downloaded_bytes") or total or 0
+            self.files[filename] = [size, size]
+            started = self._file_started.pop(filename, None)
+            measured = time.monotonic() - started if started is not None else 0.0
+            self.download_seconds += d.get("elapsed") or measured
+            self.eta = 0
+        elif status == "error":
+            self.status = "error"
+
+    def on_postprocess(self, d):
+        name = d.get("postprocessor") or "unknown"
+        if d.get("status") == "started":
+            self.status = "processing"
+            self._pp_started[name] = time.monotonic()
+        elif d.get("status") == "finished" and name in self._pp_started:
+            elapsed = time.monotonic() - self._pp_started.pop(name)
+            self.postprocessors[name] = self.postprocessors.get(name, 0.0) + elapsed
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "video_id": self.video_id,
+            "title": self.title,
+            "playlist_id": self.playlist_id,
+            "status": self.status,
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "speed": self.speed,
+            "eta": self.eta,
+            "fragment_index": self.fragment_index,
+            "fragment_count": self.fragment_count,
+            "download_seconds": round(self.download_seconds, 3),
+            "postprocess_seconds": {name: round(seconds, 3) for name, seconds in self.postprocessors.items()},
+            "merge_seconds": round(self.merge_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3)
+        }
+
+
+class DownloadTelemetry:
+    """Live and recent download telemetry, aggregated per playlist sync
+
+    ``start`` returns the progress and postprocessor hooks for one download;
+    they are called from the download threads. ``snapshot`` returns a JSON
+    friendly view for the status endpoint.
+    """
+
+    def __init__(self, history=50):
+        self._lock = threading.Lock()
+        self._active = {}
+        self._recent = deque(maxlen=history)
+        self._syncs = {}
+        self._decisions = deque(maxlen=history)
+
+    @property
+    def active_count(self):
+        with self._lock:
+            return len(self._active)
+
+    def begin_sync(self, playlist_id):
+        """Start aggregating the downloads of a playlist sync"""
+        with self._lock:
+            self._syncs[playlist_id] = {
+                "playlist_id": playlist_id,
+                "started_at": time.time(),
+                "finished_at": None,
+                "videos": 0,
+                "failed": 0,
+                "bytes": 0,
+                "download_seconds": 0.0,
+                "postprocess_seconds": 0.0,
+                "merge_seconds": 0.0
+            }
+
+    def end_sync(self, playlist_id):
+        """Finish a playlist sync and return its totals"""
+        with self._lock:
+            totals = self._syncs.get(playlist_id)
+            if totals is None:
+                return None
+            totals["finished_at"] = time.time()
+            return _sync_summary(totals)
+
+    def start(self, video_id, title=None, playlist_id=None):
+        """Begin tracking a download
+
+        Returns:
+            tuple: (progress_hook, postprocessor_hook) to pass to yt-dlp
+        """
+        video = VideoTelemetry(video_id, title, playlist_id)
+        with self._lock:
+            self._active[video_id] = video
+
+        def progress_hook(d):
+            with self._lock:
+                video.on_progress(d)
+
+        def postprocessor_hook(d):
+            with self._lock:
+                video.on_postprocess(d)
+
+        return progress_hook, postprocessor_hook
+
+    def finish(self, video_id, success):
+        """Stop tracking a download and add it to its sync's totals
+
+        Returns:
+            dict: The final telemetry of the video, or None if unknown
+        """
+        with self._lock:
+            video = self._active.pop(video_id, None)
+            if video is None:
+                return None
+            video.finished_at = time.time()
+            video.status = "finished" if success else "error"
+            summary = video.to_dict()
+            self._recent.append(summary)
+
+            totals = self._syncs.get(video.playlist_id)
+            if totals is not None and totals["finished_at"] is None:
+                if success:
+                    totals["videos"] += 1
+                else:
+                    totals["failed"] += 1
+                totals["bytes"] += video.downloaded_bytes
+                totals["download_seconds"] += video.download_seconds
+                totals["postprocess_seconds"] += sum(video.postprocessors.values())
+                totals["merge_seconds"] += video.merge_seconds
+            return summary
+
+    def record_decision(self, decision):
+        """Record a change made by the adaptive concurrency controller"""
+        with self._lock:
+            self._decisions.append(decision)
+
+    def snapshot(self):
+        """Return active downloads, recent downloads, per-sync totals and concurrency decisions"""
+        with self._lock:
+            active = [video.to_dict() for video in self._active.values()]
+            return {
+                "active": active,
+                "current_speed": sum(video["speed"] or 0 for video in active
+                                     if video["status"] == "downloading"),
+                "recent": list(self._recent),
+                "syncs": {playlist_id: _sync_summary(totals)
+                          for playlist_id, totals in self._syncs.items()},
+                "concurrency_decisions": list(self._decisions)
+            }
+
+
+def _sync_summary(totals):
+    summary = dict(totals)
+    for key in ("download_seconds", "postprocess_seconds", "merge_seconds"):
+        summary[key] = round(summary[key], 3)
+    # Downloads overlap, so per-stream speed and overall throughput differ
+    seconds = totals["download_seconds"]
+    wall = (totals["finished_at"] or time.time()) - totals["started_at"]
+    summary["average_speed"] = totals["bytes"] / seconds if seconds else None
+    summary["throughput"] = totals["bytes"] / wall if wall > 0 else None
+    return summary
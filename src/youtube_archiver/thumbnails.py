@@ -0,0 +1,275 @@
+"""
+YouTube Archiver Library - Thumbnails
+
+This module turns video thumbnails into small cached images for the video
+listings. The thumbnail yt-dlp saves next to each download is used when
+there is one; for older files a poster frame is extracted with ffmpeg.
+Images are resized to WebP and JPEG variants in a process pool, so neither
+downloads nor page rendering wait on ffmpeg, and stored under a hash of the
+source image, so identical thumbnails are stored once and their URLs can be
+cached forever.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import threading
+import subprocess
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Extensions yt-dlp saves thumbnails with, in order of preference
+THUMBNAIL_EXTENSIONS = ('.webp', '.jpg', '.jpeg', '.png')
+
+# Encoders for the cached variants; WebP first, JPEG for everything else
+VARIANT_CODECS = (("webp", ["-c:v", "libwebp", "-quality", "75"]),
+                  ("jpg", ["-c:v", "mjpeg", "-q:v", "5"]))
+
+# Seconds into a video to take the poster frame from
+POSTER_OFFSET = 10
+
+# Cached file names: <first two hex digits>/<digest>[-<width>].<ext>
+CACHE_NAME_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{32}(-\d+)?\.(webp|jpg|jpeg|png)$")
+
+
+def _poster_frame(ffmpeg, video_path):
+    """Extract a single JPEG frame from a video, from the start if it is short"""
+    for offset in (POSTER_OFFSET, 0):
+        result = subprocess.run([ffmpeg, "-v", "error", "-ss", str(offset), "-i", video_path,
+                                 "-frames:v", "1", "-f", "image2", "-c:v", "mjpeg", "-"],
+                                capture_output=True, timeout=120)
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    raise RuntimeError(f"Could not extract a frame from {video_path}: "
+                       f"{result.stderr.decode(errors='replace').strip()}")
+
+
+def _resize(ffmpeg, source, target, width, codec_args):
+    """Scale an image down to ``width`` (never up) and encode it"""
+    tmp = f"{target}.tmp"
+    subprocess.run([ffmpeg, "-v", "error", "-y", "-i", "pipe:0",
+                    "-vf", f"scale='min({width},iw)':-2", "-frames:v", "1", *codec_args,
+                    "-f", "image2", tmp],
+                   input=source, capture_output=True, timeout=120, check=True)
+    os.replace(tmp, target)
+
+
+def build_thumbnail(source_path, cache_dir, widths, ffmpeg=None, from_video=False):
+    """Write the cached variants of a thumbnail; runs in a worker process
+
+    Args:
+        source_path: Thumbnail image, or video file when ``from_video`` is set
+        cache_dir: Root of the content-addressed cache
+        widths: Widths of the variants to write
+        ffmpeg: Path of the ffmpeg binary, or None if it is not installed
+        from_video: Extract a poster frame from ``source_path`` first
+
+    Returns:
+        list: Cache names of the variants, WebP first
+    """
+    if from_video:
+        data = _poster_frame(ffmpeg, source_path)
+        ext = ".jpg"
+    else:
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(source_path)[1].lower()
+
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    os.makedirs(os.path.join(cache_dir, digest[:2]), exist_ok=True)
+
+    if not ffmpeg:
+        # Without ffmpeg the source image is cached as it is
+        name = f"{digest[:2]}/{digest}{ext}"
+        path = os.path.join(cache_dir, name)
+        if not os.path.exists(path):
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        return [name]
+
+    names = []
+    for fmt, codec_args in VARIANT_CODECS:
+        for width in widths:
+            name = f"{digest[:2]}/{digest}-{width}.{fmt}"
+            path = os.path.join(cache_dir, name)
+            if not os.path.exists(path):
+                try:
+                    _resize(ffmpeg, data, path, width, codec_args)
+                except subprocess.CalledProcessError:
+                    # ffmpeg builds without libwebp still get the JPEG variants
+                    continue
+            names.append(name)
+    if not names:
+        raise RuntimeError(f"Could not encode a thumbnail for {source_path}")
+    return names
+
+
+def find_sidecar_thumbnail(file_path):
+    """Return the thumbnail yt-dlp wrote next to a video file, if any"""
+    stem = os.path.splitext(file_path)[0]
+    for ext in THUMBNAIL_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def remove_sidecar_thumbnails(file_path):
+    """Delete the thumbnails yt-dlp wrote next to a video file"""
+    stem = os.path.splitext(file_path)[0]
+    for ext in THUMBNAIL_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            os.remove(stem + ext)
+
+
+def _process_context():
+    """Start workers without forking this heavily threaded process
+
+    A child forked while another thread holds a lock inherits the lock
+    held and can deadlock, so workers come from a fork server, or are
+    spawned where there is none.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ThumbnailPipeline:
+    """Builds cached thumbnails in the background
+
+    Args:
+        cache_dir: Directory of the content-addressed cache
+        widths: Widths of the cached variants
+        workers: Number of worker processes
+        on_done: Function(video_id, names) called when a thumbnail is cached
+    """
+
+    def __init__(self, cache_dir, widths=(320,), workers=2, on_done=None):
+        self.cache_dir = cache_dir
+        self.widths = tuple(widths)
+        self.workers = max(1, workers)
+        self.on_done = on_done
+        self.ffmpeg = shutil.which("ffmpeg")
+        self._lock = threading.Condition()
+        self._executor = None
+        self._pending = {}
+        # Builds waiting for room in the queue, submitted as running ones finish
+        self._deferred = deque()
+        # Bounds the work queued at once, so a backfill does not queue the whole archive
+        self._slots = threading.BoundedSemaphore(self.workers * 4)
+
+    @classmethod
+    def from_config(cls, cache_dir, config, on_done=None):
+        return cls(cache_dir,
+                   widths=config.get("thumbnail_widths", [320]),
+                   workers=int(config.get("thumbnail_workers", 2)),
+                   on_done=on_done)
+
+    def path(self, name):
+        """Return the file of a cache name, or None if the name is invalid"""
+        if not name or not CACHE_NAME_RE.match(name):
+            return None
+        return os.path.join(self.cache_dir, name)
+
+    def has(self, names):
+        """Whether every variant in ``names`` is in the cache"""
+        return bool(names) and all(self.path(name) and os.path.exists(self.path(name)) for name in names)
+
+    def submit(self, video_id, source_path, from_video=False, block=True):
+        """Queue a thumbnail build
+
+        Args:
+            video_id: ID of the video the thumbnail belongs to
+            source_path: Thumbnail image, or video file when ``from_video`` is set
+            from_video: Extract a poster frame from ``source_path`` first
+            block: Wait while the queue is full; otherwise the build is
+                deferred until a running one finishes, so the caller never waits
+
+        Returns:
+            Future: The build, or None if it was deferred, cannot be done here
+            or is already queued
+        """
+        if from_video and not self.ffmpeg:
+            return None
+        with self._lock:
+            if video_id in self._pending:
+                return None
+            self._pending[video_id] = None
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self._deferred.append((video_id, source_path, from_video))
+            # A slot may have freed up since the attempt above
+            self._submit_deferred()
+            return None
+        return self._start(video_id, source_path, from_video)
+
+    def _start(self, video_id, source_path, from_video):
+        """Hand a build to the worker processes; the caller holds a slot"""
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_process_context())
+                executor = self._executor
+            future = executor.submit(build_thumbnail, source_path, self.cache_dir, self.widths,
+                                     self.ffmpeg, from_video)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._pending.pop(video_id, None)
+                self._lock.notify_all()
+            raise
+        with self._lock:
+            self._pending[video_id] = future
+        future.add_done_callback(lambda f: self._finish(video_id, f))
+        return future
+
+    def _submit_deferred(self):
+        while True:
+            with self._lock:
+                if not self._deferred or not self._slots.acquire(blocking=False):
+                    return
+                video_id, source_path, from_video = self._deferred.popleft()
+            try:
+                self._start(video_id, source_path, from_video)
+            except Exception as e:
+                print(f"Error queueing thumbnail for {video_id}: {str(e)}")
+
+    def _finish(self, video_id, future):
+        self._slots.release()
+        try:
+            names = future.result()
+            if self.on_done:
+                self.on_done(video_id, names)
+        except Exception as e:
+            print(f"Error building thumbnail for {video_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.pop(video_id, None)
+                self._lock.notify_all()
+        self._submit_deferred()
+
+    def wait(self, timeout=None):
+        """Wait until every queued thumbnail has been built and recorded
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._pending, timeout)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self, wait=True):
+        with self._lock:
+            # Deferred builds are dropped; a backfill picks them up later
+            for video_id, source_path, from_video in self._deferred:
+                self._pending.pop(video_id, None)
+            self._deferred.clear()
+            self._lock.notify_all()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,132 @@
+"""
+YouTube Archiver Library - yt-dlp Session Pool
+
+This module provides a pool of long-lived yt_dlp.YoutubeDL sessions so that
+extractor setup, cookie loading and HTTP connections are reused across
+downloads and playlist extractions.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+import yt_dlp
+
+
+class _Session:
+    """A pooled YoutubeDL and the hooks of the caller borrowing it
+
+    One dispatcher per hook type is registered on the YoutubeDL when it is
+    created. The dispatchers call whatever hooks the current borrower
+    passed, so hooks never have to be removed from yt-dlp again.
+    """
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.hooks = {"progress": (), "post": (), "postprocessor": ()}
+        ydl.add_progress_hook(self._dispatcher("progress"))
+        ydl.add_post_hook(self._dispatcher("post"))
+        ydl.add_postprocessor_hook(self._dispatcher("postprocessor"))
+
+    def _dispatcher(self, kind):
+        def dispatch(*args):
+            for hook in self.hooks[kind]:
+                hook(*args)
+        return dispatch
+
+
+class YoutubeDLPool:
+    """Long-lived YoutubeDL sessions keyed by their options
+
+    A session is borrowed by one caller at a time. Sessions are only shared
+    between calls made with identical options, so a per-call option
+    override simply selects (or creates) a different session. Callables such
+    as progress hooks are not part of the key: each borrow passes its own,
+    and the session calls them until it is returned.
+
+    Args:
+        max_idle: Idle sessions kept per set of options
+        max_idle_total: Idle sessions kept across all options; the least
+            recently used are closed first, so options that change often
+            (such as the fragment count under adaptive concurrency) cannot
+            pile up sessions
+        extractors: Extra InfoExtractor classes registered on every session
+        params: Options merged into every session's options
+    """
+
+    def __init__(self, max_idle=8, max_idle_total=16, extractors=(), params=None):
+        self.max_idle = max_idle
+        self.max_idle_total = max_idle_total
+        self.extractors = tuple(extractors)
+        self.params = dict(params or {})
+        self._lock = threading.Lock()
+        # (key, session) pairs, least recently used first
+        self._idle = []
+        self._closed = False
+
+    @staticmethod
+    def _key(opts):
+        return json.dumps(opts, sort_keys=True, default=repr)
+
+    def _acquire(self, key, opts):
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][0] == key:
+                    return self._idle.pop(i)[1]
+        ydl = yt_dlp.YoutubeDL(dict(opts))
+        for extractor in self.extractors:
+            ydl.add_info_extractor(extractor())
+        return _Session(ydl)
+
+    def _release(self, key, session):
+        evicted = session
+        with self._lock:
+            if not self._closed:
+                self._idle.append((key, session))
+                same = [i for i, (idle_key, _) in enumerate(self._idle) if idle_key == key]
+                if len(same) > self.max_idle:
+                    evicted = self._idle.pop(same[0])[1]
+                elif len(self._idle) > self.max_idle_total:
+                    evicted = self._idle.pop(0)[1]
+                else:
+                    evicted = None
+        if evicted is not None:
+            evicted.ydl.close()
+
+    @contextmanager
+    def session(self, opts, progress_hooks=(), post_hooks=(), postprocessor_hooks=()):
+        """Borrow a session for ``opts`` with the given hooks attached
+
+        The session goes back to the pool afterwards, unless the call failed
+        with something other than a regular yt-dlp download error. A generator
+        that borrows a session and is closed early (an incremental scan
+        stopping) leaves the session healthy.
+        """
+        opts = dict(opts, **self.params)
+        key = self._key(opts)
+        session = self._acquire(key, opts)
+        session.hooks = {"progress": tuple(progress_hooks), "post": tuple(post_hooks),
+                         "postprocessor": tuple(postprocessor_hooks)}
+
+        healthy = True
+        try:
+            yield session.ydl
+        except (yt_dlp.utils.DownloadError, GeneratorExit):
+            raise
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            session.hooks = {"progress": (), "post": (), "postprocessor": ()}
+            if healthy:
+                self._release(key, session)
+            else:
+                session.ydl.close()
+
+    def close(self):
+        """Close every idle session"""
+        with self._lock:
+            self._closed = True
+            sessions = [session for _, session in self._idle]
+            self._idle = []
+        for session in sessions:
+            session.ydl.close()
@@ -4,3 +4,180 @@ if (typeof window.appBaseUrl === 'undefined') {
     // Default to empty string if not set in base.html
     window.appBaseUrl = '';
 }
+
+// Escape text for insertion into HTML
+function escapeHtml(text) {
+    var div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// Build a table row for a video returned by /api/videos
+function videoRow(video) {
+    var downloaded = video.downloaded_at ? video.downloaded_at.split('T')[0] : 'Unknown';
+    var thumbnail = '';
+    if (video.thumbnail_url) {
+        thumbnail = '<picture>' +
+            (video.thumbnail_webp_url ? '<source srcset="' + escapeHtml(video.thumbnail_webp_url) + '" type="image/webp">' : '') +
+            '<img src="' + escapeHtml(video.thumbnail_url) + '" class="video-thumbnail" loading="lazy" alt="">' +
+        '</picture>';
+    }
+    return '<tr>' +
+        '<td class="thumbnail-cell">' + thumbnail + '</td>' +
+        '<td>' + escapeHtml(video.title) + '</td>' +
+        '<td>' + escapeHtml(downloaded) + '</td>' +
+        '<td>' +
+          '<a href="' + escapeHtml(video.watch_url) + '" class="btn btn-sm btn-primary">' +
+            '<i class="bi bi-play-fill"></i> Watch' +
+          '</a> ' +
+          '<form action="' + escapeHtml(video.delete_url) + '" method="post" class="d-inline">' +
+            '<button type="submit" class="btn btn-sm btn-danger" onclick="return confirm(\'Are you sure you want to delete this video?\');">' +
+              '<i class="bi bi-trash"></i> Delete' +
+            '</button>' +
+          '</form>' +
+        '</td>' +
+    '</tr>';
+}
+
+// "Load more" buttons fetch the next page of a video listing and append it
+document.addEventListener('click', function(event) {
+    var button = event.target.closest('.load-more');
+    if (!button) {
+        return;
+    }
+
+    var url = button.getAttribute('data-url');
+    var separator = url.indexOf('?') === -1 ? '?' : '&';
+    button.disabled = true;
+
+    fetch(url + separator + 'cursor=' + encodeURIComponent(button.getAttribute('data-cursor')))
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+            var rows = document.getElementById(button.getAttribute('data-target'));
+            rows.insertAdjacentHTML('beforeend', data.videos.map(videoRow).join(''));
+
+            if (data.next_cursor) {
+                button.setAttribute('data-cursor', data.next_cursor);
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        })
+        .catch(function(error) {
+            console.error('Error loading videos:', error);
+            button.disabled = false;
+        });
+});
+
+// Search-as-you-type suggestions for the navbar search box
+(function() {
+    var box = document.getElementById('search-box');
+    var suggestions = document.getElementById('search-suggestions');
+    if (!box || !suggestions) {
+        return;
+    }
+
+    var timer = null;
+    var latest = 0;
+
+    box.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            var query = box.value.trim();
+            var request = ++latest;
+            if (!query) {
+                suggestions.classList.add('d-none');
+                return;
+            }
+
+            fetch(window.appBaseUrl + '/api/search?limit=8&q=' + encodeURIComponent(query))
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    // Ignore answers to queries the user has already typed past
+                    if (request !== latest) {
+                        return;
+                    }
+                    suggestions.innerHTML = data.results.map(function(video) {
+                        return '<a class="list-group-item list-group-item-action" href="' + escapeHtml(video.watch_url) + '">' +
+                            escapeHtml(video.title) + '</a>';
+                    }).join('');
+                    suggestions.classList.toggle('d-none', data.results.length === 0);
+                })
+                .catch(function(error) {
+                    console.error('Error searching:', error);
+                });
+        }, 150);
+    });
+
+    box.addEventListener('blur', function() {
+        // Leave time for a click on a suggestion to register
+        setTimeout(function() { suggestions.classList.add('d-none'); }, 200);
+    });
+})();
+
+// Sync buttons queue a sync; its progress arrives over the event stream
+// below, so the page is not reloaded
+document.addEventListener('click', function(event) {
+    var button = event.target.closest('.sync-btn, #syncAllBtn');
+    if (!button) {
+        return;
+    }
+
+    var path = button.id === 'syncAllBtn' ? '/sync_all' : '/sync_playlist/' + button.getAttribute('data-playlist-id');
+    fetch(window.appBaseUrl + path, { method: 'POST' })
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+            alert(data.message);
+        });
+});
+
+// Live sync progress pushed by the server over Server-Sent Events
+(function() {
+    var box = document.getElementById('sync-status');
+    if (!box || typeof EventSource === 'undefined') {
+        return;
+    }
+
+    var task = document.getElementById('sync-status-task');
+    var reload = document.getElementById('sync-status-reload');
+    var progress = document.getElementById('sync-status-progress');
+    var bar = progress.querySelector('.progress-bar');
+    var download = document.getElementById('sync-status-download');
+    var wasSyncing = null;
+
+    var source = new EventSource(window.appBaseUrl + '/events');
+
+    source.addEventListener('status', function(event) {
+        var status = JSON.parse(event.data);
+        box.classList.toggle('d-none', !status.current_task);
+        task.textContent = status.current_task;
+        progress.classList.toggle('d-none', !status.is_syncing);
+        bar.style.width = status.progress + '%';
+        bar.textContent = status.progress + '%';
+
+        // Offer a refresh once a sync this page watched has finished,
+        // rather than reloading pages while it runs
+        if (wasSyncing && !status.is_syncing) {
+            reload.classList.remove('d-none');
+            download.textContent = '';
+        }
+        wasSyncing = status.is_syncing;
+    });
+
+    source.addEventListener('download_started', function(event) {
+        var video = JSON.parse(event.data);
+        download.textContent = 'Downloading: ' + video.title;
+    });
+
+    source.addEventListener('download_finished', function(event) {
+        var video = JSON.parse(event.data);
+        var text = (video.success ? 'Downloaded: ' : 'Failed: ') + video.title;
+        var telemetry = video.telemetry;
+        if (video.success && telemetry && telemetry.download_seconds) {
+            var mb = telemetry.downloaded_bytes / 1e6;
+            text += ' (' + mb.toFixed(1) + ' MB at ' + (mb / telemetry.download_seconds).toFixed(1) +
+                ' MB/s, merge ' + telemetry.merge_seconds.toFixed(1) + 's)';
+        }
+        download.textContent = text;
+    });
+})();
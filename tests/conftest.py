@@ -0,0 +1,10 @@
+import pytest
+from youtube_archiver import YouTubeArchiver
+
+@pytest.fixture
+def archiver(tmp_path):
+    config_dir = tmp_path / "config"
+    download_dir = tmp_path / "downloads"
+    archiver = YouTubeArchiver(config_dir=str(config_dir), download_dir=str(download_dir))
+    yield archiver
+    archiver.close()
@@ -1,15 +1,11 @@
 import os
 import json
+import time
 import pytest
+from collections import Counter
 from unittest.mock import MagicMock, patch
 from youtube_archiver import YouTubeArchiver
 
-@pytest.fixture
-def archiver(tmp_path):
-    config_dir = tmp_path / "config"
-    download_dir = tmp_path / "downloads"
-    return YouTubeArchiver(config_dir=str(config_dir), download_dir=str(download_dir))
-
 def test_init(archiver, tmp_path):
     assert os.path.exists(archiver.config_dir)
     assert os.path.exists(archiver.download_dir)
@@ -19,6 +15,22 @@ def test_init(archiver, tmp_path):
     assert archiver.playlists == {}
     assert archiver.downloaded_videos == {}
 
+def test_catalog_has_one_writer(archiver):
+    archiver._save_downloaded_videos({'v1': {'title': 'Video 1', 'playlist_id': 'PL1'}})
+    with pytest.raises(RuntimeError):
+        YouTubeArchiver(config_dir=archiver.config_dir, download_dir=archiver.download_dir)
+
+    # A read-only archiver can read the catalog and queue jobs, but never compacts it
+    snapshot = os.stat(archiver.videos_file).st_mtime_ns
+    reader = YouTubeArchiver(config_dir=archiver.config_dir, download_dir=archiver.download_dir,
+                             read_only=True)
+    assert reader.downloaded_videos['v1']['title'] == 'Video 1'
+    reader.close()
+    assert os.stat(archiver.videos_file).st_mtime_ns == snapshot
+
+    archiver.close()
+    YouTubeArchiver(config_dir=archiver.config_dir, download_dir=archiver.download_dir).close()
+
 def test_add_playlist(archiver):
     with patch('yt_dlp.YoutubeDL') as mock_ydl:
         mock_instance = mock_ydl.return_value
@@ -137,6 +149,9 @@ def test_get_storage_stats(archiver):
     with open(f2, 'wb') as f:
         f.write(b'0' * 2000) # 2000 bytes
         
+    # Files outside the catalog are only found by a rescan
+    assert archiver.get_storage_stats()['video_count'] == 0
+    archiver.rescan_storage_stats()
     stats = archiver.get_storage_stats()
     
     assert stats['video_count'] == 2
@@ -254,5 +269,588 @@ def test_download_video_failure(archiver):
         assert result is False
         assert 'vid1' not in archiver.downloaded_videos
 
+def test_sync_playlist_concurrent_downloads(archiver):
+    import threading
+    import time
+
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+    archiver.update_config({"concurrent_downloads": 3})
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_download(urls):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    progress = []
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            'entries': [{'id': f'vid{i}', 'title': f'Video {i}'} for i in range(6)]
+        }
+        mock_instance.download.side_effect = slow_download
+
+        result = archiver.sync_playlist('PL123', callback=lambda task, p: progress.append(p))
+
+    assert result['success'] is True
+    assert result['new_videos'] == 6
+    assert result['failed_videos'] == []
+    assert 1 < peak <= 3
+    assert progress[-1] == 100
+    archiver.close()
+    assert len(YouTubeArchiver(config_dir=archiver.config_dir).downloaded_videos) == 6
+
+def test_download_slots_prefer_idle_playlist():
+    import threading
+    import time
+    from youtube_archiver.scheduler import DownloadSlots
+
+    slots = DownloadSlots(2)
+    slots.acquire('big')
+    slots.acquire('big')
+    granted = []
+
+    def wait_for(owner):
+        slots.acquire(owner)
+        granted.append(owner)
+
+    def wait_until(predicate):
+        while not predicate():
+            time.sleep(0.001)
+
+    # 'big' queues more work before 'small' asks for its first slot
+    big = threading.Thread(target=wait_for, args=('big',))
+    big.start()
+    wait_until(lambda: len(slots._waiting) == 1)
+    small = threading.Thread(target=wait_for, args=('small',))
+    small.start()
+    wait_until(lambda: len(slots._waiting) == 2)
+
+    slots.release('big')
+    small.join()
+    assert granted == ['small']
+
+    slots.release('small')
+    big.join()
+    assert granted == ['small', 'big']
+    assert slots.in_use == 2
+
+def test_sync_all_playlists_concurrent(archiver):
+    archiver.playlists = {
+        'PL1': {'title': 'Playlist 1', 'url': 'http://url/1', 'video_count': 10},
+        'PL2': {'title': 'Playlist 2', 'url': 'http://url/2', 'video_count': 1},
+    }
+    archiver.update_config({"concurrent_downloads": 2, "concurrent_playlists": 2})
+
+    entries = {
+        'http://url/1': [{'id': 'a1', 'title': 'A1'}, {'id': 'a2', 'title': 'A2'}],
+        'http://url/2': [{'id': 'b1', 'title': 'B1'}],
+    }
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.side_effect = lambda url, **kwargs: {'entries': entries[url]}
+
+        results = archiver.sync_all_playlists()
+
+    assert [r['playlist_id'] for r in results] == ['PL1', 'PL2']
+    assert [r['new_videos'] for r in results] == [2, 1]
+    assert set(archiver.downloaded_videos) == {'a1', 'a2', 'b1'}
+
+def test_concurrent_syncs_download_shared_video_once(archiver):
+    archiver.playlists = {
+        'PL1': {'title': 'Playlist 1', 'url': 'http://url/1', 'video_count': 2},
+        'PL2': {'title': 'Playlist 2', 'url': 'http://url/2', 'video_count': 2},
+    }
+    archiver.update_config({"concurrent_downloads": 2, "concurrent_playlists": 2})
+    entries = {
+        'http://url/1': [{'id': 'shared', 'title': 'Shared'}, {'id': 'a1', 'title': 'A1'}],
+        'http://url/2': [{'id': 'shared', 'title': 'Shared'}, {'id': 'b1', 'title': 'B1'}],
+    }
+
+    downloads = Counter()
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.side_effect = lambda url, **kwargs: {'entries': entries[url]}
+
+        def slow_download(urls):
+            downloads[urls[0]] += 1
+            time.sleep(0.2)
+        mock_instance.download.side_effect = slow_download
+
+        results = archiver.sync_all_playlists()
+
+    assert downloads['https://www.youtube.com/watch?v=shared'] == 1
+    assert sum(r['new_videos'] for r in results) == 3
+    assert set(archiver.downloaded_videos) == {'shared', 'a1', 'b1'}
+    assert archiver._in_flight == set()
+
+def test_download_video_records_final_path(archiver):
+    final_path = os.path.join(archiver.download_dir, "Test Video-vid123.mp4")
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+
+        def fake_download(urls):
+            with open(final_path, 'w') as f:
+                f.write("dummy content")
+            mock_instance.add_post_hook.call_args[0][0](final_path)
+        mock_instance.download.side_effect = fake_download
+
+        assert archiver.download_video('vid123', 'Test Video') is True
+
+    assert archiver.downloaded_videos['vid123']['file_path'] == final_path
+    with patch('glob.glob') as mock_glob:
+        assert archiver.find_video_file('vid123') == final_path
+        mock_glob.assert_not_called()
+
+def test_reconcile_file_index(archiver):
+    archiver.downloaded_videos = {
+        'abc-123': {'title': 'Dashed'},
+        'v2': {'title': 'Video 2'},
+        'v3': {'title': 'Missing'},
+    }
+    archiver._save_downloaded_videos()
+
+    f1 = os.path.join(archiver.download_dir, "Some-Title-abc-123.mp4")
+    f2 = os.path.join(archiver.download_dir, "Video 2-v2.webm")
+    for path in (f1, f2, os.path.join(archiver.download_dir, "Video 2-v2.f137.mp4.part")):
+        with open(path, 'w') as f:
+            f.write("x")
+
+    result = archiver.reconcile_file_index()
+
+    assert result == {"indexed": 2, "updated": 2, "missing": 1}
+    assert archiver.file_index == {'abc-123': f1, 'v2': f2}
+    assert archiver.downloaded_videos['v2']['file_path'] == f2
+
+def test_storage_stats_seeded_from_catalog(archiver):
+    archiver.playlists = {'PL1': {'title': 'Playlist 1'}}
+    archiver._save_playlists()
+    f1 = os.path.join(archiver.download_dir, "Video 1-v1.mp4")
+    with open(f1, 'wb') as f:
+        f.write(b'0' * 100)
+    # A record without a size is filled in by a one-off scan, and one whose
+    # file is gone is marked missing so later starts do not scan for it again
+    gone = os.path.join(archiver.download_dir, "Video 2-v2.mp4")
+    archiver._save_downloaded_videos({'v1': {'playlist_id': 'PL1', 'file_path': f1},
+                                      'v2': {'playlist_id': 'PL1', 'file_path': gone}})
+    assert archiver.get_storage_stats()['total_size'] == 100
+    assert archiver.downloaded_videos['v1']['file_size'] == 100
+    assert archiver.downloaded_videos['v2']['file_missing'] is True
+    archiver.close()
+
+    reopened = YouTubeArchiver(config_dir=archiver.config_dir, download_dir=archiver.download_dir)
+    with patch('os.scandir') as mock_scandir, patch('os.path.getsize') as mock_getsize:
+        stats = reopened.get_storage_stats()
+        assert stats['total_size'] == 100
+        assert stats['by_extension'] == {'.mp4': 100}
+        assert reopened.get_playlist_storage_stats('PL1')['video_count'] == 1
+        mock_scandir.assert_not_called()
+        mock_getsize.assert_not_called()
+    reopened.close()
+
+def test_storage_stats_are_incremental(archiver):
+    archiver.playlists = {'PL1': {'title': 'Playlist 1'}}
+    archiver.downloaded_videos = {'v1': {'playlist_id': 'PL1'}}
+    with open(os.path.join(archiver.download_dir, "Video 1-v1.mp4"), 'wb') as f:
+        f.write(b'0' * 100)
+
+    assert archiver.get_storage_stats()['total_size'] == 100
+
+    new_file = os.path.join(archiver.download_dir, "Video 2-v2.webm")
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+
+        def fake_download(urls):
+            with open(new_file, 'wb') as f:
+                f.write(b'0' * 50)
+            mock_instance.add_post_hook.call_args[0][0](new_file)
+        mock_instance.download.side_effect = fake_download
+
+        archiver.download_video('v2', 'Video 2', 'PL1')
+
+    # No directory scan is needed once the totals are seeded
+    with patch('os.scandir') as mock_scandir:
+        stats = archiver.get_storage_stats()
+        assert stats['total_size'] == 150
+        assert stats['video_count'] == 2
+        assert stats['by_extension'] == {'.mp4': 100, '.webm': 50}
+        assert archiver.get_playlist_storage_stats('PL1')['total_size'] == 150
+
+        archiver.delete_video('v1')
+        assert archiver.get_storage_stats()['total_size'] == 50
+        assert archiver.get_playlist_storage_stats('PL1')['video_count'] == 1
+        mock_scandir.assert_not_called()
+
+    assert archiver.downloaded_videos['v2']['file_size'] == 50
+
+def test_get_missing_videos_stale_while_revalidate(archiver):
+    import time
+
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+    archiver.downloaded_videos = {'vid1': {'title': 'Video 1'}}
+
+    with patch.object(archiver, 'get_playlist_videos') as mock_fetch:
+        mock_fetch.return_value = [{'id': 'vid1', 'title': 'Video 1'}, {'id': 'vid2', 'title': 'Video 2'}]
+
+        # Nothing cached yet: answer immediately and refresh in the background
+        assert archiver.get_missing_videos('PL123', wait=False) == []
+        for _ in range(100):
+            if archiver.entry_cache.status('PL123')['cached']:
+                break
+            time.sleep(0.01)
+        assert [v['id'] for v in archiver.get_missing_videos('PL123', wait=False)] == ['vid2']
+        assert mock_fetch.call_count == 1
+
+        # Once stale, the old entries are served while a refresh runs
+        archiver.entry_cache.ttl = 0
+        assert [v['id'] for v in archiver.get_missing_videos('PL123', wait=False)] == ['vid2']
+
+def test_sync_playlist_incremental_stops_at_archived_run(archiver):
+    archiver.playlists = {'PL123': {'title': 'Uploads', 'url': 'http://url', 'sync_mode': 'incremental'}}
+    archiver.update_config({"incremental_stop_after": 2})
+
+    pulled = []
+
+    def entries(ids):
+        for video_id in ids:
+            pulled.append(video_id)
+            yield {'id': video_id, 'title': video_id}
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+
+        # First sync is always a full scan
+        mock_instance.extract_info.side_effect = lambda url, **kwargs: {'entries': entries(['v3', 'v2', 'v1'])}
+        result = archiver.sync_playlist('PL123')
+        assert result['scan_mode'] == 'full'
+        assert archiver.playlists['PL123']['head_ids'] == ['v3', 'v2', 'v1']
+
+        # Two new uploads at the top; the scan stops after two known entries
+        pulled.clear()
+        mock_instance.extract_info.side_effect = lambda url, **kwargs: {
+            'entries': entries(['v5', 'v4', 'v3', 'v2', 'v1', 'old1', 'old2'])}
+        result = archiver.sync_playlist('PL123')
+
+    assert result['scan_mode'] == 'incremental'
+    assert result['new_videos'] == 2
+    assert pulled == ['v5', 'v4', 'v3', 'v2']
+    assert archiver.playlists['PL123']['video_count'] == 5
+    assert archiver.playlists['PL123']['head_ids'][:3] == ['v5', 'v4', 'v3']
+
+def test_incremental_scan_full_rescan_cadence(archiver):
+    from datetime import datetime, timedelta
+
+    playlist = {'sync_mode': 'incremental', 'last_full_scan': datetime.now().isoformat()}
+    assert archiver._use_incremental_scan(playlist) is True
+
+    playlist['last_full_scan'] = (datetime.now() - timedelta(hours=200)).isoformat()
+    assert archiver._use_incremental_scan(playlist) is False
+
+    assert archiver._use_incremental_scan({'sync_mode': 'full', 'last_full_scan': datetime.now().isoformat()}) is False
+
+def test_sync_playlist_downloads_while_enumerating(archiver):
+    import threading
+
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+    archiver.downloaded_videos = {'vid0': {'title': 'Video 0'}}
+    first_download = threading.Event()
+    seen_before_second_page = []
+
+    def entries():
+        yield {'id': 'vid0', 'title': 'Video 0'}
+        yield {'id': 'vid1', 'title': 'Video 1'}
+        # The next page is only requested once the first download has started
+        seen_before_second_page.append(first_download.wait(timeout=5))
+        yield {'id': 'vid2', 'title': 'Video 2'}
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {'entries': entries()}
+        mock_instance.download.side_effect = lambda urls: first_download.set()
+
+        result = archiver.sync_playlist('PL123')
+
+    assert seen_before_second_page == [True]
+    assert result['success'] is True
+    assert result['total_videos'] == 3
+    assert result['new_videos'] == 2
+
+def test_sync_playlist_enumeration_error(archiver):
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+
+    def entries():
+        yield {'id': 'vid1', 'title': 'Video 1'}
+        raise Exception("Page fetch failed")
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {'entries': entries()}
+
+        result = archiver.sync_playlist('PL123')
+
+    assert result['success'] is False
+    assert 'Page fetch failed' in result['error']
+    # Work already found before the failure is kept
+    assert 'vid1' in archiver.downloaded_videos
+
+def test_ytdl_sessions_are_reused(archiver):
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.extract_info.return_value = {
+            'entries': [{'id': f'vid{i}', 'title': f'Video {i}'} for i in range(3)]
+        }
+
+        archiver.sync_playlist('PL123')
+
+        # One session for enumeration and one for the downloads, kept open
+        assert mock_ydl.call_count == 2
+        assert mock_instance.download.call_count == 3
+        mock_instance.close.assert_not_called()
+
+        archiver.close()
+        assert mock_instance.close.call_count == 2
+
+def test_ytdl_pool_keys_sessions_by_options():
+    from youtube_archiver.ytdl_pool import YoutubeDLPool
+
+    pool = YoutubeDLPool()
+    hook = MagicMock()
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_ydl.side_effect = lambda opts: MagicMock()
+
+        # Hooks reach yt-dlp through one dispatcher per type, which calls
+        # only the hooks of the current borrower
+        with pool.session({'format': 'best'}, post_hooks=[hook]) as first:
+            dispatch = first.add_post_hook.call_args[0][0]
+            dispatch('video.mp4')
+        hook.assert_called_once_with('video.mp4')
+        with pool.session({'format': 'best'}) as again:
+            assert again is first
+            dispatch('video.mp4')
+        hook.assert_called_once()
+        assert first.add_post_hook.call_count == 1
+        with pool.session({'format': 'worst'}) as other:
+            assert other is not first
+
+        # A session in use is never handed out twice
+        with pool.session({'format': 'best'}) as a, pool.session({'format': 'best'}) as b:
+            assert a is not b
+
+        # A generator closed early, as an incremental scan is, returns its session
+        def entries():
+            with pool.session({'format': 'scan'}) as ydl:
+                yield ydl
+                yield ydl
+        scan = entries()
+        scanner = next(scan)
+        scan.close()
+        scanner.close.assert_not_called()
+        with pool.session({'format': 'scan'}) as again:
+            assert again is scanner
+
+        # Idle sessions are bounded across all options, least recently used first
+        small = YoutubeDLPool(max_idle_total=2)
+        sessions = []
+        for fragments in (1, 2, 3):
+            with small.session({'concurrent_fragment_downloads': fragments}) as ydl:
+                sessions.append(ydl)
+        sessions[0].close.assert_called_once()
+        sessions[1].close.assert_not_called()
+        with small.session({'concurrent_fragment_downloads': 3}) as ydl:
+            assert ydl is sessions[2]
+
+def test_list_videos_pages_with_cursors(archiver):
+    videos = {}
+    for i in range(7):
+        videos[f'v{i}'] = {
+            'title': f'Video {6 - i}',
+            'downloaded_at': f'2024-01-0{i + 1}T00:00:00',
+            'playlist_id': 'PL1' if i % 2 else 'PL2'
+        }
+    archiver._save_downloaded_videos(videos)
+
+    seen = []
+    cursor = None
+    while True:
+        page = archiver.list_videos(cursor=cursor, limit=3)
+        seen.extend(video['id'] for video in page['videos'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == ['v6', 'v5', 'v4', 'v3', 'v2', 'v1', 'v0']
+
+    page = archiver.list_videos(sort='title', order='asc', limit=2)
+    assert [video['title'] for video in page['videos']] == ['Video 0', 'Video 1']
+    page = archiver.list_videos(sort='title', order='asc', limit=2, cursor=page['next_cursor'])
+    assert [video['title'] for video in page['videos']] == ['Video 2', 'Video 3']
+
+    # A cursor from another ordering starts over rather than skipping videos
+    other = archiver.list_videos(limit=2, cursor=page['next_cursor'])
+    assert [video['id'] for video in other['videos']] == ['v6', 'v5']
+
+    page = archiver.list_videos(playlist_id='PL1', limit=10)
+    assert [video['id'] for video in page['videos']] == ['v5', 'v3', 'v1']
+    assert page['next_cursor'] is None
+
+    # Well-formed cursors with keys of the wrong types start over instead of failing
+    from youtube_archiver.listing import encode_cursor
+    for key in ([1, "x"], [None, None], ["a", 2], ["a"]):
+        forged = encode_cursor('downloaded_at', 'desc', key)
+        assert [video['id'] for video in archiver.list_videos(limit=1, cursor=forged)['videos']] == ['v6']
+    forged = encode_cursor('position', 'asc', ["a", "v1"])
+    assert (archiver.list_videos(playlist_id='PL1', sort='position', order='asc', cursor=forged)
+            == archiver.list_videos(playlist_id='PL1', sort='position', order='asc'))
+
+    page = archiver.list_videos(query='video 4')
+    assert [video['id'] for video in page['videos']] == ['v2']
+
+def test_list_videos_follows_catalog_changes(archiver):
+    archiver._save_downloaded_videos({
+        'v1': {'title': 'Old', 'downloaded_at': '2024-01-01T00:00:00'}
+    })
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        assert archiver.download_video('v2', 'New') is True
+
+    assert [video['id'] for video in archiver.list_videos()['videos']] == ['v2', 'v1']
+
+    archiver.delete_video('v2')
+    assert [video['id'] for video in archiver.list_videos()['videos']] == ['v1']
+
+def test_search_videos_ranks_and_follows_catalog(archiver):
+    archiver.playlists = {'PL1': {'title': 'Cooking Basics'}}
+    archiver._save_playlists()
+    archiver._save_downloaded_videos({
+        'v1': {'title': 'Knife skills', 'uploader': 'Chef Anna', 'playlist_id': 'PL1'},
+        'v2': {'title': 'Cooking pasta at home', 'uploader': 'Someone'},
+        'v3': {'title': 'Guitar lesson', 'uploader': 'Cookie Music'}
+    })
+
+    # Title matches beat playlist-title matches; exact tokens beat prefixes
+    assert [video['id'] for video in archiver.search_videos('cooking')] == ['v2', 'v1']
+    assert [video['id'] for video in archiver.search_videos('cook')] == ['v2', 'v3', 'v1']
+    # All terms must match; only the last one is a prefix unless marked with *
+    assert [video['id'] for video in archiver.search_videos('knife chef')] == ['v1']
+    assert archiver.search_videos('kni chef') == []
+    assert [video['id'] for video in archiver.search_videos('kni* chef')] == ['v1']
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.download.side_effect = lambda urls: [
+            call.args[0]({'status': 'finished', 'info_dict': {'uploader': 'Guitar Hero'}})
+            for call in mock_instance.add_progress_hook.call_args_list
+        ]
+        assert archiver.download_video('v4', 'Blues licks') is True
+
+    assert archiver.downloaded_videos['v4']['uploader'] == 'Guitar Hero'
+    assert [video['id'] for video in archiver.search_videos('guitar')][:2] == ['v3', 'v4']
+
+    archiver.delete_video('v3')
+    assert [video['id'] for video in archiver.search_videos('guitar')] == ['v4']
+    assert [video['id'] for video in archiver.list_videos(query='blues')['videos']] == ['v4']
+
+def test_search_long_queries_stay_fast():
+    from youtube_archiver.search import SearchIndex
+
+    index = SearchIndex()
+    words = ["the", "best", "guitar", "lesson", "for", "a", "beginner", "at", "home", "today", "live", "part"]
+    index.rebuild({f'v{i}': {'title': " ".join(words[j] for j in range(len(words)) if (i >> j) & 1),
+                             'uploader': "the channel", 'playlist_title': "the playlist"}
+                   for i in range(30000)})
+
+    start = time.perf_counter()
+    assert index.search("the " * 14) != []
+    results = index.search(" ".join(words * 2), limit=10)
+    assert time.perf_counter() - start < 1.0
+    # Every result matches all (deduplicated) terms, best first
+    assert len(results) == 10
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert index.search("guitar guitar lesson") == index.search("guitar lesson")
+
+def test_download_events_reach_listeners(archiver):
+    events = []
+    archiver.add_listener(lambda event, data: events.append((event, data)))
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        assert archiver.download_video('v1', 'Vid 1', 'PL1') is True
+        mock_instance.download.side_effect = Exception("boom")
+        assert archiver.download_video('v2', 'Vid 2', 'PL1') is False
+
+    assert [event for event, _ in events] == [
+        'download_started', 'download_finished', 'download_started', 'download_finished'
+    ]
+    assert events[1][1]['video_id'] == 'v1'
+    assert events[1][1]['playlist_id'] == 'PL1'
+    assert events[1][1]['success'] is True
+    assert events[3][1]['success'] is False
+    assert events[3][1]['error'] == 'boom'
+
+def test_download_telemetry_from_hooks(archiver):
+    archiver.playlists = {'PL1': {'title': 'Test Playlist', 'url': 'http://url', 'video_count': 1}}
+    events = []
+    archiver.add_listener(lambda event, data: events.append((event, data)))
+
+    def fake_download(urls):
+        progress_hooks = [call.args[0] for call in mock_instance.add_progress_hook.call_args_list]
+        pp_hooks = [call.args[0] for call in mock_instance.add_postprocessor_hook.call_args_list]
+        for name, size in (('v1.f137.mp4', 3000), ('v1.f140.m4a', 1000)):
+            for hook in progress_hooks:
+                hook({'status': 'downloading', 'filename': name, 'downloaded_bytes': size // 2,
+                      'total_bytes': size, 'speed': 500.0, 'eta': 3,
+                      'fragment_index': 2, 'fragment_count': 4})
+            snapshot = archiver.telemetry.snapshot()
+            assert snapshot['active'][0]['status'] == 'downloading'
+            assert snapshot['active'][0]['fragment_count'] == 4
+            assert snapshot['current_speed'] == 500.0
+            for hook in progress_hooks:
+                hook({'status': 'finished', 'filename': name, 'total_bytes': size, 'elapsed': 2.0})
+        for status in ('started', 'finished'):
+            for hook in pp_hooks:
+                hook({'status': status, 'postprocessor': 'Merger'})
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            'id': 'PL1', 'title': 'Test Playlist', 'entries': [{'id': 'v1', 'title': 'Vid 1'}]
+        }
+        mock_instance.download.side_effect = fake_download
+        result = archiver.sync_playlist('PL1')
 
+    video = [data for event, data in events if event == 'download_finished'][0]['telemetry']
+    assert video['downloaded_bytes'] == 4000
+    assert video['total_bytes'] == 4000
+    assert video['download_seconds'] == 4.0
+    assert 'Merger' in video['postprocess_seconds']
+    assert video['status'] == 'finished'
 
+    totals = result['telemetry']
+    assert totals['videos'] == 1
+    assert totals['bytes'] == 4000
+    assert totals['average_speed'] == 1000.0
+    assert archiver.telemetry.snapshot()['active'] == []
+    assert archiver.telemetry.snapshot()['recent'][-1]['video_id'] == 'v1'
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+from unittest.mock import patch
+from youtube_archiver import YouTubeArchiver
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import run
+from benchmarks.synthetic import build_archive
+
+def test_fake_backend_syncs_synthetic_archive(tmp_path):
+    config_dir, download_dir, backend = build_archive(str(tmp_path), 20, playlists=2, new_per_playlist=3,
+                                                      failure_rate=0.0)
+    archiver = YouTubeArchiver(config_dir=config_dir, download_dir=download_dir)
+    assert len(archiver.downloaded_videos) == 20
+    assert archiver.get_storage_stats()["video_count"] == 20
+
+    with patch('yt_dlp.YoutubeDL', backend.ydl_class()):
+        result = archiver.sync_playlist("PLBENCH0000")
+
+    assert result["success"]
+    assert result["new_videos"] == 3
+    assert result["telemetry"]["bytes"] == 3 * backend.video_size
+    new_ids = [video_id for video_id, _ in backend.playlists["PLBENCH0000"]["entries"][:3]]
+    for video_id in new_ids:
+        assert os.path.getsize(archiver.find_video_file(video_id)) == backend.video_size
+
+def test_run_writes_machine_readable_results(tmp_path):
+    output = tmp_path / "results.json"
+    run.main(["--sizes", "30", "--repeat", "1", "--playlists", "2", "--new-per-playlist", "1",
+              "--lookups", "10", "--output", str(output)])
+
+    report = json.loads(output.read_text())
+    assert report["meta"]["params"]["sizes"] == "30"
+    names = {result["name"] for result in report["results"]}
+    assert {"catalog_load", "catalog_save", "get_storage_stats", "find_video_file", "sync_playlist",
+            "sync_all_playlists", "render_index", "render_videos", "render_playlist"} <= names
+    for result in report["results"]:
+        assert result["size"] == 30
+        assert result["min"] <= result["median"] <= result["max"]
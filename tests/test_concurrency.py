@@ -0,0 +1,71 @@
+import threading
+from unittest.mock import patch
+from youtube_archiver.concurrency import AdaptiveConcurrency, classify_error
+
+def test_classify_error():
+    assert classify_error("ERROR: unable to download video data: HTTP Error 429: Too Many Requests") == "rate_limited"
+    assert classify_error("HTTP Error 403: Forbidden") == "forbidden"
+    assert classify_error("The read operation timed out") == "network"
+    assert classify_error("Video unavailable") == "other"
+
+def test_congestion_halves_both_levels_once_per_cooldown():
+    decisions = []
+    controller = AdaptiveConcurrency(videos=6, fragments=8, max_videos=8, on_decision=decisions.append)
+
+    decision = controller.observe(False, "HTTP Error 429: Too Many Requests")
+    assert decision["reason"] == "rate_limited"
+    assert (controller.videos, controller.fragments) == (3, 4)
+    assert controller.slots.limit == 3
+
+    # Downloads already in flight report the same 429; don't keep halving
+    assert controller.observe(False, "HTTP Error 429") is None
+    assert controller.videos == 3
+
+    # Unrelated failures are not congestion
+    controller.cooldown = 0
+    assert controller.observe(False, "Video unavailable") is None
+    # A download below the throttle rate is, unless our own cap made it slow
+    controller.throttle_rate = 100000
+    assert controller.observe(True, throughput=50000, shaped=True) is None
+    assert controller.observe(True, throughput=50000)["reason"] == "throttled"
+    assert (controller.videos, controller.fragments) == (1, 2)
+    assert [d["reason"] for d in decisions] == ["rate_limited", "throttled"]
+    assert controller.snapshot()["decisions"] == decisions
+
+def test_probes_until_throughput_stops_improving():
+    controller = AdaptiveConcurrency(videos=1, fragments=1, max_videos=4, max_fragments=4, hold_rounds=0)
+    link = 4000000.0
+
+    def round_trip():
+        # Each download gets an equal share of the link; one fragment already fills it
+        per_download = min(1000000.0 * controller.fragments, link / controller.videos)
+        for _ in range(controller.videos):
+            controller.observe(True, throughput=per_download)
+
+    for _ in range(12):
+        round_trip()
+
+    actions = [(d["action"], d["reason"]) for d in controller.decisions]
+    assert ("increase", "probe") in actions
+    assert ("decrease", "plateau") in actions
+    # Settles where aggregate throughput reaches the link, within bounds
+    assert 1 <= controller.videos <= 4 and 1 <= controller.fragments <= 4
+    per_download = min(1000000.0 * controller.fragments, link / controller.videos)
+    assert per_download * controller.videos >= link * 0.75
+
+def test_resized_slots_admit_waiting_downloads():
+    controller = AdaptiveConcurrency(videos=1, max_videos=2, hold_rounds=0)
+    controller.slots.acquire("PL1")
+    acquired = threading.Event()
+
+    def second():
+        controller.slots.acquire("PL1")
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.1)
+    controller.observe(True, throughput=1000000)
+    assert controller.videos == 2
+    assert acquired.wait(1)
+    thread.join()
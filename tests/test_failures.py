@@ -0,0 +1,78 @@
+import time
+import yt_dlp
+from unittest.mock import patch
+from youtube_archiver.failures import FailureLedger, classify_failure
+
+def test_classify_failure():
+    assert classify_failure("ERROR: [youtube] abc: Private video. Sign in if you've been granted access") == ("permanent", "private")
+    assert classify_failure("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader")[0] == "permanent"
+    assert classify_failure("The uploader has not made this video available in your country")[1] == "region_locked"
+    assert classify_failure("Sign in to confirm your age. This video may be inappropriate for some users.")[1] == "age_gated"
+    assert classify_failure("HTTP Error 429: Too Many Requests") == ("transient", "error")
+
+def test_transient_failures_back_off_then_quarantine(tmp_path):
+    ledger = FailureLedger(str(tmp_path / "failures.json"), retry_delay=60, max_delay=200,
+                           jitter=0, quarantine_after=4, quarantine_cooldown=86400)
+    now = time.time()
+
+    delays = []
+    for _ in range(3):
+        entry = ledger.record_failure("vid1", "HTTP Error 429", "Video 1", "PL1")
+        delays.append(round(entry["retry_at"] - entry["last_failed"]))
+        assert not entry["quarantined"]
+    assert delays == [60, 120, 200]
+    assert ledger.should_skip("vid1")
+    assert not ledger.should_skip("vid1", now=now + 1000)
+
+    entry = ledger.record_failure("vid1", "HTTP Error 429")
+    assert entry["quarantined"]
+    assert entry["title"] == "Video 1"
+    assert ledger.should_skip("vid1", now=now + 1000)
+
+    # Persisted, and visible to another process
+    other = FailureLedger(str(tmp_path / "failures.json"))
+    assert [e["video_id"] for e in other.entries(playlist_id="PL1", quarantined=True)] == ["vid1"]
+
+    ledger.record_success("vid1")
+    assert ledger.get("vid1") is None
+    other._mtime = None
+    assert other.entries() == []
+
+def test_jitter_spreads_retries(tmp_path):
+    ledger = FailureLedger(str(tmp_path / "failures.json"), retry_delay=100, jitter=0.2)
+    with patch('random.uniform', side_effect=lambda a, b: b):
+        entry = ledger.record_failure("vid1", "timed out")
+    assert round(entry["retry_at"] - entry["last_failed"]) == 120
+
+def test_sync_skips_quarantined_videos(archiver):
+    archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+    archiver._save_playlists()
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            'entries': [{'id': 'vid1', 'title': 'Video 1'}, {'id': 'vid2', 'title': 'Video 2'}]
+        }
+
+        def download(urls):
+            if 'vid1' in urls[0]:
+                raise yt_dlp.utils.DownloadError("ERROR: [youtube] vid1: Private video")
+        mock_instance.download.side_effect = download
+
+        result = archiver.sync_playlist('PL123')
+        assert result['failed_videos'] == ['vid1']
+        assert archiver.failures.get('vid1')['quarantined']
+
+        mock_instance.download.reset_mock()
+        result = archiver.sync_playlist('PL123')
+        assert result['skipped_videos'] == ['vid1']
+        assert result['failed_videos'] == []
+        mock_instance.download.assert_not_called()
+
+        # Released by hand, it is tried again
+        assert archiver.failures.release('vid1')
+        mock_instance.download.side_effect = None
+        result = archiver.sync_playlist('PL123')
+        assert result['new_videos'] == 1
+        assert archiver.failures.get('vid1') is None
@@ -0,0 +1,98 @@
+import os
+import stat
+import struct
+import pytest
+from unittest.mock import patch
+from youtube_archiver.faststart import moov_first, remux_faststart
+from youtube_archiver.jobs import JobRunner
+
+def box(kind, payload=b''):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+FASTSTART = box(b'ftyp', b'isom') + box(b'moov', b'index') + box(b'mdat', b'0' * 100)
+MOOV_AT_END = box(b'ftyp', b'isom') + box(b'mdat', b'0' * 100) + box(b'moov', b'index')
+
+@pytest.fixture
+def archiver(archiver):
+    archiver.ffmpeg = None
+    return archiver
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    """An "ffmpeg" that writes a fast-start file to its last argument"""
+    source = tmp_path / "faststart.bin"
+    source.write_bytes(FASTSTART)
+    path = tmp_path / "ffmpeg"
+    path.write_text(f'#!/bin/sh\nfor last; do :; done\ncp "{source}" "$last"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def test_moov_first(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(FASTSTART)
+    assert moov_first(str(path)) is True
+    path.write_bytes(MOOV_AT_END)
+    assert moov_first(str(path)) is False
+
+    # 64-bit box sizes are followed
+    large = struct.pack(">I4sQ", 1, b'free', 24) + b'0' * 8
+    path.write_bytes(box(b'ftyp') + large + box(b'moov'))
+    assert moov_first(str(path)) is True
+
+    path.write_bytes(b'not an mp4 file at all')
+    assert moov_first(str(path)) is None
+
+def test_remux_faststart(tmp_path, fake_ffmpeg):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(MOOV_AT_END)
+    remux_faststart(str(path), fake_ffmpeg)
+    assert moov_first(str(path)) is True
+    assert not [name for name in os.listdir(str(tmp_path)) if name.startswith('.')]
+
+    # A failed remux leaves the original in place
+    path.write_bytes(MOOV_AT_END)
+    with pytest.raises(RuntimeError):
+        remux_faststart(str(path), "false")
+    assert path.read_bytes() == MOOV_AT_END
+    assert not [name for name in os.listdir(str(tmp_path)) if name.startswith('.')]
+
+def test_download_flags_faststart_files(archiver):
+    video_file = os.path.join(archiver.download_dir, "Video 1-v1.mp4")
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+
+        def fake_download(urls):
+            with open(video_file, 'wb') as f:
+                f.write(FASTSTART)
+            mock_instance.add_post_hook.call_args[0][0](video_file)
+        mock_instance.download.side_effect = fake_download
+
+        assert archiver.download_video('v1', 'Video 1') is True
+    assert archiver.downloaded_videos['v1']['faststart'] is True
+
+def test_optimize_faststart_resumes(archiver, fake_ffmpeg):
+    for video_id, data in (('v1', FASTSTART), ('v2', MOOV_AT_END), ('v3', MOOV_AT_END)):
+        path = os.path.join(archiver.download_dir, f"Video-{video_id}.mp4")
+        with open(path, 'wb') as f:
+            f.write(data)
+        archiver.downloaded_videos[video_id] = {'title': video_id, 'file_path': path, 'file_size': len(data)}
+        archiver.file_index[video_id] = path
+
+    # Without ffmpeg, only files that are already fast-start are flagged
+    result = archiver.optimize_faststart()
+    assert (result['already'], result['remuxed'], result['skipped']) == (1, 0, 2)
+    assert archiver.downloaded_videos['v1']['faststart'] is True
+
+    archiver.ffmpeg = fake_ffmpeg
+    archiver.jobs.enqueue("optimize_faststart")
+    results = []
+    runner = JobRunner(archiver, archiver.jobs, on_job_finished=lambda job, result: results.append(result))
+    runner.drain()
+    assert (results[0]['already'], results[0]['remuxed']) == (0, 2)
+    assert moov_first(archiver.file_index['v3']) is True
+    assert archiver.downloaded_videos['v3']['file_size'] == len(FASTSTART)
+    assert archiver.jobs.list()[0]['state'] == 'done'
+
+    # Nothing is left to do on the next run
+    assert archiver.optimize_faststart()['remuxed'] == 0
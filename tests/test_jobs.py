@@ -0,0 +1,169 @@
+from unittest.mock import patch
+from youtube_archiver.jobs import JobQueue, JobRunner
+
+def test_enqueue_coalesces_active_jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.json"))
+
+    first, created = jobs.enqueue("sync_playlist", "PL1")
+    assert created
+    second, created = jobs.enqueue("sync_playlist", "PL1")
+    assert not created
+    assert second["id"] == first["id"]
+
+    claimed = jobs.claim("runner-a")
+    assert claimed["id"] == first["id"]
+    # Still coalesced while running
+    assert jobs.enqueue("sync_playlist", "PL1")[1] is False
+
+    jobs.complete(first["id"], "runner-a", result={"new_videos": 1})
+    third, created = jobs.enqueue("sync_playlist", "PL1")
+    assert created
+    assert third["id"] != first["id"]
+
+    # The queue is shared through the file
+    other = JobQueue(str(tmp_path / "jobs.json"))
+    assert [job["state"] for job in other.list()] == ["done", "queued"]
+    assert other.counts()["done"] == 1
+
+def test_expired_leases_are_reclaimed(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.json"), lease_seconds=60, max_attempts=2)
+    job, _ = jobs.enqueue("sync_playlist", "PL1")
+
+    assert jobs.claim("runner-a")["id"] == job["id"]
+    assert jobs.claim("runner-b") is None
+    assert jobs.renew(job["id"], "runner-a")
+    assert not jobs.renew(job["id"], "runner-b")
+
+    # runner-a stops without finishing; once its lease runs out the job resumes
+    with patch('time.time', return_value=job["created_at"] + 3600):
+        resumed = jobs.claim("runner-b")
+    assert resumed["id"] == job["id"]
+    assert resumed["owner"] == "runner-b"
+    assert resumed["attempts"] == 2
+
+    # The old owner can no longer finish it
+    jobs.complete(job["id"], "runner-a")
+    assert jobs.list()[0]["state"] == "running"
+
+    # A job abandoned on its last attempt is failed rather than retried forever
+    with patch('time.time', return_value=job["created_at"] + 7200):
+        assert jobs.claim("runner-c") is None
+    assert jobs.list()[0]["state"] == "failed"
+
+def test_failed_jobs_retry_with_backoff(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.json"), max_attempts=2, retry_delay=60)
+    job, _ = jobs.enqueue("sync_playlist", "PL1")
+
+    jobs.claim("runner-a")
+    jobs.fail(job["id"], "runner-a", "network down")
+    queued = jobs.list()[0]
+    assert queued["state"] == "queued"
+    assert queued["error"] == "network down"
+    assert jobs.claim("runner-a") is None
+
+    with patch('time.time', return_value=queued["available_at"] + 1):
+        assert jobs.claim("runner-a")["attempts"] == 2
+    jobs.fail(job["id"], "runner-a", "network down")
+    assert jobs.list()[0]["state"] == "failed"
+
+def test_runner_drains_queue_and_resumes_interrupted_run(archiver):
+    archiver.playlists = {
+        'PL1': {'title': 'Big', 'video_count': 100},
+        'PL2': {'title': 'Small', 'video_count': 2},
+        'PL3': {'title': 'Medium', 'video_count': 10}
+    }
+    archiver._save_playlists()
+    jobs = archiver.enqueue_sync_all()
+    assert [job['playlist_id'] for job in jobs] == ['PL2', 'PL3', 'PL1']
+
+    # A previous process finished PL2 and died while syncing PL3
+    archiver.jobs.claim("dead-runner")
+    archiver.jobs.complete(jobs[0]['id'], "dead-runner", result={})
+    archiver.jobs.lease_seconds = 0
+    archiver.jobs.claim("dead-runner")
+    archiver.jobs.lease_seconds = 120
+
+    synced = []
+    def fake_sync(playlist_id, callback=None, slots=None):
+        synced.append(playlist_id)
+        callback("Downloading", 50)
+        return {'success': True, 'playlist_id': playlist_id,
+                'playlist_title': archiver.playlists[playlist_id]['title'],
+                'total_videos': 1, 'scan_mode': 'full', 'new_videos': 1,
+                'failed_videos': [], 'completed_at': None}
+
+    finished = []
+    with patch.object(archiver, 'sync_playlist', side_effect=fake_sync):
+        runner = JobRunner(archiver, archiver.jobs,
+                           on_job_finished=lambda job, result: finished.append(result))
+        runner.drain()
+
+    assert sorted(synced) == ['PL1', 'PL3']
+    assert len(finished) == 2
+    states = {job['playlist_id']: job['state'] for job in archiver.jobs.list()}
+    assert states == {'PL1': 'done', 'PL2': 'done', 'PL3': 'done'}
+    assert archiver.jobs.list()[1]['result']['new_videos'] == 1
+
+def test_runner_applies_concurrency_changes(archiver):
+    archiver.playlists = {'PL1': {'title': 'Playlist', 'video_count': 1}}
+    archiver._save_playlists()
+
+    limits = []
+    def fake_sync(playlist_id, callback=None, slots=None):
+        limits.append(slots.limit)
+        return {'success': True, 'playlist_id': playlist_id, 'playlist_title': 'Playlist',
+                'new_videos': 0, 'failed_videos': []}
+
+    with patch.object(archiver, 'sync_playlist', side_effect=fake_sync):
+        runner = JobRunner(archiver, archiver.jobs)
+        archiver.enqueue_sync('PL1')
+        runner.drain()
+        # Settings saved while the runner is up apply to the next job
+        archiver.update_config({"concurrent_downloads": 6})
+        archiver.enqueue_sync('PL1')
+        runner.drain()
+
+    assert limits == [1, 6]
+
+def test_runner_follows_adaptive_concurrency(archiver):
+    archiver.playlists = {'PL1': {'title': 'Playlist', 'video_count': 1}}
+    archiver._save_playlists()
+    archiver.update_config({"adaptive_concurrency": True, "concurrent_downloads": 4})
+
+    budgets = []
+    def fake_sync(playlist_id, callback=None, slots=None):
+        # The controller backs off in the middle of the sync
+        archiver.concurrency.observe(False, "HTTP Error 429: Too Many Requests")
+        budgets.append((slots, slots.limit))
+        return {'success': True, 'playlist_id': playlist_id, 'playlist_title': 'Playlist',
+                'new_videos': 0, 'failed_videos': []}
+
+    with patch.object(archiver, 'sync_playlist', side_effect=fake_sync):
+        archiver.enqueue_sync('PL1')
+        JobRunner(archiver, archiver.jobs).drain()
+
+    assert budgets == [(archiver.concurrency.slots, 2)]
+    assert archiver.download_slots() is archiver.concurrency.slots
+
+    # Turning the controller off keeps the same budget at the configured size
+    archiver.update_config({"adaptive_concurrency": False})
+    assert archiver.download_slots().limit == 4
+
+def test_drain_runs_only_requested_jobs(archiver):
+    archiver.playlists = {'PL1': {'title': 'One', 'video_count': 1}, 'PL2': {'title': 'Two', 'video_count': 1}}
+    archiver._save_playlists()
+    other, _ = archiver.enqueue_sync('PL1')
+    mine, _ = archiver.enqueue_sync('PL2')
+
+    synced = []
+    def fake_sync(playlist_id, callback=None, slots=None):
+        synced.append(playlist_id)
+        return {'success': True, 'playlist_id': playlist_id, 'playlist_title': playlist_id,
+                'new_videos': 0, 'failed_videos': []}
+
+    with patch.object(archiver, 'sync_playlist', side_effect=fake_sync):
+        JobRunner(archiver, archiver.jobs).drain(job_ids={mine['id']})
+
+    assert synced == ['PL2']
+    states = {job['id']: job['state'] for job in archiver.jobs.list()}
+    assert states == {other['id']: 'queued', mine['id']: 'done'}
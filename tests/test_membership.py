@@ -0,0 +1,146 @@
+import os
+import pytest
+from contextlib import contextmanager
+from unittest.mock import patch
+from youtube_archiver import YouTubeArchiver
+from youtube_archiver.membership import PlaylistMembership
+from youtube_archiver.storage import JSONCatalogStore, SQLiteCatalogStore
+
+@contextmanager
+def fake_youtube(archiver, playlists):
+    """Patch yt-dlp to serve ``playlists`` (URL -> entry IDs); each download writes a 100 byte file"""
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.side_effect = lambda url, **kwargs: {
+            'entries': [{'id': video_id, 'title': f'Video {video_id}'} for video_id in playlists[url]]}
+
+        def fake_download(urls):
+            video_id = urls[0].split('v=')[1]
+            path = os.path.join(archiver.download_dir, f"Video {video_id}-{video_id}.mp4")
+            with open(path, 'wb') as f:
+                f.write(b'0' * 100)
+            mock_instance.add_post_hook.call_args[0][0](path)
+        mock_instance.download.side_effect = fake_download
+        yield
+
+def test_membership_index():
+    membership = PlaylistMembership()
+    membership.rebuild({'PL1': ['a', 'b', 'c'], 'PL2': ['c', 'd']})
+    assert membership.videos('PL1') == ['a', 'b', 'c']
+    assert membership.playlists('c') == ['PL1', 'PL2']
+    assert membership.position('PL2', 'd') == 1
+
+    assert membership.set_playlist('PL1', ['c', 'a', 'e']) == {'b', 'e'}
+    assert membership.playlists('b') == []
+    assert membership.position('PL1', 'c') == 0
+
+    assert membership.merge_head('PL1', ['f', 'a']) == {'f'}
+    assert membership.videos('PL1') == ['f', 'a', 'c', 'e']
+
+    assert membership.add('PL2', 'a') is True
+    assert membership.add('PL2', 'a') is False
+    assert membership.videos('PL2') == ['c', 'd', 'a']
+
+    membership.remove_playlist('PL2')
+    assert membership.playlists('d') == []
+    assert membership.playlists('a') == ['PL1']
+    assert membership.snapshot() == {'PL1': ['f', 'a', 'c', 'e']}
+
+def test_sync_records_playlist_order_and_shared_videos(archiver):
+    archiver.playlists = {
+        'PL1': {'title': 'Playlist 1', 'url': 'http://url/1'},
+        'PL2': {'title': 'Playlist 2', 'url': 'http://url/2'}
+    }
+    archiver._save_playlists()
+    archiver.get_storage_stats()
+    playlists = {'http://url/1': ['v3', 'v1', 'v2'], 'http://url/2': ['v4', 'v1']}
+    with fake_youtube(archiver, playlists):
+        assert archiver.sync_playlist('PL1')['new_videos'] == 3
+        # v1 is already archived; it joins PL2 without a second download
+        assert archiver.sync_playlist('PL2')['new_videos'] == 1
+
+        assert archiver.membership.videos('PL1') == ['v3', 'v1', 'v2']
+        assert archiver.membership.playlists('v1') == ['PL1', 'PL2']
+        # A shared video is found by the title of either playlist
+        assert [video['id'] for video in archiver.search_videos('"Playlist 2"')] == ['v1', 'v4']
+
+        page = archiver.list_videos(playlist_id='PL1', sort='position', order='asc', limit=2)
+        assert [video['id'] for video in page['videos']] == ['v3', 'v1']
+        page = archiver.list_videos(playlist_id='PL1', sort='position', order='asc', limit=2,
+                                    cursor=page['next_cursor'])
+        assert [video['id'] for video in page['videos']] == ['v2']
+        assert page['next_cursor'] is None
+        assert [video['id'] for video in archiver.list_videos(playlist_id='PL2', sort='position',
+                                                              order='asc')['videos']] == ['v4', 'v1']
+
+        # A video in two playlists counts towards both, but only once overall
+        assert archiver.get_playlist_storage_stats('PL1')['total_size'] == 300
+        assert archiver.get_playlist_storage_stats('PL2')['video_count'] == 2
+        assert archiver.get_storage_stats()['total_size'] == 400
+
+        # Reordering is picked up by the next full scan; archived videos that
+        # left the playlist stay at the end
+        playlists['http://url/1'] = ['v2', 'v3']
+        archiver.sync_playlist('PL1')
+    assert archiver.membership.videos('PL1') == ['v2', 'v3', 'v1']
+
+    # Deleting a video keeps its place in the playlist for a re-download
+    archiver.delete_video('v3')
+    assert [video['id'] for video in archiver.list_videos(playlist_id='PL1', sort='position',
+                                                          order='asc')['videos']] == ['v2', 'v1']
+    assert archiver.membership.videos('PL1') == ['v2', 'v3', 'v1']
+
+    archiver.remove_playlist('PL2')
+    assert archiver.membership.playlists('v1') == ['PL1']
+    assert archiver.search_videos('"Playlist 2"') == []
+    archiver.close()
+
+    reopened = YouTubeArchiver(config_dir=archiver.config_dir, download_dir=archiver.download_dir)
+    assert reopened.membership.videos('PL1') == ['v2', 'v3', 'v1']
+    assert reopened.membership.videos('PL2') == []
+
+def test_membership_seeded_from_existing_catalog(tmp_path):
+    config_dir = tmp_path / "config"
+    archiver = YouTubeArchiver(config_dir=str(config_dir), download_dir=str(tmp_path / "downloads"))
+    archiver._save_downloaded_videos({
+        'v1': {'title': 'Video 1', 'playlist_id': 'PL1', 'downloaded_at': '2024-01-01T00:00:00'},
+        'v2': {'title': 'Video 2', 'playlist_id': 'PL1', 'downloaded_at': '2024-01-02T00:00:00'}
+    })
+    archiver.close()
+    assert not os.path.exists(os.path.join(str(config_dir), "playlist_membership.json"))
+
+    reopened = YouTubeArchiver(config_dir=str(config_dir), download_dir=str(tmp_path / "downloads"))
+    assert sorted(reopened.membership.videos('PL1')) == ['v1', 'v2']
+    assert os.path.exists(os.path.join(str(config_dir), "playlist_membership.json"))
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_store_memberships(tmp_path, backend):
+    def open_store():
+        if backend == "sqlite":
+            return SQLiteCatalogStore(str(tmp_path / "catalog.db"))
+        return JSONCatalogStore(str(tmp_path / "playlists.json"), str(tmp_path / "videos.json"))
+
+    store = open_store()
+    store.load_playlists()
+    store.load_videos()
+    store.save_memberships({'PL1': ['a', 'b'], 'PL2': ['b']})
+    store.put_membership('PL1', ['c', 'b', 'a'])
+    store.put_playlist('PL2', {'title': 'Playlist 2'})
+    store.remove_playlist('PL2')
+    store.close()
+
+    store = open_store()
+    assert store.load_memberships() == {'PL1': ['c', 'b', 'a']}
+    store.close()
+
+def test_sqlite_videos_join_membership_until_ordered(tmp_path):
+    store = SQLiteCatalogStore(str(tmp_path / "catalog.db"))
+    store.put_membership('PL1', ['a', 'b'])
+    store.put_video('z', {'title': 'Z', 'playlist_id': 'PL1'})
+    store.put_video('a', {'title': 'A', 'playlist_id': 'PL1'})
+    assert store.load_memberships() == {'PL1': ['a', 'b', 'z']}
+
+    store.remove_video('a')
+    assert store.load_memberships() == {'PL1': ['b', 'z']}
+    store.close()
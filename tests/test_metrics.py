@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import patch
+from youtube_archiver import metrics
+from youtube_archiver.metrics import Counter, Gauge, Histogram, Registry
+
+def sample(name, **labels):
+    """Read one sample back from the global registry's exposition"""
+    text = metrics.REGISTRY.render()
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f"youtube_archiver_{name}{{{label_text}}} " if labels else f"youtube_archiver_{name} "
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+def test_text_exposition():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ["route"], registry=registry)
+    depth = Gauge("depth", "Queue depth", registry=registry)
+    latency = Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0), registry=registry)
+
+    requests.inc(route='/a "b"')
+    requests.inc(2, route='/a "b"')
+    depth.inc(5)
+    depth.dec(2)
+    latency.observe(0.05, route="/")
+    latency.observe(0.5, route="/")
+    latency.observe(3, route="/")
+
+    text = registry.render()
+    assert '# TYPE youtube_archiver_requests_total counter' in text
+    assert 'youtube_archiver_requests_total{route="/a \\"b\\""} 3' in text
+    assert 'youtube_archiver_depth 3' in text
+    assert 'youtube_archiver_latency_seconds_bucket{route="/",le="0.1"} 1' in text
+    assert 'youtube_archiver_latency_seconds_bucket{route="/",le="1"} 2' in text
+    assert 'youtube_archiver_latency_seconds_bucket{route="/",le="+Inf"} 3' in text
+    assert 'youtube_archiver_latency_seconds_count{route="/"} 3' in text
+    assert 'youtube_archiver_latency_seconds_sum{route="/"} 3.55' in text
+
+    with pytest.raises(ValueError):
+        requests.inc(method="GET")
+    with pytest.raises(ValueError):
+        Counter("depth", "Duplicate", registry=registry)
+
+def test_archiver_hot_paths_are_instrumented(archiver):
+    before_saves = sample("catalog_save_seconds_count", catalog="videos")
+    before_missing = sample("find_video_file_seconds_count", source="missing")
+    before_stats = sample("storage_stats_seconds_count")
+    before_downloads = sample("downloads_total", result="success")
+
+    archiver._save_downloaded_videos({'v1': {'title': 'Video 1'}})
+    assert archiver.find_video_file('v1') is None
+    archiver.get_storage_stats()
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        assert archiver.download_video('v2', 'Video 2') is True
+
+    assert sample("catalog_save_seconds_count", catalog="videos") == before_saves + 1
+    assert sample("find_video_file_seconds_count", source="missing") == before_missing + 1
+    assert sample("storage_stats_seconds_count") == before_stats + 1
+    assert sample("downloads_total", result="success") == before_downloads + 1
+    assert sample("snapshot_bytes", file="downloaded_videos.json") > 0
@@ -0,0 +1,61 @@
+import time
+import threading
+from datetime import datetime
+import pytest
+from youtube_archiver.shaper import BandwidthShaper, parse_schedule, format_schedule
+
+def test_schedule_round_trip():
+    windows = parse_schedule("01:00-07:00 unlimited\n\n 22:30 - 02:00 1.5 ")
+    assert windows == [{"start": "01:00", "end": "07:00", "limit": None},
+                       {"start": "22:30", "end": "02:00", "limit": 1500000}]
+    assert format_schedule(windows) == "01:00-07:00 unlimited\n22:30-02:00 1.5"
+
+    with pytest.raises(ValueError):
+        parse_schedule("01:00 unlimited")
+    with pytest.raises(ValueError):
+        parse_schedule("25:00-26:00 1")
+
+def test_windows_override_the_base_limit():
+    shaper = BandwidthShaper(2000000, [{"start": "01:00", "end": "07:00", "limit": None},
+                                       {"start": "23:00", "end": "01:00", "limit": 500000}])
+    assert shaper.current_limit(datetime(2024, 1, 1, 3, 0)) is None
+    assert shaper.current_limit(datetime(2024, 1, 1, 12, 0)) == 2000000
+    assert shaper.current_limit(datetime(2024, 1, 1, 23, 30)) == 500000
+    assert shaper.current_limit(datetime(2024, 1, 1, 0, 59)) == 500000
+    assert shaper.current_limit(datetime(2024, 1, 1, 7, 0)) == 2000000
+
+    shaper.configure(None, [])
+    assert shaper.current_limit(datetime(2024, 1, 1, 12, 0)) is None
+
+def test_concurrent_downloads_share_the_cap():
+    shaper = BandwidthShaper(1000000, burst=0.1)
+    received = {}
+
+    def download(video_id):
+        hook = shaper.start(video_id)
+        for i in range(1, 11):
+            hook({"status": "downloading", "filename": f"{video_id}.mp4", "downloaded_bytes": i * 25000})
+            received[video_id] = i * 25000
+        shaper.finish(video_id)
+
+    assert shaper.snapshot()["share"] is None
+    start = time.monotonic()
+    threads = [threading.Thread(target=download, args=(f"v{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    # 1 MB at 1 MB/s, less the 0.1 s burst
+    assert sum(received.values()) == 1000000
+    assert 0.8 <= elapsed < 2.0
+    assert shaper.snapshot()["active_downloads"] == 0
+
+def test_unlimited_never_waits():
+    shaper = BandwidthShaper()
+    hook = shaper.start("v1")
+    start = time.monotonic()
+    hook({"status": "downloading", "filename": "a", "downloaded_bytes": 10 ** 9})
+    assert time.monotonic() - start < 0.1
+    assert shaper.consume(10 ** 9) == 0.0
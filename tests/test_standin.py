@@ -0,0 +1,110 @@
+import os
+import time
+import json
+import pytest
+from unittest.mock import patch
+from youtube_archiver import YouTubeArchiver
+from youtube_archiver.standin import StandinServer, synthetic_playlists
+
+@pytest.fixture
+def server():
+    with StandinServer(synthetic_playlists(1, 5), page_size=2, video_size=50_000) as server:
+        yield server
+
+@pytest.fixture
+def archiver(tmp_path, server):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    (config_dir / "config.json").write_text(json.dumps({
+        "download_dir": str(tmp_path / "downloads"),
+        "test_server": server.url,
+        "concurrent_downloads": 2
+    }))
+    archiver = YouTubeArchiver(config_dir=str(config_dir), download_dir=str(tmp_path / "downloads"))
+    yield archiver
+    archiver.close()
+
+def test_sync_runs_end_to_end_against_standin(archiver, server):
+    playlist_id = archiver.add_playlist("https://www.youtube.com/playlist?list=PLSTANDIN000")
+    assert playlist_id == "PLSTANDIN000"
+    assert archiver.playlists[playlist_id]["video_count"] == 5
+
+    result = archiver.sync_playlist(playlist_id)
+
+    assert result["success"]
+    assert result["new_videos"] == 5
+    assert result["failed_videos"] == []
+    assert result["telemetry"]["bytes"] == 5 * 50_000
+    for video_id, video in archiver.downloaded_videos.items():
+        assert video["url"] == f"https://www.youtube.com/watch?v={video_id}"
+        assert os.path.getsize(video["file_path"]) == 50_000
+    assert server.stats["media_requests"] == 5
+    assert 1 <= server.stats["max_active_streams"] <= 2
+
+def test_injected_errors_fail_downloads_until_retried(archiver, server):
+    playlist_id = archiver.add_playlist("https://www.youtube.com/playlist?list=PLSTANDIN000")
+    server.inject(429, times=1, match="/media/sv000000003", retry_after=1)
+
+    result = archiver.sync_playlist(playlist_id)
+    assert result["failed_videos"] == ["sv000000003"]
+    assert server.stats["errors_served"] == 1
+
+    # A 429 is transient: the video backs off instead of being retried at once
+    entry = archiver.failures.get("sv000000003")
+    assert entry["kind"] == "transient" and not entry["quarantined"]
+    result = archiver.sync_playlist(playlist_id)
+    assert result["skipped_videos"] == ["sv000000003"]
+
+    # Once the backoff has passed (the fault is used up) it downloads
+    with patch('time.time', return_value=entry["retry_at"] + 1):
+        result = archiver.sync_playlist(playlist_id)
+    assert result["new_videos"] == 1
+    assert "sv000000003" in archiver.downloaded_videos
+
+def test_unknown_playlist_and_normal_urls(archiver):
+    assert archiver.add_playlist("https://www.youtube.com/playlist?list=PLMISSING") is None
+    assert archiver._route_url("https://example.com/watch?v=x") == "https://example.com/watch?v=x"
+    assert archiver._route_url("https://www.youtube.com/watch?v=x").endswith("/watch?v=x")
+
+def test_extractor_matches_configured_host():
+    from youtube_archiver.standin import standin_extractor
+    extractor = standin_extractor("http://10.0.0.5:8900/")
+    assert extractor.suitable("http://10.0.0.5:8900/watch?v=x")
+    assert not extractor.suitable("http://10.0.0.6:8900/watch?v=x")
+    assert not extractor.suitable("http://127.0.0.1:8900/watch?v=x")
+
+def test_core_imports_standin_only_in_test_mode():
+    import subprocess
+    import sys
+    code = "import sys, youtube_archiver.core; print('youtube_archiver.standin' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    assert result.stdout.strip() == "False"
+
+def test_bandwidth_cap_spans_concurrent_downloads(archiver, server):
+    playlist_id = archiver.add_playlist("https://www.youtube.com/playlist?list=PLSTANDIN000")
+    archiver.update_config({"bandwidth_limit": 500_000})
+    archiver.bandwidth.burst = 0.1
+
+    start = time.monotonic()
+    result = archiver.sync_playlist(playlist_id)
+    elapsed = time.monotonic() - start
+
+    # 250 KB at 500 KB/s, less the 50 KB burst
+    assert result["new_videos"] == 5
+    assert elapsed >= 0.35
+    assert archiver.bandwidth.snapshot()["active_downloads"] == 0
+
+def test_adaptive_concurrency_backs_off_on_429(archiver, server):
+    playlist_id = archiver.add_playlist("https://www.youtube.com/playlist?list=PLSTANDIN000")
+    archiver.update_config({"adaptive_concurrency": True, "concurrent_downloads": 4})
+    assert archiver.concurrency.videos == 4
+    server.inject(429, times=1, match="/media/")
+
+    result = archiver.sync_playlist(playlist_id)
+
+    assert len(result["failed_videos"]) == 1
+    decisions = archiver.telemetry.snapshot()["concurrency_decisions"]
+    assert decisions[0]["reason"] == "rate_limited"
+    assert decisions[0]["to"]["videos"] == 2
+    assert server.stats["max_active_streams"] <= 4
@@ -0,0 +1,141 @@
+import os
+import json
+import sqlite3
+import pytest
+from unittest.mock import patch
+from youtube_archiver import YouTubeArchiver
+from youtube_archiver.storage import CatalogStore, JSONCatalogStore, SQLiteCatalogStore
+
+@pytest.fixture
+def sqlite_archiver(tmp_path):
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+    with open(config_dir / "config.json", 'w') as f:
+        json.dump({"download_dir": str(tmp_path / "downloads"), "storage_backend": "sqlite"}, f)
+    return YouTubeArchiver(config_dir=str(config_dir), download_dir=str(tmp_path / "downloads"))
+
+def test_catalog_store_requires_every_method():
+    class PartialStore(CatalogStore):
+        def load_playlists(self):
+            return {}
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+def test_json_store_journals_video_changes(tmp_path):
+    videos_file = str(tmp_path / "videos.json")
+    store = JSONCatalogStore(str(tmp_path / "playlists.json"), videos_file, fsync_interval=0)
+    assert store.load_videos() == {}
+
+    store.put_video('v1', {'title': 'Video 1'})
+    store.put_video('v2', {'title': 'Video 2'})
+    store.remove_video('v1')
+
+    # The snapshot is untouched; the changes live in the journal
+    with open(videos_file) as f:
+        assert json.load(f) == {}
+    with open(videos_file + ".journal") as f:
+        assert len(f.readlines()) == 3
+
+    reopened = JSONCatalogStore(str(tmp_path / "playlists.json"), videos_file)
+    assert reopened.load_videos() == {'v2': {'title': 'Video 2'}}
+
+def test_json_store_compaction(tmp_path):
+    videos_file = str(tmp_path / "videos.json")
+    store = JSONCatalogStore(str(tmp_path / "playlists.json"), videos_file,
+                             fsync_interval=0, compact_threshold=3)
+    store.load_videos()
+    for i in range(3):
+        store.put_video(f'v{i}', {'title': f'Video {i}'})
+    store.close()
+
+    with open(videos_file) as f:
+        assert len(json.load(f)) == 3
+    assert not os.path.exists(videos_file + ".journal")
+    assert not os.path.exists(videos_file + ".journal.compacting")
+
+def test_json_store_ignores_torn_journal_record(tmp_path):
+    videos_file = str(tmp_path / "videos.json")
+    with open(videos_file, 'w') as f:
+        json.dump({'v1': {'title': 'Video 1'}}, f)
+    with open(videos_file + ".journal", 'w') as f:
+        f.write('{"op":"put","id":"v2","data":{"title":"Video 2"}}\n{"op":"put","id":"v3","da')
+
+    store = JSONCatalogStore(str(tmp_path / "playlists.json"), videos_file)
+    assert set(store.load_videos()) == {'v1', 'v2'}
+
+def test_sqlite_store_migrates_json_once(tmp_path):
+    playlists_file = tmp_path / "playlists.json"
+    videos_file = tmp_path / "videos.json"
+    with open(playlists_file, 'w') as f:
+        json.dump({'PL1': {'title': 'Playlist 1'}}, f)
+    with open(videos_file, 'w') as f:
+        json.dump({'v1': {'title': 'Video 1', 'playlist_id': 'PL1', 'downloaded_at': '2024-01-01'}}, f)
+
+    db_file = str(tmp_path / "catalog.db")
+    store = SQLiteCatalogStore(db_file, str(playlists_file), str(videos_file))
+    assert store.load_playlists() == {'PL1': {'title': 'Playlist 1'}}
+    assert store.load_videos()['v1']['playlist_id'] == 'PL1'
+    store.remove_video('v1')
+    store.close()
+
+    # Reopening must not import the JSON files a second time
+    store = SQLiteCatalogStore(db_file, str(playlists_file), str(videos_file))
+    assert store.load_videos() == {}
+    store.close()
+
+def test_sqlite_store_migrates_journaled_videos(tmp_path):
+    playlists_file = str(tmp_path / "playlists.json")
+    videos_file = str(tmp_path / "videos.json")
+    store = JSONCatalogStore(playlists_file, videos_file, fsync_interval=0)
+    store.load_playlists()
+    store.load_videos()
+    store.put_video('v1', {'title': 'Video 1'})
+    store.close()
+    with open(videos_file) as f:
+        assert json.load(f) == {}
+
+    store = SQLiteCatalogStore(str(tmp_path / "catalog.db"), playlists_file, videos_file)
+    assert store.load_videos() == {'v1': {'title': 'Video 1'}}
+    store.close()
+
+def test_json_store_keeps_its_own_records(tmp_path):
+    store = JSONCatalogStore(str(tmp_path / "playlists.json"), str(tmp_path / "videos.json"))
+    store.load_videos()
+    video = {'title': 'Video 1'}
+    store.put_video('v1', video)
+    # Changing a record in place must not reach a snapshot being written
+    video['thumbnail'] = ['ab/thumbnail.jpg']
+    assert store._videos['v1'] == {'title': 'Video 1'}
+    store.close()
+
+def test_sqlite_store_membership(tmp_path):
+    db_file = str(tmp_path / "catalog.db")
+    store = SQLiteCatalogStore(db_file)
+    store.put_video('v1', {'title': 'Video 1', 'playlist_id': 'PL1'})
+    store.put_video('v1', {'title': 'Video 1 (renamed)', 'playlist_id': 'PL1'})
+    store.close()
+
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT title FROM videos WHERE id = 'v1'").fetchone() == ('Video 1 (renamed)',)
+    assert conn.execute("SELECT playlist_id, video_id FROM playlist_videos").fetchall() == [('PL1', 'v1')]
+    conn.close()
+
+def test_archiver_sqlite_backend(sqlite_archiver):
+    assert os.path.exists(os.path.join(sqlite_archiver.config_dir, "catalog.db"))
+    sqlite_archiver.playlists = {'PL123': {'title': 'Test Playlist', 'url': 'http://url'}}
+    sqlite_archiver._save_playlists()
+
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+        mock_instance.extract_info.return_value = {
+            'entries': [{'id': 'vid1', 'title': 'Video 1'}]
+        }
+        result = sqlite_archiver.sync_playlist('PL123')
+
+    assert result['new_videos'] == 1
+    sqlite_archiver.close()
+    reloaded = YouTubeArchiver(config_dir=sqlite_archiver.config_dir)
+    assert reloaded.downloaded_videos['vid1']['title'] == 'Video 1'
+    assert reloaded.playlists['PL123']['video_count'] == 1
@@ -0,0 +1,114 @@
+import os
+import stat
+import pytest
+from unittest.mock import patch
+from youtube_archiver.thumbnails import ThumbnailPipeline, build_thumbnail, find_sidecar_thumbnail
+
+@pytest.fixture
+def archiver(archiver):
+    # Behave the same whether or not ffmpeg is installed here
+    archiver.thumbnails.ffmpeg = None
+    return archiver
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    """An "ffmpeg" that writes a fixed frame to stdout, or copies stdin to its last argument"""
+    path = tmp_path / "ffmpeg"
+    path.write_text('#!/bin/sh\n'
+                    'for last; do :; done\n'
+                    'if [ "$last" = "-" ]; then printf frame; else cat > "$last"; fi\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def test_build_thumbnail_is_content_addressed(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    for name in ("a.jpg", "b.jpg"):
+        (tmp_path / name).write_bytes(b'same image')
+
+    names = build_thumbnail(str(tmp_path / "a.jpg"), cache_dir, (320,))
+    assert len(names) == 1 and names[0].endswith('.jpg')
+    assert build_thumbnail(str(tmp_path / "b.jpg"), cache_dir, (320,)) == names
+    with open(os.path.join(cache_dir, names[0]), 'rb') as f:
+        assert f.read() == b'same image'
+
+    pipeline = ThumbnailPipeline(cache_dir)
+    assert pipeline.has(names)
+    assert pipeline.path('../../etc/passwd') is None
+
+def test_build_thumbnail_variants(tmp_path, fake_ffmpeg):
+    cache_dir = str(tmp_path / "cache")
+    (tmp_path / "thumb.png").write_bytes(b'image')
+    names = build_thumbnail(str(tmp_path / "thumb.png"), cache_dir, (160, 320), ffmpeg=fake_ffmpeg)
+    assert [os.path.splitext(name)[1] for name in names] == ['.webp', '.webp', '.jpg', '.jpg']
+    assert names[1].endswith('-320.webp')
+    assert all(os.path.exists(os.path.join(cache_dir, name)) for name in names)
+
+    (tmp_path / "video.mp4").write_bytes(b'video')
+    poster = build_thumbnail(str(tmp_path / "video.mp4"), cache_dir, (320,), ffmpeg=fake_ffmpeg, from_video=True)
+    with open(os.path.join(cache_dir, poster[-1]), 'rb') as f:
+        assert f.read() == b'frame'
+
+def test_download_caches_saved_thumbnail(archiver):
+    video_file = os.path.join(archiver.download_dir, "Video 1-v1.mp4")
+    with patch('yt_dlp.YoutubeDL') as mock_ydl:
+        mock_instance = mock_ydl.return_value
+        mock_instance.__enter__.return_value = mock_instance
+
+        def fake_download(urls):
+            with open(video_file, 'wb') as f:
+                f.write(b'0' * 100)
+            with open(os.path.join(archiver.download_dir, "Video 1-v1.webp"), 'wb') as f:
+                f.write(b'thumbnail')
+            mock_instance.add_post_hook.call_args[0][0](video_file)
+        mock_instance.download.side_effect = fake_download
+
+        assert archiver.download_video('v1', 'Video 1') is True
+        assert mock_ydl.call_args[0][0]['writethumbnail'] is True
+
+    archiver.thumbnails.close()
+    names = archiver.downloaded_videos['v1']['thumbnail']
+    assert archiver.thumbnails.has(names)
+
+def test_backfill_thumbnails_resumes(archiver):
+    for video_id, sidecar in (('v1', True), ('v2', True), ('v3', False)):
+        path = os.path.join(archiver.download_dir, f"Video-{video_id}.mp4")
+        with open(path, 'wb') as f:
+            f.write(b'0' * 10)
+        if sidecar:
+            with open(os.path.join(archiver.download_dir, f"Video-{video_id}.jpg"), 'wb') as f:
+                f.write(video_id.encode())
+        archiver.downloaded_videos[video_id] = {'title': video_id, 'file_path': path}
+        archiver.file_index[video_id] = path
+    assert find_sidecar_thumbnail(archiver.file_index['v3']) is None
+
+    # Without ffmpeg there is no poster frame for v3
+    assert archiver.backfill_thumbnails() == {"queued": 2, "cached": 0, "skipped": 1}
+    assert archiver.thumbnails.has(archiver.downloaded_videos['v1']['thumbnail'])
+    assert archiver.backfill_thumbnails() == {"queued": 0, "cached": 2, "skipped": 1}
+
+def test_full_queue_defers_instead_of_blocking(tmp_path):
+    done = {}
+    pipeline = ThumbnailPipeline(str(tmp_path / "cache"), workers=1,
+                                 on_done=lambda video_id, names: done.setdefault(video_id, names))
+    pipeline.ffmpeg = None
+    for i in range(6):
+        (tmp_path / f"{i}.jpg").write_bytes(f'image {i}'.encode())
+
+    # Never waits for room; builds beyond the queue bound start as others finish
+    futures = [pipeline.submit(f'v{i}', str(tmp_path / f"{i}.jpg"), block=False) for i in range(6)]
+    assert futures[0] is not None
+    assert pipeline.wait(timeout=60)
+    assert sorted(done) == [f'v{i}' for i in range(6)]
+    pipeline.close()
+
+def test_delete_video_removes_sidecar_thumbnail(archiver):
+    video_file = os.path.join(archiver.download_dir, "Video 1-v1.mp4")
+    sidecar = os.path.join(archiver.download_dir, "Video 1-v1.webp")
+    for path in (video_file, sidecar):
+        with open(path, 'wb') as f:
+            f.write(b'0')
+    archiver.downloaded_videos['v1'] = {'title': 'Video 1', 'file_path': video_file}
+    archiver.file_index['v1'] = video_file
+
+    assert archiver.delete_video('v1') is True
+    assert not os.path.exists(sidecar)
@@ -8,6 +8,7 @@ import os
 # and to control threading behavior in tests.
 with patch('threading.Thread'):
     import youtube_archiver.app as web
+from youtube_archiver.streaming import media_etag
 
 @pytest.fixture
 def client():
@@ -34,6 +35,18 @@ def mock_archiver():
         "total_size": 0, "total_size_human": "0 B", "video_count": 0
     }
     mock.get_missing_videos.return_value = []
+    mock.jobs.counts.return_value = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+    mock.telemetry.snapshot.return_value = {'active': [], 'current_speed': 0, 'recent': [], 'syncs': {}}
+    mock.bandwidth.snapshot.return_value = {'limit': None, 'base_limit': None, 'schedule': [],
+                                            'active_downloads': 0, 'share': None}
+    mock.concurrency = None
+    mock.failures.entries.return_value = []
+    mock.list_videos.return_value = {
+        'videos': [], 'next_cursor': None, 'sort': 'downloaded_at', 'order': 'desc'
+    }
+    mock.entry_cache.status.return_value = {
+        "cached": True, "fetched_at": None, "fresh": True, "refreshing": False
+    }
     
     yield mock
     
@@ -73,37 +86,43 @@ def test_remove_playlist(client, mock_archiver):
     mock_archiver.remove_playlist.assert_called_with('PL123')
 
 def test_sync_all_playlists(client, mock_archiver):
-    # Mock threading.Thread to run the target immediately
-    with patch('threading.Thread') as mock_thread:
-        def side_effect(target=None, **kwargs):
-            target() # Execute the sync function immediately
-            return MagicMock() 
-        mock_thread.side_effect = side_effect
-        
-        mock_archiver.sync_all_playlists.return_value = [{'success': True}]
-        
+    mock_archiver.enqueue_sync_all.return_value = [{'id': 'j1'}, {'id': 'j2'}]
+    
+    with patch.object(web.runner, 'wake') as mock_wake:
         response = client.post('/sync_all')
-        
-        assert response.status_code == 200
-        assert response.json['status'] == 'success'
-        mock_archiver.sync_all_playlists.assert_called()
+    
+    assert response.status_code == 200
+    assert response.json['status'] == 'success'
+    assert 'Queued 2 playlists' in response.json['message']
+    mock_archiver.enqueue_sync_all.assert_called()
+    mock_wake.assert_called()
 
 def test_sync_playlist(client, mock_archiver):
     mock_archiver.playlists = {'PL123': {'title': 'Test Playlist'}}
+    mock_archiver.enqueue_sync.return_value = ({'id': 'j1'}, True)
     
-    with patch('threading.Thread') as mock_thread:
-        def side_effect(target=None, **kwargs):
-            target()
-            return MagicMock() 
-        mock_thread.side_effect = side_effect
-        
-        mock_archiver.sync_playlist.return_value = {'success': True, 'new_videos': 5}
-        
+    with patch.object(web.runner, 'wake') as mock_wake:
         response = client.post('/sync_playlist/PL123')
-        
-        assert response.status_code == 200
-        assert response.json['status'] == 'success'
-        mock_archiver.sync_playlist.assert_called_with('PL123', callback=web.update_sync_status)
+    
+    assert response.status_code == 200
+    assert response.json['status'] == 'success'
+    mock_archiver.enqueue_sync.assert_called_with('PL123')
+    mock_wake.assert_called()
+    
+    # A second request while the first is still queued is coalesced
+    mock_archiver.enqueue_sync.return_value = ({'id': 'j1'}, False)
+    response = client.post('/sync_playlist/PL123')
+    assert 'Already queued' in response.json['message']
+
+def test_job_status_updates(client, mock_archiver):
+    mock_archiver.jobs.list.return_value = []
+    web.job_started({'id': 'j1'})
+    assert web.sync_status['is_syncing'] is True
+    
+    web.job_finished({'id': 'j1'}, {'success': True, 'playlist_title': 'Test', 'new_videos': 2})
+    assert web.sync_status['is_syncing'] is False
+    assert web.sync_status['current_task'] == 'Completed Test: 2 new videos downloaded'
+    assert web.sync_status['last_run'] is not None
 
 def test_sync_playlist_not_found(client, mock_archiver):
     mock_archiver.playlists = {} # Empty
@@ -134,17 +153,90 @@ def test_settings_update(client, mock_archiver):
         
         mock_schedule_sync.assert_called()
 
+def test_settings_bandwidth(client, mock_archiver):
+    data = {
+        'download_dir': '/tmp/dl',
+        'sync_interval': '24',
+        'concurrent_downloads': '3',
+        'bandwidth_limit': '2',
+        'bandwidth_schedule': '01:00-07:00 unlimited\n12:00-13:00 0.5'
+    }
+    with patch('youtube_archiver.app.schedule_sync'):
+        response = client.post('/settings', data=data)
+    assert response.status_code == 302
+    args = mock_archiver.update_config.call_args[0][0]
+    assert args['bandwidth_limit'] == 2000000
+    assert args['bandwidth_schedule'] == [{'start': '01:00', 'end': '07:00', 'limit': None},
+                                          {'start': '12:00', 'end': '13:00', 'limit': 500000}]
+
+    mock_archiver.update_config.reset_mock()
+    response = client.post('/settings', data=dict(data, bandwidth_schedule='overnight'))
+    assert response.status_code == 400
+    assert b'Invalid schedule window' in response.data
+    mock_archiver.update_config.assert_not_called()
+
 def test_playlist_detail(client, mock_archiver):
     mock_archiver.playlists = {'PL1': {'title': 'Detail Playlist', 'id': 'PL1', 'url': 'http://url'}}
     response = client.get('/playlist/PL1')
     assert response.status_code == 200
     assert b'Detail Playlist' in response.data
 
+def test_playlist_detail_uses_entry_cache(client, mock_archiver):
+    mock_archiver.playlists = {'PL1': {'title': 'Detail Playlist', 'id': 'PL1', 'url': 'http://url'}}
+    mock_archiver.entry_cache.status.return_value = {
+        "cached": False, "fetched_at": None, "fresh": False, "refreshing": True
+    }
+    response = client.get('/playlist/PL1')
+    assert response.status_code == 200
+    assert b'being refreshed' in response.data
+    mock_archiver.get_missing_videos.assert_called_with('PL1', wait=False)
+
+def test_refresh_playlist(client, mock_archiver):
+    response = client.post('/refresh_playlist/PL1')
+    assert response.status_code == 302
+    assert 'playlist/PL1' in response.headers['Location']
+    mock_archiver.refresh_playlist_entries.assert_called_with('PL1')
+
 def test_videos_page(client, mock_archiver):
-    mock_archiver.downloaded_videos = {'v1': {'title': 'Vid 1'}}
-    response = client.get('/videos')
+    mock_archiver.list_videos.return_value = {
+        'videos': [{'id': 'v1', 'title': 'Vid 1'}], 'next_cursor': 'abc',
+        'sort': 'title', 'order': 'asc'
+    }
+    response = client.get('/videos?sort=title&order=asc&q=vid')
     assert response.status_code == 200
     assert b'Vid 1' in response.data
+    assert b'data-cursor="abc"' in response.data
+    mock_archiver.list_videos.assert_called_with(sort='title', order='asc', cursor=None, limit=50,
+                                                 playlist_id=None, query='vid')
+
+def test_api_videos(client, mock_archiver):
+    mock_archiver.list_videos.return_value = {
+        'videos': [{'id': 'v2', 'title': 'Vid 2'}], 'next_cursor': None,
+        'sort': 'downloaded_at', 'order': 'desc'
+    }
+    response = client.get('/api/videos?cursor=abc&playlist_id=PL1&limit=10')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['next_cursor'] is None
+    assert data['videos'][0]['watch_url'] == '/watch/v2'
+    assert data['videos'][0]['delete_url'] == '/delete_video/v2'
+    mock_archiver.list_videos.assert_called_with(sort='downloaded_at', order='desc', cursor='abc', limit=10,
+                                                 playlist_id='PL1', query=None)
+
+def test_search(client, mock_archiver):
+    mock_archiver.search_videos.return_value = [
+        {'id': 'v1', 'title': 'Knife skills', 'uploader': 'Chef Anna', 'score': 3.0}
+    ]
+    response = client.get('/search?q=knife')
+    assert response.status_code == 200
+    assert b'Knife skills' in response.data
+    assert b'Chef Anna' in response.data
+    mock_archiver.search_videos.assert_called_with('knife', limit=100)
+
+    response = client.get('/api/search?q=kni&limit=5')
+    data = response.get_json()
+    assert data['results'][0]['watch_url'] == '/watch/v1'
+    mock_archiver.search_videos.assert_called_with('kni', limit=5)
 
 def test_delete_video(client, mock_archiver):
     mock_archiver.downloaded_videos = {'v1': {'title': 'Vid 1', 'playlist_id': 'PL1'}}
@@ -156,15 +248,20 @@ def test_delete_video(client, mock_archiver):
     assert response.status_code == 302
     mock_archiver.delete_video.assert_called_with('v1')
 
-def test_watch_video(client, mock_archiver):
+def test_watch_video(client, mock_archiver, tmp_path):
     # Setup
+    video_file = tmp_path / "vid1.mp4"
+    video_file.write_bytes(b'0' * 10)
     mock_archiver.downloaded_videos = {'v1': {'title': 'Vid 1'}}
-    mock_archiver.find_video_file.return_value = '/path/to/vid1.mp4'
+    mock_archiver.find_video_file.return_value = str(video_file)
     
     # Success
     response = client.get('/watch/v1')
     assert response.status_code == 200
     assert b'Vid 1' in response.data
+    # The stream URL carries the file's version
+    etag = media_etag(os.stat(str(video_file)))
+    assert f'/stream/v1?v={etag}'.encode() in response.data
     
     # Not in DB
     response = client.get('/watch/NONEXISTENT')
@@ -175,25 +272,66 @@ def test_watch_video(client, mock_archiver):
     response = client.get('/watch/v1')
     assert response.status_code == 302 # Redirects to videos
 
-def test_serve_video(client, mock_archiver):
-    # Set a string path so os.path.abspath works predictably
+def test_files_are_only_streamed_by_video_id(client, mock_archiver):
     mock_archiver.download_dir = "./downloads"
-    expected_path = os.path.abspath("./downloads")
-
-    with patch('youtube_archiver.app.send_from_directory') as mock_send:
-        mock_send.return_value = "File Content"
-        
-        response = client.get('/video/test.mp4')
-        
-        assert response.status_code == 200
-        assert b"File Content" in response.data
-        mock_send.assert_called_with(expected_path, 'test.mp4')
+    assert client.get('/video/test.mp4').status_code == 404
 
-def test_get_status(client):
+def test_get_status(client, mock_archiver):
+    mock_archiver.jobs.counts.return_value = {'queued': 1, 'running': 0, 'done': 2, 'failed': 0}
     response = client.get('/status')
     assert response.status_code == 200
     assert 'is_syncing' in response.json
     assert 'current_task' in response.json
+    assert response.json['jobs']['queued'] == 1
+    assert response.json['telemetry']['active'] == []
+    assert response.json['bandwidth']['limit'] is None
+
+def test_event_stream(client):
+    response = client.get('/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    assert b'event: status' in next(chunks)
+    assert web.events.client_count == 1
+
+    web.update_sync_status("Downloaded: Vid 1", 40)
+    event = next(chunks)
+    assert b'event: status' in event
+    assert b'"progress": 40' in event
+
+    web.events.publish("download_finished", {"video_id": "v1", "success": True})
+    assert b'event: download_finished' in next(chunks)
+
+    response.close()
+    assert web.events.client_count == 0
+
+def test_event_broker_drops_oldest_for_slow_clients():
+    broker = web.EventBroker(buffer=2)
+    client = broker.subscribe()
+    for i in range(5):
+        broker.publish("status", {"progress": i})
+    messages = [client.get_nowait(), client.get_nowait()]
+    assert '"progress": 3' in messages[0]
+    assert '"progress": 4' in messages[1]
+    broker.unsubscribe(client)
+    assert broker.client_count == 0
+
+def test_metrics(client, mock_archiver):
+    mock_archiver.jobs.counts.return_value = {'queued': 2, 'running': 1, 'done': 0, 'failed': 0}
+    mock_archiver.telemetry.active_count = 1
+    
+    client.get('/status')
+    response = client.get('/metrics')
+    
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'youtube_archiver_jobs{state="queued"} 2' in text
+    assert 'youtube_archiver_active_downloads 1' in text
+    assert 'youtube_archiver_http_request_seconds_count{route="/status",method="GET",status="200"}' in text
 
 def test_schedule_sync_logic(client, mock_archiver):
     # Scenario 1: Interval based
@@ -232,4 +370,119 @@ def test_schedule_sync_logic(client, mock_archiver):
     with patch('youtube_archiver.app.schedule') as mock_schedule:
         web.schedule_sync()
         mock_schedule.clear.assert_not_called()
-        mock_schedule.every.assert_not_called()
\ No newline at end of file
+        mock_schedule.every.assert_not_called()
+
+
+def test_stream_video_ranges_and_caching(client, mock_archiver, tmp_path):
+    video_file = tmp_path / "Vid 1-v1.mp4"
+    video_file.write_bytes(bytes(range(256)) * 4)
+    mock_archiver.find_video_file.return_value = str(video_file)
+    mock_archiver.download_dir = str(tmp_path)
+    mock_archiver.config = {}
+
+    response = client.get('/stream/v1')
+    assert response.status_code == 200
+    assert len(response.data) == 1024
+    # Unversioned URLs revalidate, since a remux rewrites the file in place
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert 'immutable' not in response.headers['Cache-Control']
+    etag = response.headers['ETag']
+
+    response = client.get(f'/stream/v1?v={etag.strip(chr(34))}')
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+
+    response = client.get('/stream/v1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get('/stream/v1', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == bytes(range(10, 20))
+    assert response.headers['Content-Range'] == 'bytes 10-19/1024'
+
+    response = client.get('/stream/v1', headers={'Range': 'bytes=0-1,-2'})
+    assert response.status_code == 206
+    assert response.headers['Content-Type'].startswith('multipart/byteranges')
+    assert b'Content-Range: bytes 0-1/1024' in response.data
+    assert b'Content-Range: bytes 1022-1023/1024' in response.data
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+    mock_archiver.find_video_file.return_value = None
+    assert client.get('/stream/v1').status_code == 404
+
+def test_stream_video_offload(client, mock_archiver, tmp_path):
+    video_file = tmp_path / "Vid 1-v1.mp4"
+    video_file.write_bytes(b'0' * 10)
+    mock_archiver.find_video_file.return_value = str(video_file)
+    mock_archiver.download_dir = str(tmp_path)
+    mock_archiver.config = {"media_offload": "x-accel", "media_offload_prefix": "/archive/"}
+
+    response = client.get('/stream/v1')
+    assert response.headers['X-Accel-Redirect'] == '/archive/Vid%201-v1.mp4'
+    assert response.data == b''
+
+def test_playlist_detail_shows_failures(client, mock_archiver):
+    mock_archiver.playlists = {'PL1': {'title': 'My Playlist', 'id': 'PL1', 'video_count': 2, 'last_synced': None}}
+    mock_archiver.failures.entries.return_value = [{
+        'video_id': 'vid9', 'title': 'Gone Video', 'playlist_id': 'PL1', 'error': 'Private video',
+        'kind': 'permanent', 'reason': 'private', 'attempts': 1, 'quarantined': True,
+        'retry_at': 1700000000, 'last_failed': 1690000000, 'first_failed': 1690000000
+    }]
+    response = client.get('/playlist/PL1')
+    assert response.status_code == 200
+    assert b'Failed (1)' in response.data
+    assert b'Gone Video' in response.data
+    assert b'Quarantined' in response.data
+    mock_archiver.failures.entries.assert_called_with('PL1')
+
+    mock_archiver.failures.get.return_value = {'video_id': 'vid9', 'playlist_id': 'PL1'}
+    response = client.post('/failures/vid9/retry')
+    assert response.status_code == 302
+    assert '/playlist/PL1' in response.location
+    mock_archiver.failures.release.assert_called_with('vid9')
+
+def test_playlist_detail_lists_in_playlist_order(client, mock_archiver):
+    mock_archiver.playlists = {'PL1': {'title': 'Detail Playlist', 'id': 'PL1', 'url': 'http://url'}}
+    response = client.get('/playlist/PL1')
+    assert response.status_code == 200
+    mock_archiver.list_videos.assert_called_with(sort='position', order='asc', cursor=None, limit=50,
+                                                 playlist_id='PL1', query=None)
+
+def test_videos_page_shows_thumbnails(client, mock_archiver):
+    name = 'ab/' + 'ab' * 16 + '-320'
+    mock_archiver.list_videos.return_value = {
+        'videos': [{'id': 'v1', 'title': 'Vid 1', 'thumbnail': [name + '.webp', name + '.jpg']}],
+        'next_cursor': None, 'sort': 'downloaded_at', 'order': 'desc'
+    }
+    response = client.get('/videos')
+    assert f'srcset="/thumbnails/{name}.webp"'.encode() in response.data
+    assert f'src="/thumbnails/{name}.jpg"'.encode() in response.data
+
+    data = client.get('/api/videos').get_json()
+    assert data['videos'][0]['thumbnail_url'] == f'/thumbnails/{name}.jpg'
+    assert data['videos'][0]['thumbnail_webp_url'] == f'/thumbnails/{name}.webp'
+
+def test_thumbnail_served_with_long_lived_cache(client, mock_archiver, tmp_path):
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / "thumb.jpg").write_bytes(b'image')
+    mock_archiver.thumbnails.cache_dir = str(tmp_path)
+    mock_archiver.thumbnails.path.return_value = str(tmp_path / "ab" / "thumb.jpg")
+    response = client.get('/thumbnails/ab/thumb.jpg')
+    assert response.status_code == 200
+    assert response.data == b'image'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+
+    mock_archiver.thumbnails.path.return_value = None
+    assert client.get('/thumbnails/../config.json').status_code == 404
+
+def test_optimize_faststart(client, mock_archiver):
+    mock_archiver.enqueue_faststart.return_value = ({'id': 'j1'}, True)
+    response = client.post('/optimize_faststart')
+    assert response.status_code == 302
+    mock_archiver.enqueue_faststart.assert_called_once()
+
+    mock_archiver.jobs.list.return_value = []
+    web.job_finished({'id': 'j1', 'kind': 'optimize_faststart'},
+                     {'success': True, 'remuxed': 3, 'already': 5})
+    assert web.sync_status['current_task'] == 'Optimized for fast start: 3 remuxed, 5 already fast-start'